@@ -1,347 +1,451 @@
 # backend/app/services/ai_services.py
-import requests
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import json
+import time
 from datetime import datetime
 
+from app.services.completion_normalizer import CompletionStopper, normalize_completion
+from app.services.history_compactor import HistoryCompactor
+from app.services.llm_router import BackendPool
+from app.services.metrics import REGISTRY
+from app.services.prompt_registry import PromptRegistry
+from app.services.shared_state import MemorySessionStore
+from app.services.speculative_completion import SpeculationCancelled
+from app.services.symbol_service import enclosing_blocks
+from app.services.token_utils import estimate_tokens
+
+_LLM_REQUESTS = REGISTRY.counter("echoide_llm_requests_total", "Ollama chat calls by operation and outcome",
+                                 ["operation", "outcome"])
+_LLM_IN_FLIGHT = REGISTRY.gauge("echoide_llm_requests_in_flight", "Ollama chat calls in progress")
+_LLM_SECONDS = REGISTRY.histogram("echoide_llm_request_seconds", "End-to-end Ollama chat call latency",
+                                  ["operation"])
+_LLM_QUEUE_WAIT = REGISTRY.histogram("echoide_llm_queue_wait_seconds",
+                                     "Time before Ollama started on a call (thread pool + server queue)",
+                                     ["operation"])
+_LLM_TTFT = REGISTRY.histogram("echoide_llm_time_to_first_token_seconds", "Time to the first generated token",
+                               ["operation"])
+_LLM_TOKENS_PER_SECOND = REGISTRY.histogram("echoide_llm_tokens_per_second",
+                                            "Generation speed (eval_count / eval_duration)", ["operation"],
+                                            buckets=(1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 160, 240))
+_LLM_PROMPT_TOKENS = REGISTRY.counter("echoide_llm_prompt_tokens_total", "Prompt tokens evaluated by Ollama",
+                                      ["operation", "model"])
+_LLM_EVAL_TOKENS = REGISTRY.counter("echoide_llm_eval_tokens_total", "Tokens generated by Ollama",
+                                    ["operation", "model"])
+_CHAT_PREFILL_SAVED = REGISTRY.counter("echoide_chat_prefill_tokens_saved_total",
+                                       "Estimated chat prompt tokens Ollama served from its KV cache",
+                                       ["mode"])  # mode: stable or window
+_COMPLETION_EARLY_STOPS = REGISTRY.counter("echoide_completion_early_stops_total",
+                                           "Completions cut off once the code at the cursor was complete",
+                                           ["reason"])  # reason: statement, dedent, block, after_cursor, fence
+_CHAT_PROMPT_TOKENS = REGISTRY.histogram("echoide_chat_prompt_tokens", "Prompt tokens per chat turn", ["mode"],
+                                         buckets=(250, 500, 1000, 1500, 2000, 2500, 3000, 4000, 6000, 8000))
+
 class AIService:
-    def __init__(self):
-        self.base_url = "http://localhost:11434"
-        self.sessions: Dict[str, List] = {}  # Store conversation history
-        
+    def __init__(self, retriever=None, pool: Optional[BackendPool] = None,
+                 prompts: Optional[PromptRegistry] = None, sessions=None):
+        self.pool = pool or BackendPool.from_env()  # Ollama servers, see ECHOIDE_OLLAMA_URLS
+        self.prompts = prompts or PromptRegistry()  # Templates from app/prompts/*.json
+        self.sessions = sessions or MemorySessionStore()  # Conversation history; shared across workers if given
+        self.retriever = retriever  # Optional RetrievalService for project context
+        self.chat_context_budget = 1500        # Tokens of retrieved snippets per chat turn
+        self.compactor = HistoryCompactor(    # Summarises older turns of stable-prefix chat
+            self.sessions, self._summarize_history, idle=lambda: self._foreground == 0)
+        self._foreground = 0                   # Model requests in progress other than history summaries
+        self.completion_context_budget = 600   # Completions are latency-sensitive, keep it small
+        self.completion_early_stop = True      # Stream completions and stop once the code at the cursor is complete
+        
+    async def _retrieve(self, project_path: Optional[str], query: str, token_budget: int,
+                        exclude_text: str = "") -> str:
+        """Related project snippets for a prompt (empty without a retriever or project)"""
+        if self.retriever is None or not project_path:
+            return ""
+        return await asyncio.to_thread(
+            self.retriever.retrieve_context, project_path, query, token_budget, exclude_text
+        )
+    
     async def chat(self, message: str, model: str, language: str, 
-                  context: str, session_id: str) -> str:
-        """Enhanced chat with context and session management"""
-        
-        # Get session history
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        
-        session_history = self.sessions[session_id]
+                  context: str, session_id: str, project_path: Optional[str] = None,
+                  stable_prefix: bool = True, usage: Optional[Dict] = None) -> str:
+        """Enhanced chat with context and session management.
+
+        With `stable_prefix` each turn's prompt is the previous turn's prompt
+        and reply plus the new message (see _stable_messages), so Ollama
+        only prefills the new part, and older turns are replaced by a summary
+        once the history outgrows its budget (see HistoryCompactor);
+        otherwise the system prompt carries the context and the last 3
+        exchanges are replayed. `usage`, when given,
+        receives the turn's prompt token counts.
+        """
         
         # Build messages array for /api/chat
-        messages = []
-        
-        # Add system message
-        system_content = f"You are an expert {language} developer and coding assistant."
-        if context:
-            system_content += f" Context: {context}"
-        messages.append({"role": "system", "content": system_content})
-        
-        # Add conversation history
-        for exchange in session_history[-3:]:  # Last 3 exchanges
-            messages.append({"role": "user", "content": exchange['user']})
-            messages.append({"role": "assistant", "content": exchange['assistant']})
-        
-        # Add current message
-        messages.append({"role": "user", "content": message})
+        related = await self._retrieve(project_path, f"{message}\n{context}", self.chat_context_budget, context)
+        template = self.prompts.get("chat", model, language=language)
+        if stable_prefix:
+            history = await asyncio.to_thread(self.sessions.history, session_id, self.compactor.keep)
+            summary = await asyncio.to_thread(self.sessions.summary, session_id)
+            messages, exchange = self._stable_messages(template, history, summary, model, language, context,
+                                                       related, message)
+            keep = self.compactor.keep
+            history_tokens = exchange.pop("history_tokens")
+        else:
+            # Get session history
+            session_history = self.sessions.history(session_id, 3)
+            system_content, user_content = template.render(
+                context_section=f" Context: {context}" if context else "",
+                summary_section="",
+                related_section=f"\n\nRelated code from the project:\n{related}" if related else "",
+                turn_context="",
+                message=message
+            )
+            messages = [{"role": "system", "content": system_content}]
+
+            # Add conversation history
+            for exchange in session_history[-3:]:  # Last 3 exchanges
+                messages.append({"role": "user", "content": exchange['user']})
+                messages.append({"role": "assistant", "content": exchange['assistant']})
+
+            # Add current message
+            messages.append({"role": "user", "content": user_content})
+            exchange, keep, history_tokens = {}, 10, None
         
         payload = {
             "model": model,
             "messages": messages,
             "stream": False,
-            "options": {
-                "temperature": 0.1,
-                "num_predict": 1000,
-            }
+            "options": template.options
         }
         
         try:
-            response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()["message"]["content"]
+            stats: Dict = {}
+            result = await self._chat_request("chat", payload, 60, stats=stats, prefer=exchange.get("backend"))
+            
+            # Everything before the new message could come from the KV cache; what did not was prefilled
+            prompt_tokens = sum(estimate_tokens(m["content"]) + 4 for m in messages)
+            prefix_tokens = prompt_tokens - estimate_tokens(messages[-1]["content"]) - 4
+            prefilled = stats.get("prompt_eval_count")
+            saved = min(prefix_tokens, max(0, prompt_tokens - prefilled)) if prefilled else 0
+            mode = "stable" if stable_prefix else "window"
+            _CHAT_PREFILL_SAVED.labels(mode).inc(saved)
+            _CHAT_PROMPT_TOKENS.labels(mode).observe(prompt_tokens)
+            if usage is not None:
+                usage.update(prompt_tokens=prompt_tokens, prefill_tokens=prefilled, saved_tokens=saved,
+                             history_exchanges=(len(messages) - 2) // 2,
+                             history_tokens=history_tokens,
+                             summary_through=(exchange.get("summary") or {}).get("through"))
             
             # Store in session history
-            self.sessions[session_id].append({
+            await asyncio.to_thread(self.sessions.append, session_id, {
                 "timestamp": datetime.now().isoformat(),
                 "user": message,
                 "assistant": result,
-                "context": context
-            })
-            
-            # Keep only last 10 exchanges to manage memory
-            if len(self.sessions[session_id]) > 10:
-                self.sessions[session_id] = self.sessions[session_id][-10:]
+                "context": context,
+                **exchange,
+                **({"backend": stats["backend"]} if stable_prefix and stats.get("backend") else {}),
+                **({"tokens": estimate_tokens(exchange["prompt"]) + estimate_tokens(result) + 8}
+                   if stable_prefix else {})
+            }, keep)
+            if stable_prefix:
+                history = await asyncio.to_thread(self.sessions.history, session_id, keep)
+                stored = await asyncio.to_thread(self.sessions.summary, session_id)
+                self.compactor.note_turn(session_id, history, stored)
             
             return result
             
         except Exception as e:
             raise Exception(f"AI request failed: {str(e)}")
+
+    def _stable_messages(self, template, history: List[Dict], summary: Optional[Dict], model: str,
+                         language: str, context: str, related: str, message: str) -> Tuple[List[Dict], Dict]:
+        """Messages of a stable-prefix chat turn, and the fields its exchange is stored with.
+
+        The system message and the replayed user messages are rebuilt exactly
+        as the earlier turns sent them (from the window's `system_context`
+        and each exchange's stored `prompt`), so the prompt only ever grows at
+        its end. This turn's context, when it is not the one in the system
+        message, goes into the new user message, and so do its related
+        snippets; those are left out of the stored `prompt`, though, so they
+        are sent once and never count against the history budget (the next
+        turn prefills this message and its reply again instead). Which
+        exchanges are replayed, and which summary of the turns before them
+        goes into the system message, is up to the compactor: both change in
+        one go when the history outgrows its budget, so the prefix changes on
+        that turn only, not on every turn as with a sliding window.
+        """
+        last = history[-1] if history and "turn" in history[-1] else None
+        window, summary = self.compactor.window(history, summary, language, estimate_tokens(message))
+
+        system_context = last["system_context"] if window else context
+        system_content, _ = template.render(
+            context_section=f" Context: {system_context}" if system_context else "",
+            summary_section=f"\n\nSummary of the earlier conversation:\n{summary['text']}" if summary else "",
+            related_section="", turn_context="", message=""
+        )
+        turn_context = f"Context: {context}\n\n" if context and context != system_context else ""
+        _, prompt = template.render(context_section="", summary_section="", related_section="",
+                                    turn_context=turn_context, message=message)
+        user_content = prompt
+        if related:
+            _, user_content = template.render(
+                context_section="", summary_section="", related_section="",
+                turn_context=f"{turn_context}Related code from the project:\n{related}\n\n", message=message
+            )
+
+        messages = [{"role": "system", "content": system_content}]
+        for exchange in window:
+            messages.append({"role": "user", "content": exchange["prompt"]})
+            messages.append({"role": "assistant", "content": exchange["assistant"]})
+        messages.append({"role": "user", "content": user_content})
+
+        turn = last["turn"] + 1 if last is not None else 1
+        return messages, {
+            "turn": turn,
+            "window_start": window[0]["turn"] if window else turn,
+            "language": language,
+            "model": model,
+            "system_context": system_context,
+            "prompt": prompt,
+            "backend": last.get("backend") if window else None,
+            "summary": summary,
+            "history_tokens": self.compactor.observe(window, summary),
+        }
     
     async def analyze_code(self, code: str, language: str, analysis_type: str) -> str:
         """Analyze code for different purposes with language-specific context"""
         
-        # Language-specific analysis prompts
-        language_specific_prompts = {
-            "explain": {
-                "python": f"Explain this Python code in detail, including Pythonic concepts, PEP 8 compliance, and best practices:",
-                "javascript": f"Explain this JavaScript code in detail, including ES6+ features, async patterns, and modern JavaScript practices:",
-                "typescript": f"Explain this TypeScript code in detail, including type safety, interfaces, and TypeScript-specific features:",
-                "java": f"Explain this Java code in detail, including OOP principles, design patterns, and Java best practices:",
-                "cpp": f"Explain this C++ code in detail, including memory management, RAII, and modern C++ features:",
-                "csharp": f"Explain this C# code in detail, including .NET features, LINQ, and C# best practices:",
-                "go": f"Explain this Go code in detail, including goroutines, channels, and Go idioms:",
-                "rust": f"Explain this Rust code in detail, including ownership, borrowing, and Rust safety features:",
-                "php": f"Explain this PHP code in detail, including PSR standards and modern PHP practices:",
-                "ruby": f"Explain this Ruby code in detail, including Ruby idioms, blocks, and metaprogramming:",
-                "html": f"Explain this HTML code in detail, including semantic markup, accessibility, and HTML5 features:",
-                "css": f"Explain this CSS code in detail, including layout techniques, responsive design, and modern CSS features:"
-            },
-            "debug": {
-                "python": f"Find potential bugs and issues in this Python code, considering Python-specific pitfalls, type errors, and common mistakes:",
-                "javascript": f"Find potential bugs and issues in this JavaScript code, considering async/await issues, type coercion, and common JavaScript pitfalls:",
-                "typescript": f"Find potential bugs and issues in this TypeScript code, considering type safety violations, null/undefined issues, and TypeScript-specific problems:",
-                "java": f"Find potential bugs and issues in this Java code, considering null pointer exceptions, memory leaks, and Java-specific problems:",
-                "cpp": f"Find potential bugs and issues in this C++ code, considering memory leaks, buffer overflows, and undefined behavior:",
-                "csharp": f"Find potential bugs and issues in this C# code, considering null reference exceptions, disposal patterns, and C#-specific issues:",
-                "go": f"Find potential bugs and issues in this Go code, considering race conditions, error handling, and Go-specific pitfalls:",
-                "rust": f"Find potential bugs and issues in this Rust code, considering lifetime issues, ownership violations, and Rust-specific problems:",
-                "php": f"Find potential bugs and issues in this PHP code, considering security vulnerabilities, type juggling, and PHP-specific issues:",
-                "ruby": f"Find potential bugs and issues in this Ruby code, considering nil errors, method visibility, and Ruby-specific problems:",
-                "html": f"Find potential issues in this HTML code, considering accessibility problems, semantic markup violations, and validation errors:",
-                "css": f"Find potential issues in this CSS code, considering browser compatibility, specificity conflicts, and layout problems:"
-            },
-            "optimize": {
-                "python": f"Suggest optimizations for this Python code using Python-specific performance techniques, list comprehensions, and efficient algorithms:",
-                "javascript": f"Suggest optimizations for this JavaScript code using modern JS features, efficient DOM manipulation, and performance best practices:",
-                "typescript": f"Suggest optimizations for this TypeScript code using strong typing for performance, efficient patterns, and TypeScript optimizations:",
-                "java": f"Suggest optimizations for this Java code using JVM optimizations, efficient collections, and Java performance patterns:",
-                "cpp": f"Suggest optimizations for this C++ code using move semantics, RAII, memory efficiency, and modern C++ performance techniques:",
-                "csharp": f"Suggest optimizations for this C# code using LINQ efficiency, async patterns, and .NET performance best practices:",
-                "go": f"Suggest optimizations for this Go code using goroutine patterns, efficient memory usage, and Go performance idioms:",
-                "rust": f"Suggest optimizations for this Rust code using zero-cost abstractions, efficient memory usage, and Rust performance patterns:",
-                "php": f"Suggest optimizations for this PHP code using efficient database queries, caching strategies, and PHP performance best practices:",
-                "ruby": f"Suggest optimizations for this Ruby code using efficient enumerable methods, memory optimization, and Ruby performance patterns:",
-                "html": f"Suggest optimizations for this HTML code including faster loading, better SEO, and improved accessibility:",
-                "css": f"Suggest optimizations for this CSS code including performance improvements, better maintainability, and modern CSS techniques:"
-            },
-            "review": {
-                "python": f"Perform a comprehensive code review of this Python code, checking for PEP 8 compliance, Pythonic patterns, security, and maintainability:",
-                "javascript": f"Perform a comprehensive code review of this JavaScript code, checking for ES6+ usage, error handling, security, and code quality:",
-                "typescript": f"Perform a comprehensive code review of this TypeScript code, checking for type safety, interface design, generics usage, and best practices:",
-                "java": f"Perform a comprehensive code review of this Java code, checking for OOP principles, design patterns, exception handling, and Java conventions:",
-                "cpp": f"Perform a comprehensive code review of this C++ code, checking for RAII, memory safety, modern C++ usage, and performance:",
-                "csharp": f"Perform a comprehensive code review of this C# code, checking for .NET guidelines, SOLID principles, async patterns, and maintainability:",
-                "go": f"Perform a comprehensive code review of this Go code, checking for Go conventions, error handling, concurrency safety, and simplicity:",
-                "rust": f"Perform a comprehensive code review of this Rust code, checking for safety, ownership patterns, error handling, and Rust idioms:",
-                "php": f"Perform a comprehensive code review of this PHP code, checking for PSR compliance, security vulnerabilities, and modern PHP practices:",
-                "ruby": f"Perform a comprehensive code review of this Ruby code, checking for Ruby style guide compliance, object-oriented design, and best practices:",
-                "html": f"Perform a comprehensive review of this HTML code, checking for semantic markup, accessibility, SEO, and HTML5 best practices:",
-                "css": f"Perform a comprehensive review of this CSS code, checking for maintainability, responsive design, browser compatibility, and modern CSS practices:"
-            }
-        }
-        
-        # Get language-specific prompt or fall back to generic
-        prompt_dict = language_specific_prompts.get(analysis_type, {})
-        prompt = prompt_dict.get(language, f"Perform {analysis_type} analysis on this {language} code:")
-        
-        full_prompt = f"{prompt}\n\n``````\n\nPlease provide detailed analysis specific to {language} language features and best practices."
+        # Language-specific instructions come pre-rendered from app/prompts/analyze.json
+        template = self.prompts.get("analyze", analysis_type=analysis_type, language=language)
+        system_content, user_content = template.render(code=code)
         
         messages = [
-            {"role": "system", "content": f"You are an expert {language} developer and code reviewer with deep knowledge of {language} best practices, common pitfalls, optimization techniques, and security considerations. Provide detailed, actionable feedback."},
-            {"role": "user", "content": full_prompt}
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content}
         ]
         
         payload = {
-            "model": "deepseek-coder:6.7b",
+            "model": template.model,
             "messages": messages,
             "stream": False,
-            "options": {
-                "temperature": 0.2,
-                "num_predict": 2000,  # Allow longer analysis
-                "top_p": 0.9
-            }
+            "options": template.options
         }
         
         try:
-            response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=90)
-            response.raise_for_status()
-            return response.json()["message"]["content"]
+            return await self._chat_request("analyze", payload, 90)
         except Exception as e:
             raise Exception(f"Code analysis failed: {str(e)}")
-    
-    async def complete_code(self, code: str, cursor_position: int, language: str) -> str:
-        """Generate language-specific code completion suggestions"""
-        
-        before_cursor = code[:cursor_position]
-        after_cursor = code[cursor_position:]
-        
-        # Language-specific contexts and examples
-        language_contexts = {
-            'python': {
-                'context': 'You are an expert Python developer. Complete the Python code following PEP 8 guidelines.',
-                'style': 'Use Pythonic idioms, list comprehensions, context managers, and proper exception handling.',
-                'patterns': 'Prefer enumerate() over range(len()), use f-strings, leverage duck typing, and follow the Zen of Python.',
-                'examples': 'Use generators for memory efficiency, proper imports, and type hints where appropriate.'
-            },
-            'javascript': {
-                'context': 'You are an expert JavaScript developer. Complete the JavaScript code using modern ES6+ syntax.',
-                'style': 'Use arrow functions, destructuring, template literals, and async/await patterns.',
-                'patterns': 'Prefer const/let over var, use array methods like map/filter/reduce, and proper error handling.',
-                'examples': 'Use modules, promises, and modern DOM manipulation techniques.'
-            },
-            'typescript': {
-                'context': 'You are an expert TypeScript developer. Complete the TypeScript code with proper type annotations.',
-                'style': 'Include explicit types, use interfaces and generics appropriately, and leverage TypeScript\'s type system.',
-                'patterns': 'Use union types, optional properties, type guards, and proper module declarations.',
-                'examples': 'Implement type-safe code with proper error handling and null checks.'
-            },
-            'java': {
-                'context': 'You are an expert Java developer. Complete the Java code following Java conventions and best practices.',
-                'style': 'Use proper naming conventions, follow OOP principles, and implement appropriate design patterns.',
-                'patterns': 'Use proper exception handling, generics, and collections framework efficiently.',
-                'examples': 'Implement clean interfaces, use streams API, and follow SOLID principles.'
-            },
-            'cpp': {
-                'context': 'You are an expert C++ developer. Complete the C++ code using modern C++ standards (C++11/14/17/20).',
-                'style': 'Use RAII, smart pointers, range-based loops, and move semantics.',
-                'patterns': 'Prefer STL containers and algorithms, use const correctness, and avoid raw pointers.',
-                'examples': 'Implement exception-safe code with proper resource management and modern C++ features.'
-            },
-            'csharp': {
-                'context': 'You are an expert C# developer. Complete the C# code following .NET conventions and best practices.',
-                'style': 'Use proper naming conventions, LINQ where appropriate, and async/await patterns.',
-                'patterns': 'Implement proper disposal patterns, use generics, and follow Microsoft\'s coding guidelines.',
-                'examples': 'Use nullable reference types, expression-bodied members, and modern C# features.'
-            },
-            'go': {
-                'context': 'You are an expert Go developer. Complete the Go code following Go conventions and idiomatic patterns.',
-                'style': 'Use simple, readable code with proper error handling and Go naming conventions.',
-                'patterns': 'Prefer composition over inheritance, use goroutines and channels appropriately.',
-                'examples': 'Implement clean interfaces, proper error handling, and concurrent patterns where needed.'
-            },
-            'rust': {
-                'context': 'You are an expert Rust developer. Complete the Rust code using safe Rust practices and idioms.',
-                'style': 'Use ownership and borrowing correctly, prefer immutability, and handle errors explicitly.',
-                'patterns': 'Use pattern matching, iterators, and Rust\'s type system effectively.',
-                'examples': 'Implement memory-safe code with zero-cost abstractions and proper error handling.'
-            },
-            'php': {
-                'context': 'You are an expert PHP developer. Complete the PHP code following PSR standards and modern PHP practices.',
-                'style': 'Use type hints, proper namespacing, and follow PSR-4 autoloading standards.',
-                'patterns': 'Implement proper error handling, use composer packages, and follow SOLID principles.',
-                'examples': 'Use modern PHP features like traits, generators, and null coalescing operators.'
-            },
-            'ruby': {
-                'context': 'You are an expert Ruby developer. Complete the Ruby code following Ruby style guide and idiomatic patterns.',
-                'style': 'Use blocks and iterators, follow Ruby naming conventions, and embrace Ruby\'s expressiveness.',
-                'patterns': 'Prefer symbols over strings for keys, use proper metaprogramming, and follow DRY principles.',
-                'examples': 'Implement clean object-oriented design with proper use of modules and mixins.'
-            },
-            'html': {
-                'context': 'You are an expert HTML developer. Complete the HTML code using semantic HTML5 elements.',
-                'style': 'Use proper document structure, semantic tags, and accessibility attributes.',
-                'patterns': 'Implement progressive enhancement, proper form handling, and SEO-friendly markup.',
-                'examples': 'Use ARIA attributes, proper heading hierarchy, and valid HTML5 syntax.'
-            },
-            'css': {
-                'context': 'You are an expert CSS developer. Complete the CSS code using modern CSS practices.',
-                'style': 'Use flexbox/grid for layouts, CSS custom properties, and responsive design principles.',
-                'patterns': 'Follow BEM methodology, use proper cascade and specificity, and mobile-first approach.',
-                'examples': 'Implement efficient selectors, use modern CSS features, and maintain clean architecture.'
-            },
-            'sql': {
-                'context': 'You are an expert SQL developer. Complete the SQL code following best practices and standards.',
-                'style': 'Use proper formatting, efficient joins, and appropriate indexing strategies.',
-                'patterns': 'Avoid N+1 queries, use proper normalization, and implement secure query patterns.',
-                'examples': 'Use CTEs, window functions, and proper transaction handling where appropriate.'
-            },
-            'shell': {
-                'context': 'You are an expert shell script developer. Complete the shell script using bash best practices.',
-                'style': 'Use proper error handling, quote variables, and follow POSIX standards where possible.',
-                'patterns': 'Use functions for reusability, proper exit codes, and defensive programming.',
-                'examples': 'Implement proper input validation, use appropriate shell built-ins, and handle edge cases.'
-            }
-        }
-        
-        # Get language-specific information or use generic fallback
-        lang_info = language_contexts.get(language, {
-            'context': f'You are an expert {language} developer. Complete the {language} code.',
-            'style': f'Follow {language} best practices and conventions.',
-            'patterns': f'Use appropriate {language} patterns and idioms.',
-            'examples': f'Implement clean, readable {language} code.'
-        })
-        
-        # Analyze the code context to provide better completions
-        context_analysis = self._analyze_code_context(before_cursor, language)
-        
-        prompt = f"""{lang_info['context']} {lang_info['style']}
-
-{lang_info['patterns']} {lang_info['examples']}
 
-Context Analysis: {context_analysis}
+    async def summarize_analyses(self, results: str, project: str, analysis_type: str) -> str:
+        """Reduce per-file analysis results of a batch job into one report"""
+        template = self.prompts.get("summarize", analysis_type=analysis_type)
+        system_content, user_content = template.render(project=project, results=results)
 
-Complete the following {language} code at the cursor position. Provide ONLY the completion code that should be inserted at the cursor, nothing else.
+        payload = {
+            "model": template.model,
+            "messages": [
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content}
+            ],
+            "stream": False,
+            "options": template.options
+        }
 
-Code before cursor:
+        try:
+            return await self._chat_request("summarize", payload, 120)
+        except Exception as e:
+            raise Exception(f"Analysis summary failed: {str(e)}")
 
-{before_cursor}
+    async def _summarize_history(self, previous: str, conversation: str, model: Optional[str],
+                                 cancel_event) -> str:
+        """Fold older chat turns into a session's running summary (background, see HistoryCompactor).
 
-Code after cursor:
-{after_cursor}
+        Runs on the session's own chat model, which Ollama already has loaded,
+        rather than the template's; exchanges stored without one use the latter.
+        """
+        template = self.prompts.get("chat_summary", model)
+        system_content, user_content = template.render(
+            previous_section=f"Summary so far:\n{previous}\n\n" if previous else "",
+            conversation=conversation
+        )
 
-Requirements:
-- Language: {language}
-- Provide only the missing code to complete the logic at the cursor position
-- Follow {language}-specific syntax and conventions
-- Consider the existing code structure and patterns
-- Do not include explanations, comments, or formatting marks
-- Ensure the completion integrates smoothly with existing code
+        payload = {
+            "model": model or template.model,
+            "messages": [
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content}
+            ],
+            "stream": False,
+            "options": template.options
+        }
+        return await self._chat_request("summarize_history", payload, 120, cancel_event)
 
-Response format: Only return the raw code to be inserted, no markdown or explanations."""
+    async def complete_code(self, code: str, cursor_position: int, language: str,
+                            project_path: Optional[str] = None, cancel_event=None) -> str:
+        """Generate language-specific code completion suggestions.
 
+        The request is streamed and dropped as soon as the inserted text
+        closes the current statement or block (see CompletionStopper), or
+        once `cancel_event` (speculative prefetch) is set, so Ollama stops
+        generating.
+        """
+        
+        before_cursor = code[:cursor_position]
+        after_cursor = code[cursor_position:]
+        
+        # The last few lines before the cursor are the best query for related code
+        query = "\n".join(before_cursor.split("\n")[-30:])
+        related = await self._retrieve(project_path, query, self.completion_context_budget, code)
+        related_section = f"Related code from the project:\n{related}\n\n" if related else ""
+        
+        # Analyze the code context to provide better completions
+        context_analysis = self._analyze_code_context(before_cursor, language)
+        
+        # Language-specific guidance comes pre-rendered from app/prompts/complete.json
+        template = self.prompts.get("complete", language=language)
+        system_content, user_content = template.render(
+            context_analysis=context_analysis,
+            related_section=related_section,
+            before_cursor=before_cursor,
+            after_cursor=after_cursor
+        )
+        
         messages = [
-            {
-                "role": "system", 
-                "content": f"You are an expert {language} code completion assistant specialized in {language} syntax, idioms, and best practices. Provide only the exact code that should be inserted at the cursor position, with no additional formatting or explanations."
-            },
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content}
         ]
 
         payload = {
-            "model": "deepseek-coder:6.7b",  # Use coding model for better completions
+            "model": template.model,
             "messages": messages,
             "stream": False,
-            "options": {
-                "temperature": 0.05,  # Very low temperature for predictable completions
-                "num_predict": 200,   # Moderate length completions
-                "top_p": 0.85,
-                "top_k": 40,
-                "repeat_penalty": 1.1,
-                "stop": ["\n\n"]
-            }
+            "options": template.options
         }
         
         try:
-            response = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=45)
-            response.raise_for_status()
-            completion = response.json()["message"]["content"].strip()
-            
-            # Clean up the completion
-            completion = self._clean_completion(completion, language)
+            operation = "complete" if cancel_event is None else "speculative_complete"
+            stopper = CompletionStopper(before_cursor, after_cursor, language) if self.completion_early_stop \
+                else None
+            completion = await self._chat_request(operation, payload, 45, cancel_event, stopper=stopper)
             
-            # Post-process for better integration
-            completion = self._post_process_completion(completion, before_cursor, after_cursor, language)
+            # Strip prose and fences, drop text repeated after the cursor, fix indentation and brackets
+            completion = normalize_completion(completion, before_cursor, after_cursor, language)
             
             return completion
             
+        except SpeculationCancelled:
+            raise
         except Exception as e:
             raise Exception(f"Code completion failed: {str(e)}")
     
+    async def _chat_request(self, operation: str, payload: Dict, timeout: float, cancel_event=None,
+                            stats: Optional[Dict] = None, prefer: Optional[str] = None, stopper=None) -> str:
+        """POST /api/chat off the event loop and record its timings; returns the message content.
+
+        `stats`, when given, receives Ollama's token counts and the URL of the
+        backend that answered; `prefer` routes to that backend if it is healthy.
+        With a `cancel_event` or a `stopper` the reply is streamed, and the
+        request dropped once the event is set or the stopper has seen enough.
+        """
+        submitted = time.perf_counter()
+        outcome = "error"
+        foreground = operation != "summarize_history"
+        if foreground:
+            self._foreground += 1
+            self.compactor.preempt()  # Background summaries give way
+        _LLM_IN_FLIGHT.inc()
+        try:
+            if cancel_event is None and stopper is None:
+                content = await asyncio.to_thread(self._post_chat, operation, payload, timeout, submitted,
+                                                  stats, prefer)
+            else:
+                content = await asyncio.to_thread(self._stream_chat, operation, payload, timeout,
+                                                  cancel_event, submitted, stopper)
+            outcome = "ok"
+            return content
+        except SpeculationCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            if foreground:
+                self._foreground -= 1
+            _LLM_IN_FLIGHT.dec()
+            _LLM_SECONDS.labels(operation).observe(time.perf_counter() - submitted)
+            _LLM_REQUESTS.labels(operation, outcome).inc()
+    
+    def _post_chat(self, operation: str, payload: Dict, timeout: float, submitted: float,
+                   stats: Optional[Dict] = None, prefer: Optional[str] = None) -> str:
+        started = time.perf_counter()
+        response = self.pool.post("/api/chat", payload, timeout, prefer=prefer)
+        response.raise_for_status()
+        result = response.json()
+        self._record_timings(operation, payload["model"], result, time.perf_counter() - started,
+                             started - submitted, None)
+        if stats is not None:
+            stats.update(prompt_eval_count=result.get("prompt_eval_count"), eval_count=result.get("eval_count"),
+                         backend=getattr(response, "backend_url", None))
+        return result["message"]["content"]
+    
+    def _stream_chat(self, operation: str, payload: Dict, timeout: float, cancel_event,
+                     submitted: float, stopper=None) -> str:
+        """Streamed /api/chat call that closes the connection once cancelled or once `stopper` is done"""
+        parts = []
+        started = time.perf_counter()
+        first_token = None
+        with self.pool.stream("/api/chat", {**payload, "stream": True}, timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if cancel_event is not None and cancel_event.is_set():
+                    raise SpeculationCancelled()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = chunk.get("message", {}).get("content", "")
+                if content and first_token is None:
+                    first_token = time.perf_counter() - submitted
+                parts.append(content)
+                if stopper is not None and content and stopper.feed(content):
+                    # Ollama's counts come with the final chunk, which is never read: count the chunks instead
+                    now = time.perf_counter()
+                    self._record_timings(operation, payload["model"], {
+                        "eval_count": len(parts), "eval_duration": int((now - submitted - first_token) * 1e9)
+                    }, now - started, started - submitted, first_token)
+                    _COMPLETION_EARLY_STOPS.labels(stopper.reason).inc()
+                    return stopper.text
+                if chunk.get("done"):
+                    # The final chunk carries the same timing fields as a non-streamed reply
+                    self._record_timings(operation, payload["model"], chunk, time.perf_counter() - started,
+                                         started - submitted, first_token)
+                    break
+        return "".join(parts)
+    
+    def _record_timings(self, operation: str, model: str, stats: Dict, http_time: float, queued: float,
+                        first_token: Optional[float]) -> None:
+        """Upstream metrics from Ollama's response fields (durations are in nanoseconds)"""
+        total = stats.get("total_duration", 0) / 1e9
+        # Whatever the HTTP call took beyond Ollama's own total was spent queued on the server
+        queue_wait = queued + (max(0.0, http_time - total) if total else 0.0)
+        _LLM_QUEUE_WAIT.labels(operation).observe(queue_wait)
+        if first_token is None:
+            first_token = queue_wait + (stats.get("load_duration", 0) + stats.get("prompt_eval_duration", 0)) / 1e9
+        _LLM_TTFT.labels(operation).observe(first_token)
+
+        eval_count, eval_duration = stats.get("eval_count", 0), stats.get("eval_duration", 0)
+        if eval_count and eval_duration:
+            _LLM_TOKENS_PER_SECOND.labels(operation).observe(eval_count / (eval_duration / 1e9))
+        # The model name comes from the client; only the backends' own models become label values
+        model = self.pool.known_model(model) or "other"
+        _LLM_PROMPT_TOKENS.labels(operation, model).inc(stats.get("prompt_eval_count", 0))
+        _LLM_EVAL_TOKENS.labels(operation, model).inc(eval_count)
+    
     def _analyze_code_context(self, before_cursor: str, language: str) -> str:
         """Analyze the code context to provide better completions"""
         analysis = []
         
         # Check for common patterns
         if language == 'python':
-            if 'def ' in before_cursor:
-                analysis.append("Inside function definition")
-            if 'class ' in before_cursor:
-                analysis.append("Inside class definition")
-            if 'for ' in before_cursor and ':' in before_cursor:
-                analysis.append("Inside for loop")
-            if 'if ' in before_cursor and ':' in before_cursor:
-                analysis.append("Inside conditional block")
+            # Follow indentation to the blocks that actually enclose the cursor
+            blocks = enclosing_blocks(before_cursor)
+            if blocks:
+                analysis.append("Inside " + " > ".join(blocks))
         
         elif language == 'javascript':
             if 'function' in before_cursor or '=>' in before_cursor:
@@ -368,84 +472,6 @@ Response format: Only return the raw code to be inserted, no markdown or explana
         
         return "; ".join(analysis) if analysis else "General code context"
     
-    def _clean_completion(self, completion: str, language: str) -> str:
-        """Clean up the completion response"""
-        # Remove common unwanted prefixes
-        unwanted_prefixes = [
-            "Here's the completion:",
-            "The completion is:",
-            "You can complete it with:",
-            "Here's what should be added:",
-            "The missing code is:",
-            "Complete with:",
-            "Add this:",
-            f"```{language}",
-            "Here's the completed code:",
-            "// Completion:",
-            "# Completion:",
-            "/* Completion:",
-            "<!-- Completion:",
-            "Completion:",
-            "Answer:",
-            "Response:",
-            f"{language} completion:",
-            f"The {language} code:",
-            "Here's the missing part:",
-            "You need to add:"
-        ]
-        
-        completion_lower = completion.lower()
-        for prefix in unwanted_prefixes:
-            if completion_lower.startswith(prefix.lower()):
-                completion = completion[len(prefix):].strip()
-                completion_lower = completion.lower()
-        
-        # Remove unwanted suffixes
-        unwanted_suffixes = [
-            "```",
-            "---",
-            "***",
-            "###",
-            "~~~",
-            "*/",
-            "-->",
-            "End of completion",
-            "That's the completion",
-            "This completes the code"
-        ]
-        
-        for suffix in unwanted_suffixes:
-            if completion.lower().endswith(suffix.lower()):
-                completion = completion[:-len(suffix)].strip()
-        
-        # Remove excessive newlines at start/end but preserve internal structure
-        completion = completion.strip('\n').rstrip()
-        
-        return completion
-    
-    def _post_process_completion(self, completion: str, before_cursor: str, after_cursor: str, language: str) -> str:
-        """Post-process completion for better integration"""
-        
-        # Language-specific post-processing
-        if language == 'python':
-            # Ensure proper indentation for Python
-            if before_cursor.endswith(':'):
-                # After colon, add proper indentation
-                if not completion.startswith(('\n    ', '\n\t')):
-                    completion = '\n    ' + completion.lstrip()
-        
-        elif language in ['javascript', 'typescript', 'java', 'cpp', 'csharp']:
-            # Handle bracket completion for C-style languages
-            if before_cursor.endswith('{') and not after_cursor.startswith('}'):
-                if not completion.endswith('}'):
-                    completion = completion + '\n}'
-        
-        # Remove any duplicate whitespace
-        import re
-        completion = re.sub(r'\n\s*\n\s*\n', '\n\n', completion)
-        
-        return completion
-
     def _build_system_prompt(self, language: str, context: str) -> str:
         """Build system prompt based on language and context"""
         base_prompt = f"You are an expert {language} developer and coding assistant."
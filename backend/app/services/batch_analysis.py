@@ -0,0 +1,485 @@
+# backend/app/services/batch_analysis.py
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.metrics import REGISTRY
+from app.services.symbol_service import LANGUAGE_BY_EXTENSION
+from app.services.token_utils import estimate_tokens, truncate_to_tokens
+
+_BATCH_FILES = REGISTRY.counter("echoide_analysis_files_total", "Files reported by batch analysis jobs",
+                                ["analysis_type", "source"])  # source: analysed, cached or error
+_BATCH_REQUESTS = REGISTRY.gauge("echoide_analysis_requests_in_flight",
+                                 "Model requests of batch analysis jobs in progress")
+
+ANALYSIS_TYPES = ("explain", "debug", "optimize", "review")
+
+
+def split_into_chunks(text: str, budget: int) -> List[Tuple[int, int, str]]:
+    """(first line, last line, text) pieces of a file, each within `budget` estimated tokens.
+
+    A piece that has to be cut ends before the last top-level line (one
+    starting in column 0) of its second half where there is one, so
+    functions and classes that fit stay in one piece.
+    """
+    lines = text.split("\n")
+    if estimate_tokens(text) <= budget:
+        return [(1, len(lines), text)]
+    chunks = []
+    start = 0
+    while start < len(lines):
+        used, end, boundary = 0, start, None
+        while end < len(lines):
+            cost = estimate_tokens(lines[end]) + 1
+            if used + cost > budget and end > start:
+                break
+            used += cost
+            end += 1
+            following = lines[end] if end < len(lines) else ""
+            if used * 2 >= budget and following[:1] not in ("", " ", "\t", "}", ")", "]") and \
+                    not lines[end - 1].startswith("@"):  # Keep decorators with what they decorate
+                boundary = end
+        if end < len(lines) and boundary is not None:
+            end = boundary
+        piece = "\n".join(lines[start:end])
+        if piece.strip():
+            chunks.append((start + 1, end, truncate_to_tokens(piece, budget)))  # A single huge line
+        start = end
+    return chunks
+
+
+class AnalysisJob:
+    """One run of a batch analysis and the events it has produced so far"""
+
+    def __init__(self, meta: Dict):
+        self.meta = meta
+        self.events: List[Dict] = []
+        self.task: Optional[asyncio.Task] = None
+        self.waiters: List[asyncio.Future] = []
+        self.written = 0  # Events already in events.ndjson
+        self.write_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.meta["status"] != "running"
+
+
+class BatchAnalysisService:
+    """Project-wide analysis as a resumable map-reduce job.
+
+    Map: every source file of the project is analysed with the "analyze"
+    prompt, split into pieces that fit the model's context window
+    (`context_tokens` minus the prompt and the reply). Reduce: the per-file
+    results are summarised into one project report with the "summarize"
+    prompt, in rounds when they do not fit one request. At most
+    `concurrency` model requests of all jobs run at once (by default one
+    per Ollama backend, so interactive requests queue behind at most one
+    batch request each).
+
+    Each file's result is stored under a key hashing its content, language,
+    analysis type, model and prompt, as soon as it arrives. That store is
+    the checkpoint: a job that is resumed or run again after a restart, or
+    on a project where little changed, reports every file it already has
+    a result for without asking the model. Job state and events are also
+    written to ~/.echoide/analysis/jobs/<id>/, so progress and results can
+    be read back from any worker and after a restart; those writes are
+    batched every `FLUSH_INTERVAL` and made off the event loop.
+    """
+
+    MAX_FILE_SIZE = 256 * 1024
+    HEARTBEAT = 30.0  # A running job saves its state at least this often
+    FLUSH_INTERVAL = 1.0  # New events reach disk (with the job's state) this often
+
+    def __init__(self, ai_service, skip_directories, concurrency: Optional[int] = None,
+                 context_tokens: int = 4096):
+        self.ai_service = ai_service
+        self.skip_directories = skip_directories
+        self.concurrency = concurrency or len(ai_service.pool.backends)
+        self.context_tokens = context_tokens
+        self.storage_dir = os.path.join(os.path.expanduser("~"), ".echoide", "analysis")
+        self.jobs: Dict[str, AnalysisJob] = {}
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._in_flight = 0
+        _BATCH_REQUESTS.set_function(lambda: self._in_flight)
+
+    @classmethod
+    def from_env(cls, ai_service, skip_directories) -> "BatchAnalysisService":
+        """ECHOIDE_ANALYSIS_CONCURRENCY and ECHOIDE_ANALYSIS_CONTEXT_TOKENS (the server's num_ctx)"""
+        concurrency = os.environ.get("ECHOIDE_ANALYSIS_CONCURRENCY")
+        return cls(ai_service, skip_directories, concurrency=int(concurrency) if concurrency else None,
+                   context_tokens=int(os.environ.get("ECHOIDE_ANALYSIS_CONTEXT_TOKENS", "4096")))
+
+    # Storage
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.storage_dir, "jobs", job_id)
+
+    def _save(self, job: AnalysisJob) -> None:
+        """Append the events not written yet and replace the job's state (blocking)"""
+        job_dir = self._job_dir(job.meta["id"])
+        with job.write_lock:  # Writes of one job stay in order, whichever thread makes them
+            events = job.events[job.written:]
+            meta = dict(job.meta)
+            if events:
+                with open(os.path.join(job_dir, "events.ndjson"), "a", encoding="utf-8") as handle:
+                    handle.write("".join(json.dumps(event) + "\n" for event in events))
+                job.written += len(events)
+            path = os.path.join(job_dir, "job.json")
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump(meta, handle)
+            os.replace(temp_path, path)
+
+    async def _flush(self, job: AnalysisJob) -> None:
+        job.meta["updated_at"] = time.time()
+        await asyncio.to_thread(self._save, job)
+
+    def _read_meta(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return dict(job.meta)
+        try:
+            with open(os.path.join(self._job_dir(job_id), "job.json"), "r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if meta["status"] == "running" and time.time() - meta["updated_at"] > self.HEARTBEAT * 3:
+            meta["status"] = "interrupted"  # Its process went away without finishing it
+        return meta
+
+    def _read_events(self, job_id: str) -> List[Dict]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return list(job.events)
+        try:
+            with open(os.path.join(self._job_dir(job_id), "events.ndjson"), "r", encoding="utf-8") as handle:
+                return [json.loads(line) for line in handle if line.strip()]
+        except (OSError, ValueError):
+            return []
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.storage_dir, "results", key[:2], key + ".json")
+
+    def _cached(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._result_path(key), "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, entry: Dict) -> None:
+        path = self._result_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(entry, handle)
+        os.replace(temp_path, path)
+
+    # Planning
+
+    def _budget(self, prompt) -> int:
+        """Tokens of code (or notes) per request: the context window minus the prompt and the reply"""
+        reply = prompt.options.get("num_predict", 1000)
+        return max(256, self.context_tokens - prompt.static_tokens - reply - 64)
+
+    def _load(self, abs_path: str, language: str, analysis_type: str) -> Optional[Tuple[str, str]]:
+        """(text, result key) of a source file; None for empty, huge or unreadable files"""
+        try:
+            if os.path.getsize(abs_path) > self.MAX_FILE_SIZE:
+                return None
+            with open(abs_path, "rb") as handle:
+                data = handle.read()
+        except OSError:
+            return None
+        text = data.decode("utf-8", errors="replace")
+        if not text.strip():
+            return None
+        prompt = self.ai_service.prompts.get("analyze", analysis_type=analysis_type, language=language)
+        key = hashlib.sha1(json.dumps([analysis_type, language, prompt.model, prompt.system, prompt.user,
+                                       self._budget(prompt)]).encode("utf-8") + b"\0" + data).hexdigest()
+        return text, key
+
+    def _iter_files(self, root: str, paths: Optional[List[str]]):
+        if paths:
+            for rel_path in paths:
+                language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(rel_path)[1].lower())
+                if language:
+                    yield os.path.join(root, rel_path), language
+            return
+        for current, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if d not in self.skip_directories and not d.startswith("."))
+            for name in sorted(files):
+                language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(name)[1].lower())
+                if language:
+                    yield os.path.join(current, name), language
+
+    def _plan(self, root: str, analysis_type: str, paths: Optional[List[str]]) -> List[Dict]:
+        files = []
+        for abs_path, language in self._iter_files(root, paths):
+            loaded = self._load(abs_path, language, analysis_type)
+            if loaded is None:
+                continue
+            text, key = loaded
+            files.append({"path": os.path.relpath(abs_path, root), "language": language, "key": key,
+                          "tokens": estimate_tokens(text), "cached": self._cached(key)})
+        return files
+
+    # Running
+
+    def _publish(self, job: AnalysisJob, event: Dict) -> None:
+        """Hand an event to this worker's listeners; the heartbeat writes it to disk"""
+        job.events.append(event)
+        for waiter in job.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        job.waiters.clear()
+
+    def _report(self, job: AnalysisJob, entry: Dict, status: str, **fields) -> None:
+        meta = job.meta
+        meta["completed"] += 1
+        if status != "analysed":
+            meta[{"cached": "cached", "error": "errors"}[status]] += 1
+        _BATCH_FILES.labels(meta["analysis_type"], status).inc()
+        self._publish(job, {"type": "file", "path": entry["path"], "language": entry["language"],
+                            "status": status, **fields})
+
+    async def _ask(self, call, *args) -> str:
+        async with self._slots:
+            self._in_flight += 1
+            try:
+                return await call(*args)
+            finally:
+                self._in_flight -= 1
+
+    async def _analyse_file(self, job: AnalysisJob, entry: Dict) -> None:
+        meta = job.meta
+        started = time.perf_counter()
+        try:
+            # Read again: the file may have been edited since the job was planned
+            loaded = await asyncio.to_thread(self._load, os.path.join(meta["project_path"], entry["path"]),
+                                             entry["language"], meta["analysis_type"])
+            if loaded is None:
+                raise Exception("File is no longer readable")
+            text, key = loaded
+            prompt = self.ai_service.prompts.get("analyze", analysis_type=meta["analysis_type"],
+                                                 language=entry["language"])
+            chunks = split_into_chunks(text, self._budget(prompt))
+            answers = await asyncio.gather(*(self._ask(self.ai_service.analyze_code, piece, entry["language"],
+                                                       meta["analysis_type"]) for _, _, piece in chunks))
+            if len(chunks) == 1:
+                result = answers[0]
+            else:
+                result = "\n\n".join(f"Lines {first}-{last}:\n{answer}"
+                                     for (first, last, _), answer in zip(chunks, answers))
+            stored = {"result": result, "parts": len(chunks), "duration": round(time.perf_counter() - started, 3),
+                      "finished_at": time.time()}
+            await asyncio.to_thread(self._store, key, stored)
+            self._report(job, entry, "analysed", key=key, **stored)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._report(job, entry, "error", error=str(e), duration=round(time.perf_counter() - started, 3))
+
+    async def _summarize(self, project: str, analysis_type: str, results: List[Tuple[str, str]]) -> str:
+        """Reduce (path, result) pairs to one report, in rounds of requests that fit the context"""
+        prompt = self.ai_service.prompts.get("summarize", analysis_type=analysis_type)
+        budget = self._budget(prompt)
+        # At most a quarter of a request per entry, so every round shrinks the list
+        entries = [f"### {path}\n{truncate_to_tokens(result, budget // 4)}" for path, result in results]
+        while True:
+            groups: List[List[str]] = [[]]
+            used = 0
+            for entry in entries:
+                cost = estimate_tokens(entry) + 2
+                if groups[-1] and used + cost > budget:
+                    groups.append([])
+                    used = 0
+                groups[-1].append(entry)
+                used += cost
+            summaries = await asyncio.gather(*(self._ask(self.ai_service.summarize_analyses, "\n\n".join(group),
+                                                         project, analysis_type) for group in groups))
+            if len(summaries) == 1:
+                return summaries[0]
+            entries = [f"### Part {number} of {len(summaries)}\n{truncate_to_tokens(summary, budget // 4)}"
+                       for number, summary in enumerate(summaries, 1)]
+
+    async def _heartbeat(self, job: AnalysisJob) -> None:
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            if job.written < len(job.events) or time.time() - job.meta["updated_at"] >= self.HEARTBEAT:
+                await self._flush(job)
+
+    async def _run(self, job: AnalysisJob) -> None:
+        meta = job.meta
+        started = time.perf_counter()
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job))
+        try:
+            files = await asyncio.to_thread(self._plan, meta["project_path"], meta["analysis_type"], meta["paths"])
+            pending = [entry for entry in files if entry["cached"] is None]
+            meta["total"] = len(files)
+            self._publish(job, {"type": "plan", "total": len(files), "to_analyse": len(pending),
+                                "cached": len(files) - len(pending),
+                                "tokens": sum(entry["tokens"] for entry in pending),
+                                "concurrency": self.concurrency})
+            for entry in files:
+                if entry["cached"] is not None:
+                    self._report(job, entry, "cached", key=entry["key"], **entry["cached"])
+
+            # A few files ahead of the free request slots keeps them busy without reading every file at once
+            queue = list(reversed(pending))
+
+            async def worker():
+                while queue:
+                    await self._analyse_file(job, queue.pop())
+
+            await asyncio.gather(*(worker() for _ in range(min(len(pending), self.concurrency * 2))))
+
+            analysed = sorted((event["path"], event["key"], event["result"]) for event in job.events
+                              if event["type"] == "file" and event["status"] != "error")
+            if analysed:
+                prompt = self.ai_service.prompts.get("summarize", analysis_type=meta["analysis_type"])
+                key = hashlib.sha1(json.dumps([prompt.model, prompt.system, prompt.user, self._budget(prompt)] +
+                                              [[path, file_key] for path, file_key, _ in analysed])
+                                   .encode("utf-8")).hexdigest()
+                stored = await asyncio.to_thread(self._cached, key)
+                if stored is None:
+                    summary = await self._summarize(meta["project_path"], meta["analysis_type"],
+                                                    [(path, result) for path, _, result in analysed])
+                    await asyncio.to_thread(self._store, key, {"result": summary, "finished_at": time.time()})
+                else:
+                    summary = stored["result"]
+                self._publish(job, {"type": "summary", "summary": summary, "files": len(analysed),
+                                    "cached": stored is not None})
+            meta["status"] = "done"
+        except asyncio.CancelledError:
+            meta["status"] = "cancelled" if meta["status"] == "running" else meta["status"]
+            raise
+        except Exception as e:
+            meta["status"] = "failed"
+            meta["error"] = str(e)
+        finally:
+            heartbeat.cancel()
+            meta["duration"] = round(time.perf_counter() - started, 3)
+            self._publish(job, {"type": "done", **{name: meta.get(name) for name in (
+                "status", "error", "total", "completed", "cached", "errors", "duration")}})
+            await self._flush(job)
+
+    # Public API
+
+    def job_id(self, root: str, analysis_type: str, paths: Optional[List[str]]) -> str:
+        spec = json.dumps([root, analysis_type, sorted(paths) if paths else None])
+        return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:12]
+
+    def start(self, project_path: str, analysis_type: str, paths: Optional[List[str]] = None) -> AnalysisJob:
+        """Start (or, while it runs, attach to) the job for this project, analysis type and paths"""
+        if analysis_type not in ANALYSIS_TYPES:
+            raise Exception(f"Unknown analysis type: {analysis_type}")
+        root = os.path.realpath(os.path.abspath(project_path))
+        if not os.path.isdir(root):
+            raise Exception(f"Not a directory: {project_path}")
+        if paths:
+            relative = []
+            for path in paths:
+                path = os.path.relpath(os.path.realpath(os.path.join(root, path)), root)
+                if path.startswith(os.pardir):
+                    raise Exception(f"Path outside the project: {path}")
+                relative.append(path)
+            paths = sorted(set(relative))
+
+        job_id = self.job_id(root, analysis_type, paths)
+        job = self.jobs.get(job_id)
+        if job is not None and not job.finished:
+            return job
+        previous = self._read_meta(job_id)
+        if previous is not None and previous["status"] == "running":
+            raise Exception(f"Job {job_id} is running in another worker")
+
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        with open(os.path.join(job_dir, "events.ndjson"), "w", encoding="utf-8"):
+            pass  # Files done before are reported again, from the result store
+        job = AnalysisJob({"id": job_id, "project_path": root, "analysis_type": analysis_type, "paths": paths,
+                           "status": "running", "pid": os.getpid(), "created_at": time.time(),
+                           "total": None, "completed": 0, "cached": 0, "errors": 0, "error": None,
+                           "runs": (previous or {}).get("runs", 0) + 1, "updated_at": time.time()})
+        self._save(job)
+        self.jobs[job_id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    def resume(self, job_id: str) -> AnalysisJob:
+        """Run an interrupted, failed or cancelled job again; files with a stored result are not re-analysed"""
+        meta = self._read_meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        return self.start(meta["project_path"], meta["analysis_type"], meta["paths"])
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict]:
+        """The job's state, every event so far, then new ones as they happen until it finishes"""
+        meta = self._read_meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        yield {"type": "job", **meta}
+        job = self.jobs.get(job_id)
+        if job is None:  # Finished, or run by another worker: replay what it wrote
+            for event in await asyncio.to_thread(self._read_events, job_id):
+                yield event
+            return
+        position = 0
+        while True:
+            while position < len(job.events):
+                position += 1
+                yield job.events[position - 1]
+            if position and job.events[position - 1]["type"] == "done":
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            job.waiters.append(waiter)
+            await waiter
+
+    def get_job(self, job_id: str) -> Dict:
+        meta = self._read_meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        events = self._read_events(job_id)
+        summary = next((event for event in events if event["type"] == "summary"), None)
+        return {**meta, "files": [event for event in events if event["type"] == "file"],
+                "summary": summary["summary"] if summary else None}
+
+    def list_jobs(self) -> List[Dict]:
+        try:
+            job_ids = os.listdir(os.path.join(self.storage_dir, "jobs"))
+        except OSError:
+            job_ids = []
+        jobs = [meta for meta in (self._read_meta(job_id) for job_id in job_ids) if meta is not None]
+        return sorted(jobs, key=lambda meta: meta["created_at"], reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.task.cancel()
+        return True
+
+    def delete(self, job_id: str) -> bool:
+        """Forget a finished job; stored file results stay for later runs"""
+        job = self.jobs.get(job_id)
+        if job is not None and not job.finished:
+            raise Exception(f"Job {job_id} is still running")
+        self.jobs.pop(job_id, None)
+        if not os.path.isdir(self._job_dir(job_id)):
+            return False
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        return True
+
+    async def shutdown(self) -> None:
+        """Stop running jobs, leaving them "interrupted" for a resume after the restart"""
+        running = [job for job in self.jobs.values() if not job.finished]
+        for job in running:
+            job.meta["status"] = "interrupted"
+            job.task.cancel()
+        await asyncio.gather(*(job.task for job in running), return_exceptions=True)
@@ -0,0 +1,449 @@
+# backend/app/services/completion_normalizer.py
+import re
+from operator import sub
+from typing import Optional
+
+# Prose the model puts in front of the code, matched case-insensitively in one
+# pass, any number of times and in any order (fences included)
+_PREAMBLE = re.compile(
+    r"(?:\s*(?:```[\w+#.-]*"
+    r"|here(?:'s| is) (?:the|what) (?:completion|completed code|missing part|should be added)\s*:?"
+    r"|the (?:completion|missing code) is\s*:"
+    r"|you (?:can complete it with|need to add)\s*:"
+    r"|complete with\s*:|add this\s*:"
+    r"|(?://|#|/\*|<!--)?\s*completion\s*:"
+    r"|answer\s*:|response\s*:"
+    r"|[\w+#]+ completion\s*:|the [\w+#]+ code\s*:))+[ \t]*",
+    re.IGNORECASE,
+)
+
+# Closing fences, rules and sign-offs at the end of the completion
+_TRAILER = re.compile(
+    r"(?:\s*(?:```|---|\*\*\*|###|~~~|end of completion|that's the completion|this completes the code)\s*)+$",
+    re.IGNORECASE,
+)
+_TRAILER_WINDOW = 160  # Only the tail can hold a trailer; keeps the $-anchored search short
+_TRAILER_LAST_CHARS = set('`-*#~ne')  # Last character of every trailer; anything else skips the search
+
+# First fenced block when the model wrapped the code in prose
+_FENCED_BLOCK = re.compile(r"```[\w+#.-]*[ \t]*\n(.*?)(?:\n[ \t]*```|\Z)", re.DOTALL)
+
+_BLANK_RUNS = re.compile(r"\n[ \t]*\n(?:[ \t]*\n)+")
+_LEADING_WS = re.compile(r"[ \t]*")
+
+BRACE_LANGUAGES = {'javascript', 'typescript', 'java', 'cpp', 'c', 'csharp', 'go', 'rust', 'php', 'css'}
+_LINE_COMMENT = {'python': '#', 'ruby': '#', 'shell': '#', 'bash': '#', 'yaml': '#'}
+_PAIRS = {'(': ')', '[': ']', '{': '}'}
+_BRACKETS = frozenset('()[]{}')
+_CLOSERS = {')': '(', ']': '[', '}': '{'}
+_QUOTES = '"\'`'
+# Characters _unbalanced stops at, per line-comment style
+_SPECIAL_HASH = re.compile(r"[()\[\]{}\"'`#]")
+_SPECIAL_SLASH = re.compile(r"[()\[\]{}\"'`]|//")
+# Strings and comments as _unbalanced reads them: a quote closes at the next unescaped one on its line
+_STRINGS = r"\"(?:[^\"\n]|(?<=\\)\")*+\"|'(?:[^'\n]|(?<=\\)')*+'|`(?:[^`]|(?<=\\)`)*+`"
+_SKIPPED_HASH = re.compile(_STRINGS + r"|#[^\n]*")
+_SKIPPED_SLASH = re.compile(_STRINGS + r"|//[^\n]*")
+_NOT_BRACKETS = re.compile(r"[^()\[\]{}]+")
+_CLOSING_PUNCTUATION = set(')]}>"\'`;,:')
+
+_STEPS = range(1, 9)   # Indentation increases counted as a step
+
+MIN_OVERLAP = 4        # Shorter overlaps are trimmed only if made of closing punctuation
+MAX_OVERLAP = 2000     # Longest suffix/prefix overlap considered
+INDENT_LINES = 16      # Lines before the cursor read for the indentation step (half as many after it)
+STOP_CONTEXT = 4000    # Characters before the cursor scanned for brackets still open there
+
+# Lines that continue a statement whose block just ended
+_PYTHON_CONTINUATIONS = re.compile(r"(?:elif|else|except|finally)\b")
+_BRACE_CONTINUATIONS = re.compile(r"(?:else|catch|finally|while)\b|[)\],.]")
+_NEWLINE_TERMINATED = {'go'}  # Brace languages whose statements end at a line end, not at `;`
+_OPEN_ENDINGS = ('{', '(', '[', ',', '.', '+', '-', '*', '/', '=', '&&', '||', ':')
+
+
+def strip_wrapping(completion: str) -> str:
+    """Remove fences, preambles and sign-offs around the generated code"""
+    fenced = _FENCED_BLOCK.search(completion) if '```' in completion else None
+    if fenced is not None:
+        completion = fenced.group(1)
+    else:
+        preamble = _PREAMBLE.match(completion)
+        if preamble is not None:
+            completion = completion[preamble.end():]
+
+    completion = completion.rstrip()
+    if completion[-1:].lower() in _TRAILER_LAST_CHARS:
+        trailer = _TRAILER.search(completion, max(0, len(completion) - _TRAILER_WINDOW))
+        if trailer is not None:
+            completion = completion[:trailer.start()]
+    return completion.strip('\n').rstrip()
+
+
+def suffix_prefix_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`.
+
+    Candidate starts are the occurrences of right[0] in the tail of `left`,
+    tried longest first; each check is a single C-level startswith. For
+    completion-sized inputs this beats a pure-Python KMP prefix table by
+    an order of magnitude.
+    """
+    size = min(len(left), len(right), MAX_OVERLAP)
+    if not size:
+        return 0
+    first = right[0]
+    start = left.find(first, len(left) - size)
+    while start >= 0:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(first, start + 1)
+    return 0
+
+
+def trim_suffix_overlap(completion: str, after_cursor: str, language: str = '') -> str:
+    """Drop the tail of the completion that repeats the text after the cursor"""
+    following = after_cursor.lstrip(' \t\n')
+    body = completion.rstrip()
+    overlap = suffix_prefix_overlap(body, following)
+    if not overlap:
+        return completion
+    repeated = body[-overlap:]
+    if not repeated.strip():
+        return completion
+    if overlap < MIN_OVERLAP:
+        if not set(repeated) <= _CLOSING_PUNCTUATION:
+            return completion
+        # A closer the completion itself opened is not a duplicate of the one after the cursor
+        closers = sum(1 for char in repeated if char in _CLOSERS)
+        if closers > len(_unbalanced(body, language)[1]):
+            return completion
+    trimmed = body[:-overlap]
+    # The text after the cursor brings its own leading whitespace
+    return trimmed.rstrip() if len(following) != len(after_cursor) else trimmed
+
+
+def _bracket_residue(code: str, language: str) -> str:
+    """The brackets in code, outside strings and comments, with matched pairs cancelled"""
+    if '"' in code or "'" in code or '`' in code or ('#' if _LINE_COMMENT.get(language) == '#' else '//') in code:
+        code = (_SKIPPED_HASH if _LINE_COMMENT.get(language) == '#' else _SKIPPED_SLASH).sub('', code)
+    brackets = _NOT_BRACKETS.sub('', code)
+    while True:
+        reduced = brackets.replace('()', '').replace('[]', '').replace('{}', '')
+        if reduced == brackets:
+            return reduced
+        brackets = reduced
+
+
+def _unbalanced(code: str, language: str):
+    """(openers left open, closers with no opener) in code, skipping strings and comments"""
+    # Cancelling adjacent pairs in C settles the usual case; only openers left open need their positions
+    residue = _bracket_residue(code, language)
+    if not residue.strip(')]}'):
+        return [], list(residue)
+    special = _SPECIAL_HASH if _LINE_COMMENT.get(language) == '#' else _SPECIAL_SLASH
+    stack, stray = [], []
+    match = special.search(code)
+    while match is not None:
+        char, i = match.group(), match.start()
+        if char in _PAIRS:
+            stack.append((char, i))
+        elif char in _CLOSERS:
+            if stack and stack[-1][0] == _CLOSERS[char]:
+                stack.pop()
+            else:
+                stray.append(char)
+        elif char in _QUOTES:
+            end = code.find(char, i + 1)
+            while end > 0 and code[end - 1] == '\\':
+                end = code.find(char, end + 1)
+            if end >= 0 and (char == '`' or '\n' not in code[i:end]):
+                match = special.search(code, end + 1)
+                continue
+            # Unterminated on this line: treat the quote as plain text
+        else:
+            newline = code.find('\n', i)
+            if newline < 0:
+                break
+            match = special.search(code, newline)
+            continue
+        match = special.search(code, i + 1)
+    return stack, stray
+
+
+def _line_indent(text: str, position: int) -> str:
+    start = text.rfind('\n', 0, position) + 1
+    return _LEADING_WS.match(text, start).group()
+
+
+def _indent_step(indents) -> Optional[str]:
+    steps = [step for step in map(sub, indents[1:], indents) if 0 < step <= 8]
+    if not steps:
+        return None
+    return ' ' * max(_STEPS, key=lambda step: (steps.count(step), -step))
+
+
+def _indent_unit(before_cursor: str, after_cursor: str = '', completion: str = '') -> str:
+    """The buffer's indentation step: a tab, or the commonest increase in leading spaces.
+
+    The couple of dozen lines around the cursor are enough. The cursor line
+    counts with the indentation typed so far, which editors set to the
+    file's step. With nothing indented around the cursor, the completion's
+    own step is used, then four spaces.
+    """
+    window = before_cursor[-600:]
+    following = after_cursor[:300]
+    if '\n\t' in window or '\n\t' in following or window.startswith('\t'):
+        return '\t'
+    lines = window.split('\n')
+    cursor_line = lines.pop()
+    if lines and len(before_cursor) > len(window):
+        lines.pop(0)  # Cut by the window
+    indents = [len(line) - len(line.lstrip(' ')) for line in lines[-INDENT_LINES:] if line.strip()]
+    if cursor_line and not cursor_line.strip():
+        indents.append(len(cursor_line))
+    indents += [len(line) - len(line.lstrip(' ')) for line in following.split('\n', INDENT_LINES // 2 + 1)[1:-1]
+                if line.strip()]
+    unit = _indent_step(indents)
+    if unit is None and completion:
+        unit = _indent_step([len(line) - len(line.lstrip(' ')) for line in completion.split('\n')[:40]
+                             if line.strip()])
+    return unit or '    '
+
+
+def _reindent_block(completion: str, target: str) -> str:
+    """Put a block body on its own lines at indentation `target`"""
+    lines = completion.lstrip('\n').split('\n')
+    if lines[0][:1] not in (' ', '\t') and all(line.startswith(target) for line in lines[1:] if line.strip()):
+        # Only the first line lost its indentation (the usual model output)
+        lines[0] = target + lines[0]
+    else:
+        # A closing bracket the model put back at the opener's level does not set the body's indentation
+        body = lines[:-1] if len(lines) > 1 and lines[-1].strip()[:1] in ')]}' else lines
+        common = min((len(line) - len(line.lstrip(' \t')) for line in body if line.strip()), default=0)
+        reindented = [target + line[common:] if line.strip() else '' for line in body]
+        if len(body) < len(lines):
+            last = lines[-1]
+            reindented.append(target + last[min(common, len(last) - len(last.lstrip(' \t'))):]
+                              if last.strip() else '')
+        lines = reindented
+    return '\n' + '\n'.join(lines)
+
+
+def _opens_block(line: str, language: str) -> bool:
+    return (language == 'python' and line.endswith(':')) or \
+           (language in BRACE_LANGUAGES and line.endswith('{'))
+
+
+def balance_completion(completion: str, before_cursor: str, after_cursor: str, language: str) -> str:
+    """Fix indentation after a block opener and close brackets the completion left open"""
+    if not completion:
+        return completion
+    opener_line = before_cursor.rstrip(' \t')
+    line_start = before_cursor.rfind('\n') + 1
+    current_line = before_cursor[line_start:]
+    if '\n' not in completion and _BRACKETS.isdisjoint(completion) and current_line.strip() \
+            and not opener_line.endswith((':', '{')):
+        return completion  # Mid-line, nothing to indent or close
+
+    if _opens_block(opener_line, language) and not completion.startswith('\n'):
+        # Cursor right after ':' or '{': the body goes on the next line, one level in
+        base = _line_indent(before_cursor, len(opener_line))
+        completion = _reindent_block(completion, base + _indent_unit(before_cursor, after_cursor, completion))
+        last_line = completion.rfind('\n') + 1
+        if language in BRACE_LANGUAGES and completion[last_line:].strip().startswith('}'):
+            # The model closed the block itself: the brace goes back to the opener's level
+            completion = completion[:last_line] + base + completion[last_line:].lstrip(' \t')
+    elif line_start and not current_line.strip():
+        # Cursor on a blank line; the indentation typed so far is already in the buffer
+        previous = before_cursor[:line_start].rstrip()
+        target = current_line
+        if _opens_block(previous, language):
+            wanted = _line_indent(previous, len(previous)) + _indent_unit(before_cursor, after_cursor, completion)
+            target = wanted if len(wanted) > len(current_line) else current_line
+        block = _reindent_block(completion.strip('\n'), target)[1:]
+        completion = block[len(current_line):] if block.startswith(current_line) else block.lstrip(' \t')
+
+    stack, stray = _unbalanced(completion, language)
+    following = after_cursor.lstrip(' \t\n')
+    close_block = language in BRACE_LANGUAGES and opener_line.endswith('{') and '}' not in stray \
+        and not following.startswith('}') and not completion.rstrip().endswith('}')
+
+    closing = []
+    for char, position in reversed(stack):
+        closer = _PAIRS[char]
+        if not closing and following.startswith(closer):
+            following = following[1:].lstrip(' \t\n')
+            continue  # The editor already auto-closed this one
+        if char == '{' and '\n' in completion[position:]:
+            closing.append('\n' + _line_indent(completion, position) + closer)
+        else:
+            closing.append(closer)
+    completion += ''.join(closing)
+
+    if close_block:
+        completion += '\n' + _line_indent(before_cursor, len(opener_line)) + '}'
+    return completion
+
+
+class CompletionStopper:
+    """Finds the point where a streamed completion has finished the code at the cursor.
+
+    `feed` takes the raw model output piece by piece and returns True once
+    the inserted text closes the current statement or block; `text` is then
+    the output up to that point (still to be normalized). A whole block is
+    only wanted when the cursor is in one with no body yet. In Python a
+    statement ends at a line end with its brackets balanced, counting those
+    opened before the cursor, and a block at the first line indented no
+    deeper than its opener. In brace languages a statement ends at `;` (a
+    line end in Go, or a `}` not followed by else/catch) and a block at the
+    `}` that closes the one the cursor is in. In any language a line
+    repeating the first line after the cursor, or a closing fence, ends the
+    completion. Decisions are taken at line ends only, never before the
+    first line.
+    """
+
+    def __init__(self, before_cursor: str, after_cursor: str, language: str):
+        self.language = language
+        self.raw = ''
+        self.end: Optional[int] = None
+        self.reason: Optional[str] = None
+        self._checked = 0                      # Output before this is in lines already examined
+        self._code_start: Optional[int] = None  # Where the code starts, after any prose or fence
+        self._fenced = False
+        self._lines = 0
+        self._previous = ''                    # Last code line examined
+        self._opened_block = False
+        self._closed_block = False             # Brace languages: a `}` ended the last line
+
+        line_start = before_cursor.rfind('\n') + 1
+        current_line = before_cursor[line_start:]
+        self._mid_line = bool(current_line.strip())
+        self._cursor_indent = len(_LEADING_WS.match(current_line).group())
+        self._statement_indent = self._cursor_indent
+        opener = before_cursor.rstrip()
+        following_lines = [line for line in after_cursor.split('\n', 20)[:20] if line.strip()]
+        self._block_indent = None  # Set when the cursor is in a block with no body yet: the body is wanted
+        if _opens_block(opener, language):
+            indent = len(_line_indent(opener, len(opener)))
+            after = following_lines[0] if following_lines else ''
+            if len(_LEADING_WS.match(after).group()) <= indent or after.strip().startswith('}'):
+                self._block_indent = indent
+
+        context_start = 0
+        if len(before_cursor) > STOP_CONTEXT:
+            context_start = before_cursor.find('\n', len(before_cursor) - STOP_CONTEXT) + 1
+        stack, _ = _unbalanced(before_cursor[context_start:], language)
+        open_before = sum(1 for char, _ in stack if language == 'python' or char != '{')
+        # Closers the editor already put after the cursor will not come from the model
+        rest = after_cursor.split('\n', 1)[0].lstrip(' \t')
+        auto_closed = len(rest) - len(rest.lstrip(')]}'))
+        self._open_before = max(0, open_before - auto_closed)
+
+        following = following_lines[0].strip() if following_lines else ''
+        self._following = following if len(following) >= MIN_OVERLAP and \
+            not set(following) <= _CLOSING_PUNCTUATION else ''
+
+    @property
+    def text(self) -> str:
+        return self.raw if self.end is None else self.raw[:self.end]
+
+    def feed(self, piece: str) -> bool:
+        self.raw += piece
+        newline = self.raw.find('\n', self._checked)
+        while newline >= 0 and self.end is None:
+            self._line(self._checked, newline)
+            self._checked = newline + 1
+            newline = self.raw.find('\n', self._checked)
+        return self.end is not None
+
+    def _stop(self, position: int, reason: str) -> None:
+        self.end, self.reason = position, reason
+
+    def _depths(self, end: int):
+        """(brackets, braces) open at `end` of the output, relative to the cursor"""
+        stack, stray = _unbalanced(self.raw[self._code_start:end], self.language)
+        if self.language == 'python':
+            return self._open_before + len(stack) - len(stray), 0
+        braces = sum(1 for char, _ in stack if char == '{') - stray.count('}')
+        brackets = sum(1 for char, _ in stack if char != '{') - (len(stray) - stray.count('}'))
+        return self._open_before + brackets, braces
+
+    def _line(self, start: int, end: int) -> None:
+        stripped = self.raw[start:end].strip()
+        if stripped.startswith('```'):
+            if self._fenced:
+                self._stop(start, 'fence')
+            else:
+                # An opening fence: anything before it was prose
+                self._fenced, self._code_start, self._lines = True, end + 1, 0
+                self._opened_block = self._closed_block = False
+            return
+        if self._code_start is None:
+            preamble = _PREAMBLE.match(self.raw, start, end)
+            if preamble is not None and not self.raw[preamble.end():end].strip():
+                return  # Prose before the code
+            self._code_start = preamble.end() if preamble is not None else start
+        line = self.raw[max(start, self._code_start):end]
+        if not line.strip():
+            return
+        first = self._lines == 0
+        self._lines += 1
+        if not first and line.strip() == self._following:
+            self._stop(start, 'after_cursor')  # The model went on into the code after the cursor
+        elif self.language == 'python':
+            self._python_line(start, end, line, first)
+        elif self.language in BRACE_LANGUAGES:
+            self._brace_line(start, end, line, first)
+        self._previous = line.strip()
+
+    def _python_line(self, start: int, end: int, line: str, first: bool) -> None:
+        indent = len(_LEADING_WS.match(line).group())
+        if first:
+            # The first line carries on from the cursor, whatever indentation the model gave it
+            indent = self._cursor_indent + (0 if self._mid_line else indent)
+            self._statement_indent = indent
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            return
+        if not first and self._depths(start)[0] <= 0 and not self._previous.endswith('\\') \
+                and not self._previous.startswith('@'):
+            if self._block_indent is not None:
+                if indent <= self._block_indent:
+                    self._stop(start, 'dedent')
+                    return
+            elif indent < self._statement_indent or (indent == self._statement_indent and not (
+                    self._opened_block and _PYTHON_CONTINUATIONS.match(stripped))):
+                self._stop(start, 'dedent' if self._opened_block else 'statement')
+                return
+        if self._block_indent is None and indent == self._statement_indent and self._depths(end)[0] <= 0:
+            if stripped.endswith(':'):
+                self._opened_block = True
+            elif not self._opened_block and not stripped.endswith(('\\', ',')) and not stripped.startswith('@'):
+                self._stop(end, 'statement')
+
+    def _brace_line(self, start: int, end: int, line: str, first: bool) -> None:
+        stripped = line.strip()
+        if stripped.startswith(('//', '/*', '*')):
+            return
+        brackets, braces = self._depths(end)
+        if self._block_indent is not None:
+            if braces < 0:
+                self._stop(end, 'block')  # The `}` closing the block the cursor opened
+            return
+        if braces < 0 and not first:
+            self._stop(start, 'block')  # Closes the enclosing block, which the code after the cursor does
+        elif self._closed_block and not first and not _BRACE_CONTINUATIONS.match(stripped) \
+                and self._depths(start) == (0, 0):
+            self._stop(start, 'statement')
+        elif brackets <= 0 and braces == 0:
+            if stripped.endswith(';') or (self.language in _NEWLINE_TERMINATED
+                                          and not stripped.endswith(_OPEN_ENDINGS)):
+                self._stop(end, 'statement')
+            self._closed_block = stripped.endswith('}')
+
+
+def normalize_completion(raw: str, before_cursor: str, after_cursor: str, language: str) -> str:
+    """Raw model output -> text ready to insert at the cursor"""
+    completion = strip_wrapping(raw)
+    completion = trim_suffix_overlap(completion, after_cursor, language)
+    completion = balance_completion(completion, before_cursor, after_cursor, language)
+    return _BLANK_RUNS.sub('\n\n', completion)
@@ -0,0 +1,495 @@
+# backend/app/services/diagnostics_service.py
+import ast
+import builtins
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from app.services.metrics import REGISTRY
+from app.services.symbol_service import LANGUAGE_BY_EXTENSION
+
+_CHECKS = REGISTRY.counter("echoide_diagnostics_checks_total", "Diagnostics requests by language and outcome",
+                           ["language", "outcome"])  # outcome: run, cached, superseded
+_CHECK_SECONDS = REGISTRY.histogram("echoide_diagnostics_check_seconds", "Time to check one file", ["language"])
+
+# Names every module can use without binding them
+_BUILTINS = set(dir(builtins)) | {
+    "__file__", "__name__", "__doc__", "__builtins__", "__spec__", "__loader__", "__package__", "__path__",
+    "__annotations__", "__dict__", "__module__", "__qualname__", "__class__", "__debug__", "WindowsError",
+}
+
+_GCC_LINE = re.compile(r"^(.*?):(\d+):(\d+): (fatal error|error|warning): (.*)$")
+_JAVAC_LINE = re.compile(r"^(.*?):(\d+): (error|warning): (.*)$")
+_NODE_LOCATION = re.compile(r"^(.*):(\d+)$")
+_NODE_MESSAGE = re.compile(r"^(\w*Error): (.*)$")
+_ES_MODULE = re.compile(r"^\s*(import\s[^(]|export\s)", re.MULTILINE)
+
+CHECK_TIMEOUT = 20.0
+
+
+def _diagnostic(line: int, column: int, message: str, source: str, severity: str = "error") -> Dict:
+    return {"line": line, "column": column, "severity": severity, "message": message, "source": source}
+
+
+class _Scope:
+    def __init__(self, kind: str, parent: Optional["_Scope"]):
+        self.kind = kind
+        self.parent = parent
+        self.names = set()
+        self.globals = set()
+
+
+class _UndefinedNames(ast.NodeVisitor):
+    """Names that are read but bound nowhere they could be found, like pyflakes' "undefined name".
+
+    Flow-insensitive on purpose: a binding anywhere in a scope counts, so
+    code that defines a name later in the module (or only in one branch)
+    is not flagged. A module with `from x import *` is not checked at all.
+    """
+
+    def __init__(self):
+        self.module = _Scope("module", None)
+        self.scope = self.module
+        self.loads = []
+        self.star_import = False
+
+    def _bind(self, name: str) -> None:
+        (self.module if name in self.scope.globals else self.scope).names.add(name)
+
+    def _enter(self, kind: str) -> _Scope:
+        self.scope = _Scope(kind, self.scope)
+        return self.scope
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loads.append((node.id, node, self.scope))
+        else:
+            self._bind(node.id)
+
+    def _visit_function(self, node):
+        # Decorators, defaults and annotations are evaluated where the function is defined
+        lambda_ = isinstance(node, ast.Lambda)
+        args = node.args
+        all_args = args.posonlyargs + args.args + args.kwonlyargs + [arg for arg in (args.vararg, args.kwarg) if arg]
+        outer = [] if lambda_ else list(node.decorator_list) + [arg.annotation for arg in all_args] + [node.returns]
+        for expression in outer + args.defaults + args.kw_defaults:
+            if expression is not None:
+                self.visit(expression)
+        if not lambda_:
+            self._bind(node.name)
+        previous = self.scope
+        scope = self._enter("function")
+        scope.names.update(arg.arg for arg in all_args)
+        for statement in ([node.body] if lambda_ else node.body):
+            self.visit(statement)
+        self.scope = previous
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _visit_function
+
+    def visit_ClassDef(self, node):
+        for expression in node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]:
+            self.visit(expression)
+        previous = self.scope
+        self._enter("class")
+        for statement in node.body:
+            self.visit(statement)
+        self.scope = previous
+        self._bind(node.name)
+
+    def _visit_comprehension(self, node):
+        self.visit(node.generators[0].iter)  # The first iterable is evaluated outside
+        previous = self.scope
+        self._enter("comprehension")
+        for position, generator in enumerate(node.generators):
+            self.visit(generator.target)
+            if position:
+                self.visit(generator.iter)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for field in ("elt", "key", "value"):
+            if hasattr(node, field):
+                self.visit(getattr(node, field))
+        self.scope = previous
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        scope = self.scope
+        while scope.kind == "comprehension":  # := binds in the enclosing function
+            scope = scope.parent
+        scope.names.add(node.target.id)
+
+    def visit_Global(self, node):
+        self.scope.globals.update(node.names)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._bind(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_import = True
+            else:
+                self._bind(alias.asname or alias.name)
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node):
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self._bind(node.name)
+
+    def visit_MatchMapping(self, node):
+        if node.rest:
+            self._bind(node.rest)
+        self.generic_visit(node)
+
+    def _resolves(self, name: str, scope: _Scope) -> bool:
+        if name in scope.globals:
+            return name in self.module.names
+        current = scope
+        while current is not None:
+            # A class body's names are not visible from functions or comprehensions inside it
+            if (current.kind != "class" or current is scope) and name in current.names:
+                return True
+            current = current.parent
+        return False
+
+    def undefined(self) -> List[Dict]:
+        if self.star_import:
+            return []
+        found, seen = [], set()
+        for name, node, scope in self.loads:
+            if name in _BUILTINS or (name, node.lineno) in seen or self._resolves(name, scope):
+                continue
+            seen.add((name, node.lineno))
+            found.append(_diagnostic(node.lineno, node.col_offset, f"undefined name '{name}'", "names"))
+        return found
+
+
+def check_python(text: str, filename: str = "<buffer>") -> List[Dict]:
+    try:
+        tree = ast.parse(text, filename)
+        compile(tree, filename, "exec")  # Errors the parser lets through: 'return' outside function, ...
+    except SyntaxError as e:
+        return [_diagnostic(e.lineno or 1, max(0, (e.offset or 1) - 1), e.msg, "syntax")]
+    except ValueError as e:  # Null bytes
+        return [_diagnostic(1, 0, str(e), "syntax")]
+    checker = _UndefinedNames()
+    checker.visit(tree)
+    return checker.undefined()
+
+
+def _run(command: List[str], cwd: str) -> str:
+    try:
+        process = subprocess.run(command, cwd=cwd, capture_output=True, text=True, encoding="utf-8",
+                                 errors="replace", timeout=CHECK_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return ""
+    return process.stdout + process.stderr
+
+
+def _check_compiled(language: str, text: str, path: str, tool: str) -> List[Dict]:
+    """gcc/g++ -fsyntax-only or javac on a copy of the buffer (which may be unsaved)"""
+    source_dir = os.path.dirname(path) or "."
+    with tempfile.TemporaryDirectory(prefix="echoide-diag-") as workdir:
+        copy = os.path.join(workdir, os.path.basename(path))  # javac wants the public class's file name
+        with open(copy, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        if language == "java":
+            output = _run([tool, "-proc:none", "-Xlint:none", "-d", workdir, "-sourcepath", source_dir, copy], workdir)
+            return [_diagnostic(int(line), 0, message, "javac", severity)
+                    for file, line, severity, message in (match.groups() for match in map(_JAVAC_LINE.match,
+                                                                                          output.splitlines()) if match)
+                    if os.path.basename(file) == os.path.basename(copy)]
+        # Quoted includes resolve against the real file's directory
+        output = _run([tool, "-fsyntax-only", "-iquote", source_dir, "-I", source_dir, copy], workdir)
+        diagnostics = []
+        for line in output.splitlines():
+            match = _GCC_LINE.match(line)
+            if match and os.path.basename(match.group(1)) == os.path.basename(copy):
+                severity = "warning" if match.group(4) == "warning" else "error"
+                diagnostics.append(_diagnostic(int(match.group(2)), int(match.group(3)) - 1, match.group(5),
+                                               os.path.basename(tool), severity))
+        return diagnostics
+
+
+def _check_javascript(text: str, path: str, node: str) -> List[Dict]:
+    # node --check reads .js as CommonJS; code with import/export statements is checked as a module
+    extension = ".mjs" if _ES_MODULE.search(text) else ".cjs"
+    with tempfile.TemporaryDirectory(prefix="echoide-diag-") as workdir:
+        copy = os.path.join(workdir, "buffer" + extension)
+        with open(copy, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        lines = _run([node, "--check", copy], workdir).splitlines()
+    if not lines:
+        return []
+    location = _NODE_LOCATION.match(lines[0])
+    message = next((match for match in map(_NODE_MESSAGE.match, lines) if match), None)
+    if not location or not message:
+        return []
+    caret = next((line for line in lines[1:4] if line.strip() and set(line.strip()) == {"^"}), "")
+    return [_diagnostic(int(location.group(2)), max(0, caret.find("^")),
+                        f"{message.group(1)}: {message.group(2)}", "node")]
+
+
+def _under(path: str, prefix: Optional[str]) -> bool:
+    return prefix is None or path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep)
+
+
+def run_checks(language: str, text: str, path: str, tools: Dict[str, Optional[str]]) -> List[Dict]:
+    """Diagnostics for one buffer; runs in the process pool"""
+    if language == "python":
+        return check_python(text, path)
+    if language == "javascript" and tools.get("node"):
+        return _check_javascript(text, path, tools["node"])
+    if language in ("c", "cpp", "java"):
+        tool = tools.get({"c": "gcc", "cpp": "g++", "java": "javac"}[language])
+        if tool:
+            return _check_compiled(language, text, path, tool)
+    return []
+
+
+class Subscription:
+    """One editor connection; events are handed to its event loop from checker threads"""
+
+    def __init__(self, loop, prefix: Optional[str] = None):
+        import asyncio
+        self.loop = loop
+        self.prefix = prefix
+        self.queue: "asyncio.Queue[Dict]" = asyncio.Queue()
+
+    def push(self, event: Dict) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+
+class DiagnosticsService:
+    """Fast local checks of saved and edited files, pushed to subscribed editors.
+
+    Python gets syntax errors (from the parser and compiler) and undefined
+    names; JavaScript, C, C++ and Java get `node --check`, `gcc/g++
+    -fsyntax-only` and `javac` where those are installed. Checks run in a
+    small process pool. Results are cached by content hash, so undoing an
+    edit or saving an unchanged buffer costs a dictionary lookup. A submit
+    waits `debounce` seconds; another submit for the same file in that time
+    (or while the check runs) supersedes it, and a superseded result is
+    never published.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, debounce: float = 0.25, cache_size: int = 4096):
+        self.max_workers = max_workers or max(1, min(2, (os.cpu_count() or 2) - 1))
+        self.debounce = debounce
+        self.cache_size = cache_size
+        self.tools = {name: shutil.which(name) for name in ("node", "gcc", "g++", "javac")}
+        self.cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self.latest: Dict[str, Dict] = {}
+        self.versions: Dict[str, int] = {}
+        self.subscriptions: List[Subscription] = []
+        self._pending: Dict[str, object] = {}  # path -> Timer or Future of its current version
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    @staticmethod
+    def language_of(path: str) -> Optional[str]:
+        return LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+    def _key(self, language: str, text: str) -> str:
+        return hashlib.sha1(f"{language}\0{text}".encode("utf-8", errors="replace")).hexdigest()
+
+    def _next_version(self, path: str) -> int:
+        """Bump the file's version and cancel whatever was pending for the old one (caller holds the lock)"""
+        version = self.versions.get(path, 0) + 1
+        self.versions[path] = version
+        pending = self._pending.pop(path, None)
+        if pending is not None:
+            pending.cancel()  # A Timer that has not fired, or a Future not yet picked up by a worker
+        return version
+
+    def submit(self, path: str, content: Optional[str] = None, delay: Optional[float] = None) -> int:
+        """Check a file after the debounce delay; `content` is an unsaved buffer, else the file is read"""
+        path = os.path.realpath(path)
+        with self._lock:
+            version = self._next_version(path)
+            timer = threading.Timer(self.debounce if delay is None else delay, self._start,
+                                    (path, version, content))
+            timer.daemon = True
+            self._pending[path] = timer
+        timer.start()
+        return version
+
+    def _read(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+    def _start(self, path: str, version: int, content: Optional[str]) -> Optional[Future]:
+        language = self.language_of(path)
+        text = content if content is not None else self._read(path)
+        if language is None or text is None:
+            self._publish(path, version, language, [], cached=False, elapsed=0.0)
+            return None
+        key = self._key(language, text)
+        with self._lock:
+            if self.versions.get(path) != version:
+                _CHECKS.labels(language, "superseded").inc()
+                return None
+            diagnostics = self.cache.get(key)
+            if diagnostics is not None:
+                self.cache.move_to_end(key)
+        if diagnostics is not None:
+            _CHECKS.labels(language, "cached").inc()
+            self._publish(path, version, language, diagnostics, cached=True, elapsed=0.0)
+            return None
+
+        started = time.perf_counter()
+        future = self._get_pool().submit(run_checks, language, text, path, self.tools)
+        with self._lock:
+            if self.versions.get(path) == version:
+                self._pending[path] = future
+        future.add_done_callback(lambda done: self._finish(path, version, language, key, done, started))
+        return future
+
+    def _finish(self, path: str, version: int, language: str, key: str, future: Future, started: float) -> None:
+        if future.cancelled():
+            _CHECKS.labels(language, "superseded").inc()
+            return
+        elapsed = time.perf_counter() - started
+        try:
+            diagnostics = future.result()
+        except Exception as e:
+            diagnostics = [_diagnostic(1, 0, f"Diagnostics failed: {str(e)}", "echoide", "warning")]
+        else:
+            self._remember(key, diagnostics)
+        _CHECK_SECONDS.labels(language).observe(elapsed)
+        with self._lock:
+            current = self.versions.get(path) == version
+            if current and self._pending.get(path) is future:
+                del self._pending[path]
+        if not current:
+            _CHECKS.labels(language, "superseded").inc()  # Cached all the same: the edit may be undone
+            return
+        _CHECKS.labels(language, "run").inc()
+        self._publish(path, version, language, diagnostics, cached=False, elapsed=elapsed)
+
+    def _remember(self, key: str, diagnostics: List[Dict]) -> None:
+        with self._lock:
+            self.cache[key] = diagnostics
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _publish(self, path: str, version: int, language: Optional[str], diagnostics: List[Dict],
+                 cached: bool, elapsed: float) -> None:
+        event = {"path": path, "version": version, "language": language, "diagnostics": diagnostics,
+                 "cached": cached, "elapsed_ms": round(elapsed * 1000, 2)}
+        with self._lock:
+            if self.versions.get(path) != version:
+                return
+            self.latest[path] = event
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            if _under(path, subscription.prefix):
+                try:
+                    subscription.push(event)
+                except RuntimeError:  # Its event loop is gone
+                    self.unsubscribe(subscription)
+
+    def check(self, path: str, content: Optional[str] = None) -> Dict:
+        """Check now, without debouncing, and return the result (it is also pushed to subscribers)"""
+        try:
+            path = os.path.realpath(path)
+            with self._lock:
+                version = self._next_version(path)
+            future = self._start(path, version, content)
+            if future is not None:
+                published = threading.Event()
+                future.add_done_callback(lambda done: published.set())  # Runs after _finish has published
+                published.wait(CHECK_TIMEOUT * 2)
+            return self.latest.get(path) or {"path": path, "version": version, "diagnostics": []}
+        except Exception as e:
+            raise Exception(f"Failed to check file: {str(e)}")
+
+    def check_text(self, language: str, text: str) -> List[Dict]:
+        """Diagnostics for a snippet that is not a file (e.g. code sent for AI analysis); not published"""
+        language = {"js": "javascript", "c++": "cpp"}.get(language, language)
+        key = self._key(language, text)
+        with self._lock:
+            diagnostics = self.cache.get(key)
+            if diagnostics is not None:
+                self.cache.move_to_end(key)
+        if diagnostics is not None:
+            _CHECKS.labels(language, "cached").inc()
+            return diagnostics
+        extension = {"python": ".py", "javascript": ".js", "c": ".c", "cpp": ".cpp", "java": ".java"}.get(language)
+        if extension is None:
+            return []
+        started = time.perf_counter()
+        diagnostics = self._get_pool().submit(run_checks, language, text, "snippet" + extension,
+                                              self.tools).result(timeout=CHECK_TIMEOUT * 2)
+        _CHECK_SECONDS.labels(language).observe(time.perf_counter() - started)
+        _CHECKS.labels(language, "run").inc()
+        self._remember(key, diagnostics)
+        return diagnostics
+
+    def forget(self, path: str) -> None:
+        """A deleted file: clear its diagnostics in every editor"""
+        path = os.path.realpath(path)
+        with self._lock:
+            version = self._next_version(path)
+        self._publish(path, version, self.language_of(path), [], cached=False, elapsed=0.0)
+        with self._lock:
+            self.latest.pop(path, None)
+
+    def snapshot(self, prefix: Optional[str] = None) -> List[Dict]:
+        prefix = os.path.realpath(prefix) if prefix else None
+        with self._lock:
+            return [event for path, event in self.latest.items() if _under(path, prefix)]
+
+    def subscribe(self, loop, prefix: Optional[str] = None) -> Subscription:
+        subscription = Subscription(loop, os.path.realpath(prefix) if prefix else None)
+        with self._lock:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+    def get_stats(self) -> Dict:
+        return {"tools": {name: bool(path) for name, path in self.tools.items()},
+                "cache_entries": len(self.cache), "files": len(self.latest),
+                "subscribers": len(self.subscriptions), "workers": self.max_workers}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for pending in self._pending.values():
+                pending.cancel()
+            self._pending.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
@@ -5,9 +5,16 @@ from pathlib import Path
 from typing import List, Dict, Optional
 import stat
 import platform
+import threading
+import time
+
+from app.services.local_history import atomic_write
+from app.services.path_index import AllowedPathIndex
 
 class FileService:
-    def __init__(self):
+    SHARED_POLL_INTERVAL = 0.5  # Seconds between checks for workspaces other workers added
+
+    def __init__(self, shared_state=None, history=None, git_status=None):
         self.allowed_extensions = {
             '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.scss', '.sass',
             '.json', '.yaml', '.yml', '.md', '.txt', '.sql', '.sh', '.bat', '.ps1',
@@ -18,6 +25,19 @@ class FileService:
         
         # Set up allowed paths for broader access
         self.allowed_paths = self._get_allowed_paths()
+        self.path_index = AllowedPathIndex(self.allowed_paths)
+        self._paths_lock = threading.Lock()  # Requests run on several pool threads; serialises writers
+
+        # With several workers, workspaces added through any of them live in SharedState
+        self.shared_state = shared_state
+        self._shared_generation = -1
+        self._shared_checked_at = 0.0
+
+        # Optional LocalHistory: every save and delete keeps a version there
+        self.history = history
+
+        # Optional GitStatusService: listings inside opened repositories get "git_status"
+        self.git_status = git_status
         
         # Common directories to skip
         self.skip_directories = {
@@ -77,21 +97,29 @@ class FileService:
     
     def is_path_allowed(self, path: str) -> bool:
         """Check if the path is within allowed directories"""
-        try:
-            abs_path = os.path.abspath(path)
-            
-            # Allow if path starts with any allowed base path
-            for allowed_path in self.allowed_paths:
-                if abs_path.startswith(allowed_path):
-                    return True
-            
-            # Also allow relative paths within current directory
-            if not os.path.isabs(path):
-                return True
-                
-            return False
-        except Exception:
-            return False
+        # Relative paths resolve against the current directory, which is itself
+        # an allowed root, so they go through the same symlink-safe check
+        if self.shared_state is None:
+            return self.path_index.contains(path)
+        if time.monotonic() - self._shared_checked_at > self.SHARED_POLL_INTERVAL:
+            self._sync_shared_paths()
+        if self.path_index.contains(path):
+            return True
+        # A workspace another worker added since the last poll; denials are rare, so look now
+        return self._sync_shared_paths() and self.path_index.contains(path)
+
+    def _sync_shared_paths(self) -> bool:
+        """Pick up workspaces other workers added; False if there were none since the last call"""
+        with self._paths_lock:
+            self._shared_checked_at = time.monotonic()
+            generation = self.shared_state.generation("allowed_paths")
+            if generation == self._shared_generation:
+                return False
+            self._shared_generation = generation
+            for path in self.shared_state.allowed_paths():
+                if os.path.isdir(path) and self.path_index.add(path) and path not in self.allowed_paths:
+                    self.allowed_paths.append(path)
+            return True
     
     def list_directory(self, path: str) -> List[Dict]:
         """List files and directories with security check"""
@@ -160,6 +188,8 @@ class FileService:
             
             # Sort: directories first, then files alphabetically
             items.sort(key=lambda x: (not x["is_directory"], x["name"].lower()))
+            if self.git_status is not None:
+                self.git_status.decorate(abs_path, items)
             return items
             
         except Exception as e:
@@ -211,14 +241,24 @@ class FileService:
         except Exception as e:
             raise Exception(f"Failed to read file: {str(e)}")
     
-    def write_file(self, path: str, content: str) -> bool:
+    def write_file(self, path: str, content: str, source: str = "save") -> bool:
         """Write content to file with security check"""
+        return self.write_bytes(path, content.encode('utf-8'), source)
+
+    def write_bytes(self, path: str, data: bytes, source: str = "save") -> bool:
+        """Write raw bytes to file with security check.
+
+        The file is replaced atomically, and the new content recorded in
+        local history (tagged `source`), preceded on the first save by what
+        was on disk. A symlink is written through, so its target changes and
+        the link stays a link.
+        """
         try:
             # Security check
             if not self.is_path_allowed(path):
                 raise PermissionError(f"Access denied to path: {path}")
             
-            abs_path = os.path.abspath(path)
+            abs_path = os.path.realpath(path)
             
             # Create directory if it doesn't exist
             directory = os.path.dirname(abs_path)
@@ -232,47 +272,30 @@ class FileService:
             if not os.access(directory, os.W_OK):
                 raise PermissionError(f"No write permission for directory: {directory}")
             
-            # Backup existing file if it exists
-            backup_made = False
-            if os.path.exists(abs_path):
-                try:
-                    backup_path = abs_path + ".bak"
-                    if os.path.exists(backup_path):
-                        os.remove(backup_path)
-                    os.rename(abs_path, backup_path)
-                    backup_made = True
-                except Exception:
-                    pass  # Continue without backup if it fails
+            if self.history is not None and os.path.isfile(abs_path) and not self.history.has_versions(abs_path):
+                self._record_version(abs_path, None, "original")  # So the first save can be undone too
             
-            try:
-                # Write the file with UTF-8 encoding
-                with open(abs_path, 'w', encoding='utf-8', newline='') as file:
-                    file.write(content)
-                
-                # Remove backup if write was successful
-                if backup_made:
-                    backup_path = abs_path + ".bak"
-                    if os.path.exists(backup_path):
-                        try:
-                            os.remove(backup_path)
-                        except Exception:
-                            pass  # Keep backup if we can't remove it
-                
-                return True
-                
-            except Exception as write_error:
-                # Restore backup if write failed
-                if backup_made:
-                    backup_path = abs_path + ".bak"
-                    if os.path.exists(backup_path):
-                        try:
-                            os.rename(backup_path, abs_path)
-                        except Exception:
-                            pass
-                raise write_error
+            # Temp file + fsync + rename: the file is never seen half-written, and a failed write leaves it as it was
+            atomic_write(abs_path, data)
+            self._record_version(abs_path, data, source)
+            return True
             
         except Exception as e:
             raise Exception(f"Failed to write file: {str(e)}")
+
+    def _record_version(self, abs_path: str, data: Optional[bytes], source: str) -> None:
+        """Keep a version in local history (`data`, or the file as it is on disk); never fails the caller"""
+        if self.history is None:
+            return
+        try:
+            if data is None:
+                if os.path.getsize(abs_path) > self.history.max_file_bytes:
+                    return
+                with open(abs_path, 'rb') as handle:
+                    data = handle.read()
+            self.history.record(abs_path, data, source)
+        except Exception:
+            pass  # The file itself was saved (or is still there); only its history misses this version
     
     def delete_file(self, path: str) -> bool:
         """Delete file or directory with security check"""
@@ -300,7 +323,8 @@ class FileService:
                     else:
                         raise Exception(f"Cannot delete directory: {str(e)}")
             else:
-                # Delete file
+                # Delete file, keeping its last content restorable
+                self._record_version(abs_path, None, "delete")
                 os.remove(abs_path)
             
             return True
@@ -367,15 +391,22 @@ class FileService:
     
     def get_allowed_paths(self) -> List[str]:
         """Get list of allowed base paths (for frontend display)"""
-        return self.allowed_paths.copy()
+        if self.shared_state is not None:
+            self._sync_shared_paths()
+        with self._paths_lock:
+            return self.allowed_paths.copy()
     
     def add_allowed_path(self, path: str) -> bool:
         """Add a new allowed path (for workspace selection)"""
         try:
             abs_path = os.path.abspath(path)
             if os.path.exists(abs_path) and os.path.isdir(abs_path):
-                if abs_path not in self.allowed_paths:
-                    self.allowed_paths.append(abs_path)
+                # Only grow the list for roots not already covered by another one
+                with self._paths_lock:
+                    if self.path_index.add(abs_path) and abs_path not in self.allowed_paths:
+                        self.allowed_paths.append(abs_path)
+                if self.shared_state is not None:
+                    self.shared_state.add_allowed_path(abs_path)
                 return True
             return False
         except Exception:
@@ -0,0 +1,334 @@
+# backend/app/services/git_status.py
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from app.services.metrics import REGISTRY
+
+_RUNS = REGISTRY.counter("echoide_git_status_runs_total", "git status runs by kind and outcome",
+                         ["kind", "outcome"])  # kind: full, paths
+_RUN_SECONDS = REGISTRY.histogram("echoide_git_status_seconds", "Time of one git status run", ["kind"])
+
+GIT_TIMEOUT = 60.0
+
+# Which state a directory shows when several files below it changed
+_DIRECTORY_RANK = {"untracked": 0, "modified": 1, "conflicted": 2}
+
+
+def status_name(code: str) -> str:
+    """The explorer's name for a porcelain XY code"""
+    if code == "??":
+        return "untracked"
+    if "U" in code or code in ("AA", "DD"):
+        return "conflicted"
+    if code[0] == "A":
+        return "added"
+    if code[0] in "RC":
+        return "renamed"
+    if "D" in code:
+        return "deleted"
+    return "modified"
+
+
+def parse_porcelain(output: str) -> Tuple[Dict[str, str], Set[str], Optional[str]]:
+    """(file statuses, untracked directories, branch) from `git status --porcelain=v1 -z --branch`"""
+    files: Dict[str, str] = {}
+    untracked_dirs: Set[str] = set()
+    branch = None
+    entries = output.split("\0")
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        i += 1
+        if entry.startswith("## "):
+            header = entry[3:]
+            if header.startswith("No commits yet on "):
+                header = header[len("No commits yet on "):]
+            branch = header.split("...")[0].split(" ")[0]
+            continue
+        if len(entry) < 4:
+            continue
+        code, path = entry[:2], entry[3:]
+        if code[0] in "RC":
+            i += 1  # The original path follows a rename or copy
+        if code == "!!":
+            continue
+        if code == "??" and path.endswith("/"):
+            untracked_dirs.add(path.rstrip("/"))
+        else:
+            files[path] = status_name(code)
+    return files, untracked_dirs, branch
+
+
+def directory_statuses(files: Dict[str, str], untracked_dirs: Set[str]) -> Dict[str, str]:
+    """Status of every directory with changes below it"""
+    directories: Dict[str, str] = {}
+
+    def mark(directory: str, status: str) -> None:
+        while directory:
+            current = directories.get(directory)
+            if current is not None and _DIRECTORY_RANK[current] >= _DIRECTORY_RANK[status]:
+                return  # Its ancestors are marked at least as high already
+            directories[directory] = status
+            directory = directory.rpartition("/")[0]
+
+    for path, status in files.items():
+        mark(path.rpartition("/")[0], {"untracked": "untracked", "conflicted": "conflicted"}.get(status, "modified"))
+    for directory in untracked_dirs:
+        mark(directory, "untracked")
+    return directories
+
+
+class GitRepository:
+    """Cached status of one work tree; `snapshot` is replaced whole, so readers never need the lock"""
+
+    def __init__(self, root: str, git_dir: str):
+        self.root = root
+        self.git_dir = git_dir
+        # (file statuses, untracked directories, directory statuses), paths relative to root with "/"
+        self.snapshot: Tuple[Dict[str, str], Set[str], Dict[str, str]] = ({}, set(), {})
+        self.branch: Optional[str] = None
+        self.generation = 0
+        self.refreshed_at = 0.0  # time.monotonic() of the last full run
+        self.index_mtime: Optional[int] = None  # .git/index as of the last full run
+        self.error: Optional[str] = None
+        self.full = True  # The next run is a full one
+        self.pending: Set[str] = set()  # Changed paths for the next run
+        self.timer: Optional[threading.Timer] = None
+        self.running = False
+        self.ready = threading.Event()  # Set after the first run
+
+    def index_mtime_now(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.git_dir, "index")).st_mtime_ns
+        except OSError:
+            return None
+
+    def relative(self, path: str) -> Optional[str]:
+        if path == self.root:
+            return ""
+        if not path.startswith(self.root.rstrip(os.sep) + os.sep):
+            return None
+        return path[len(self.root.rstrip(os.sep)) + 1:].replace(os.sep, "/")
+
+
+class GitStatusService:
+    """Git status of the opened projects, for file explorer decorations.
+
+    Each project's repository is scanned once with `git status` in the
+    background and the result is cached as a map of changed paths. Writes
+    and deletes made through the IDE are batched (`debounce` seconds) into
+    a `git status -- <paths>` of just those files. A full run happens again
+    when `.git/index` changes (commits, checkouts, `git add` in a terminal)
+    and, to catch edits made outside the IDE, when a listing finds the map
+    older than `refresh_interval`. Decorating a listing is a dictionary
+    lookup per entry: it never waits for git, so listings cost the same in
+    a 100k-file repository. git runs with --no-optional-locks, so a refresh
+    neither rewrites the index (which would trigger another) nor blocks the
+    user's own git commands.
+    """
+
+    MAX_PATHS = 256  # More pending paths than this and a full run is cheaper
+
+    def __init__(self, git: Optional[str] = None, debounce: float = 0.3, refresh_interval: float = 30.0):
+        self.git = git or shutil.which("git")
+        self.debounce = debounce
+        self.refresh_interval = refresh_interval
+        self.repos: Dict[str, GitRepository] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def from_env(cls) -> "GitStatusService":
+        """ECHOIDE_GIT and ECHOIDE_GIT_STATUS_INTERVAL (seconds)"""
+        return cls(git=os.environ.get("ECHOIDE_GIT"),
+                   refresh_interval=float(os.environ.get("ECHOIDE_GIT_STATUS_INTERVAL", "30")))
+
+    # Repositories
+
+    @staticmethod
+    def find_root(path: str) -> Optional[Tuple[str, str]]:
+        """(work tree, git dir) of the repository containing `path`"""
+        directory = os.path.abspath(path)
+        while True:
+            dot_git = os.path.join(directory, ".git")
+            if os.path.isdir(dot_git):
+                return directory, dot_git
+            if os.path.isfile(dot_git):  # Worktrees and submodules: "gitdir: <path>"
+                try:
+                    with open(dot_git, "r", encoding="utf-8") as handle:
+                        line = handle.readline().strip()
+                except OSError:
+                    return None
+                if line.startswith("gitdir:"):
+                    return directory, os.path.normpath(os.path.join(directory, line[len("gitdir:"):].strip()))
+                return None
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+
+    def track(self, project_path: str) -> Optional[GitRepository]:
+        """Start keeping the status of the project's repository; None outside a repository or without git"""
+        if self.git is None:
+            return None
+        found = self.find_root(project_path)
+        if found is None:
+            return None
+        root, git_dir = found
+        with self._lock:
+            repo = self.repos.get(root)
+            if repo is None:
+                repo = self.repos[root] = GitRepository(root, git_dir)
+                self._schedule(repo, 0)
+        return repo
+
+    def _locate(self, path: str) -> Tuple[Optional[GitRepository], Optional[str]]:
+        path = os.path.abspath(path)
+        for repo in list(self.repos.values()):
+            relative = repo.relative(path)
+            if relative is not None:
+                return repo, relative
+        return None, None
+
+    # Refreshing
+
+    def _schedule(self, repo: GitRepository, delay: float) -> None:
+        """Run git for `repo` after `delay` unless a run is already scheduled (caller holds the lock)"""
+        if self._closed or repo.timer is not None or repo.running:
+            return  # The scheduled or running one picks up what was asked for; a running one reschedules
+        repo.timer = threading.Timer(delay, self._run, (repo,))
+        repo.timer.daemon = True
+        repo.timer.start()
+
+    def _check(self, repo: GitRepository) -> None:
+        """Schedule a full run if the index changed or the map is old"""
+        if repo.running or repo.timer is not None or not repo.ready.is_set():
+            return
+        if repo.index_mtime_now() != repo.index_mtime or time.monotonic() - repo.refreshed_at > self.refresh_interval:
+            with self._lock:
+                repo.full = True
+                self._schedule(repo, 0)
+
+    def notify_changed(self, path: str) -> None:
+        """A file was written or deleted; refresh its status shortly"""
+        repo, relative = self._locate(path)
+        if repo is None or not relative or relative == ".git" or relative.startswith(".git/"):
+            return
+        with self._lock:
+            repo.pending.add(relative)
+            if len(repo.pending) > self.MAX_PATHS:
+                repo.full = True
+            self._schedule(repo, self.debounce)
+
+    def _git_status(self, repo: GitRepository, paths: Optional[Sequence[str]]) -> str:
+        command = [self.git, "--no-optional-locks", "--literal-pathspecs", "status", "--porcelain=v1", "-z",
+                   "--branch", "--untracked-files=normal"]
+        if paths is not None:
+            command += ["--"] + list(paths)
+        result = subprocess.run(command, cwd=repo.root, capture_output=True, timeout=GIT_TIMEOUT)
+        if result.returncode != 0:
+            raise Exception(result.stderr.decode("utf-8", errors="replace").strip() or f"exit {result.returncode}")
+        return result.stdout.decode("utf-8", errors="surrogateescape")
+
+    def _run(self, repo: GitRepository) -> None:
+        with self._lock:
+            repo.timer = None
+            repo.running = True
+            full = repo.full or not repo.ready.is_set()
+            paths = sorted(repo.pending)
+            repo.full = False
+            repo.pending = set()
+        kind = "full" if full else "paths"
+        index_mtime = repo.index_mtime_now()  # Before the run: a change during it triggers another
+        started = time.perf_counter()
+        try:
+            files, untracked_dirs, branch = parse_porcelain(self._git_status(repo, None if full else paths))
+        except Exception as e:
+            _RUNS.labels(kind, "failed").inc()
+            with self._lock:
+                repo.error = f"Failed to get git status: {str(e)}"
+                repo.refreshed_at = time.monotonic()  # Retried after refresh_interval, not on every listing
+                repo.index_mtime = index_mtime
+                repo.running = False
+            repo.ready.set()
+            return
+        _RUNS.labels(kind, "ok").inc()
+        _RUN_SECONDS.labels(kind).observe(time.perf_counter() - started)
+
+        with self._lock:
+            if not full:
+                previous_files, previous_untracked, _ = repo.snapshot
+                changed = set(paths)
+                merged = {path: status for path, status in previous_files.items() if path not in changed}
+                merged.update(files)
+                files, untracked_dirs = merged, previous_untracked | untracked_dirs
+            else:
+                repo.refreshed_at = time.monotonic()
+                repo.index_mtime = index_mtime
+            repo.snapshot = (files, untracked_dirs, directory_statuses(files, untracked_dirs))
+            repo.branch = branch or repo.branch
+            repo.error = None
+            repo.generation += 1
+            repo.running = False
+            if repo.full or repo.pending:
+                self._schedule(repo, self.debounce)
+        repo.ready.set()
+
+    # Reading
+
+    def decorate(self, directory: str, items: List[Dict]) -> None:
+        """Set "git_status" on the entries of a directory listing that have one; never waits for git"""
+        if not self.repos:
+            return
+        repo, relative = self._locate(directory)
+        if repo is None:
+            return
+        self._check(repo)
+        files, untracked_dirs, directories = repo.snapshot
+        if not files and not untracked_dirs:
+            return
+        ancestor = relative
+        while ancestor:
+            if ancestor in untracked_dirs:
+                for item in items:
+                    item["git_status"] = "untracked"
+                return
+            ancestor = ancestor.rpartition("/")[0]
+        prefix = relative + "/" if relative else ""
+        for item in items:
+            key = prefix + item["name"]
+            status = (directories.get(key) or files.get(key)) if item["is_directory"] else files.get(key)
+            if status is not None:
+                item["git_status"] = status
+
+    def status(self, project_path: str, wait: float = 10.0) -> Dict:
+        """Status map of a project's repository, waiting up to `wait` seconds for the first scan"""
+        if self.git is None:
+            raise Exception("git is not installed")
+        repo = self.track(project_path)
+        if repo is None:
+            raise Exception(f"Not a git repository: {project_path}")
+        self._check(repo)
+        repo.ready.wait(wait)
+        files, untracked_dirs, _ = repo.snapshot
+        return {
+            "root": repo.root,
+            "branch": repo.branch,
+            "generation": repo.generation,
+            "ready": repo.ready.is_set(),
+            "error": repo.error,
+            "files": files,
+            "untracked_directories": sorted(untracked_dirs),
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            for repo in self.repos.values():
+                if repo.timer is not None:
+                    repo.timer.cancel()
+                    repo.timer = None
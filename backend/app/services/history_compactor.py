@@ -0,0 +1,167 @@
+# backend/app/services/history_compactor.py
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.metrics import REGISTRY
+from app.services.speculative_completion import SpeculationCancelled
+from app.services.token_utils import estimate_tokens
+
+_SUMMARIES = REGISTRY.counter("echoide_chat_history_summaries_total", "Background summaries of older chat turns",
+                              ["outcome"])  # outcome: ok, cancelled (gave way too often), error
+_HISTORY_TOKENS = REGISTRY.histogram("echoide_chat_history_tokens",
+                                     "Tokens of replayed history (summary and exchanges) per chat turn",
+                                     buckets=(100, 250, 500, 750, 1000, 1500, 2000, 2500, 3000, 4000, 6000))
+
+
+def exchange_tokens(exchange: Dict) -> int:
+    """Tokens an exchange adds to every prompt that replays it"""
+    if "tokens" in exchange:
+        return exchange["tokens"]
+    return estimate_tokens(exchange.get("prompt", exchange["user"])) + estimate_tokens(exchange["assistant"]) + 8
+
+
+class HistoryCompactor:
+    """Keeps the replayed history of stable-prefix chat sessions within `budget` tokens.
+
+    A turn replays the exchanges of the session's current window, after a
+    summary of the turns before it (in the system message). Once a turn
+    leaves more than `compact_at` of the budget in the window, the oldest
+    exchanges are summarised in the background, with the model the session
+    chats with (as many as leave about half the budget once the window is
+    full), folded into the previous summary. That waits `idle_delay` and for
+    no other model request to be running, and gives way to any request that
+    starts while it runs (waiting twice as long before the next attempt).
+    When the window outgrows the budget it moves past the newest summary; if
+    none is ready yet, the oldest exchanges are dropped without one, so
+    prompt size stays bounded either way. The window only moves on those
+    turns, so the prompt prefix stays stable (and in Ollama's KV cache) in
+    between.
+    """
+
+    def __init__(self, sessions, summarize: Callable[[str, str, Optional[str], threading.Event], Awaitable[str]],
+                 idle: Callable[[], bool], budget: int = 2500, keep: int = 50, compact_at: float = 0.75,
+                 idle_delay: float = 2.0, give_up_after: float = 120.0):
+        self.sessions = sessions
+        self.summarize = summarize  # (previous summary, conversation, model, cancel event) -> new summary
+        self.idle = idle            # True while no foreground model request is running
+        self.budget = budget
+        self.keep = keep            # Exchanges stored per session; must cover the window plus what is being folded
+        self.compact_at = compact_at
+        self.idle_delay = idle_delay
+        self.give_up_after = give_up_after
+        self.pending: Dict[str, asyncio.Task] = {}
+        self.cancel_events: Dict[str, threading.Event] = {}
+        self.stats = {"scheduled": 0, "completed": 0, "preempted": 0, "abandoned": 0, "failed": 0}
+
+    @staticmethod
+    def _current(history: List[Dict]) -> List[Dict]:
+        last = history[-1]
+        return [exchange for exchange in history if exchange.get("turn", 0) >= last["window_start"]]
+
+    def window(self, history: List[Dict], stored: Optional[Dict], language: str,
+               incoming: int = 0) -> Tuple[List[Dict], Optional[Dict]]:
+        """(exchanges to replay, summary for the system message) of a turn adding `incoming` tokens"""
+        last = history[-1] if history and "turn" in history[-1] else None
+        if last is None or last["language"] != language:
+            return [], stored  # A new window; the newest summary carries over what came before
+        window = self._current(history)
+        summary = last.get("summary")
+        total = sum(exchange_tokens(exchange) for exchange in window)
+        if total + incoming <= self.budget:
+            return window, summary
+        if stored is not None and window and stored["through"] >= window[0]["turn"]:
+            window = [exchange for exchange in window if exchange["turn"] > stored["through"]]
+            summary = stored
+            total = sum(exchange_tokens(exchange) for exchange in window)
+        if total + incoming > self.budget:
+            while window and total > self.budget // 2:
+                total -= exchange_tokens(window.pop(0))
+        return window, summary
+
+    def observe(self, window: List[Dict], summary: Optional[Dict]) -> int:
+        """Record (and return) the history tokens a turn replays"""
+        tokens = sum(exchange_tokens(exchange) for exchange in window) + (summary["tokens"] if summary else 0)
+        _HISTORY_TOKENS.observe(tokens)
+        return tokens
+
+    def note_turn(self, session_id: str, history: List[Dict], stored: Optional[Dict]) -> bool:
+        """Called with the history including the turn just stored; True if a summary was scheduled"""
+        if session_id in self.pending or not history or "turn" not in history[-1]:
+            return False
+        window = self._current(history)
+        if not window or (stored is not None and stored["through"] >= window[0]["turn"]):
+            return False  # The summary the window will move to is already there
+        total = sum(exchange_tokens(exchange) for exchange in window)
+        if total <= self.budget * self.compact_at:
+            return False
+        # Fold enough that, once the turns until the window moves are added, about half the budget is left
+        keep = max(0, self.budget // 2 - (self.budget - total))
+        through = None
+        for exchange in window:
+            if total <= keep:
+                break
+            total -= exchange_tokens(exchange)
+            through = exchange["turn"]
+        if through is None:
+            return False
+        self.pending[session_id] = asyncio.get_running_loop().create_task(self._compact(session_id, through))
+        self.stats["scheduled"] += 1
+        return True
+
+    def preempt(self) -> None:
+        """A foreground request is starting: background summaries stop and retry later"""
+        for event in list(self.cancel_events.values()):
+            event.set()
+
+    async def _compact(self, session_id: str, through: int) -> None:
+        cancel_event = threading.Event()
+        self.cancel_events[session_id] = cancel_event
+        deadline = time.monotonic() + self.give_up_after
+        try:
+            stored = await asyncio.to_thread(self.sessions.summary, session_id)
+            history = await asyncio.to_thread(self.sessions.history, session_id, self.keep)
+            after = stored["through"] if stored else 0
+            fold = [exchange for exchange in history if after < exchange.get("turn", 0) <= through]
+            if not fold:
+                return
+            conversation = "\n\n".join(f"User: {exchange['user']}\nAssistant: {exchange['assistant']}"
+                                       for exchange in fold)
+            delay = self.idle_delay
+            while True:
+                await asyncio.sleep(delay)
+                if time.monotonic() > deadline:
+                    self.stats["abandoned"] += 1
+                    _SUMMARIES.labels("cancelled").inc()
+                    return
+                if not self.idle():
+                    continue
+                cancel_event.clear()
+                try:
+                    text = await self.summarize(stored["text"] if stored else "", conversation,
+                                                fold[-1].get("model"), cancel_event)
+                    break
+                except SpeculationCancelled:
+                    # Every attempt costs the next turn its KV cache; wait for a longer pause next time
+                    self.stats["preempted"] += 1
+                    delay = min(delay * 2, self.give_up_after / 4)
+            await asyncio.to_thread(self.sessions.set_summary, session_id, {
+                "through": fold[-1]["turn"], "text": text, "tokens": estimate_tokens(text)})
+            self.stats["completed"] += 1
+            _SUMMARIES.labels("ok").inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            _SUMMARIES.labels("error").inc()
+        finally:
+            self.pending.pop(session_id, None)
+            self.cancel_events.pop(session_id, None)
+
+    def shutdown(self) -> None:
+        for task in list(self.pending.values()):
+            task.cancel()
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "pending": len(self.pending), "budget": self.budget}
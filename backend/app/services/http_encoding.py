@@ -0,0 +1,151 @@
+# backend/app/services/http_encoding.py
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+
+def json_dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson.
+
+    Used as the app's default response class. Endpoints returning large
+    payloads built by our own services (plain dicts, lists, str, numbers)
+    return it directly, which also skips FastAPI's jsonable_encoder pass
+    over every nested value.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(body: bytes, level: int) -> bytes:
+    return brotli.compress(body, quality=level)
+
+
+def _zstd(body: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+def available_encodings() -> Dict[str, Tuple[Any, int]]:
+    """Encoding -> (compress function, default level), in server preference order"""
+    encodings = {}
+    if zstandard is not None:
+        encodings["zstd"] = (_zstd, 3)
+    if brotli is not None:
+        encodings["br"] = (_brotli, 4)
+    encodings["gzip"] = (_gzip, 4)
+    return encodings
+
+
+def negotiate(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Best of `supported` for an Accept-Encoding header: highest q, then server preference"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with zstd, br or gzip.
+
+    The encoding is negotiated from Accept-Encoding among those available
+    (zstd and br need the optional zstandard/brotli packages). Only complete
+    bodies of at least `minimum_size` bytes with a text-like content type are
+    compressed; streamed responses (NDJSON search results, SSE) pass through
+    untouched so each chunk still reaches the client immediately.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, levels: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+        for name, level in (levels or {}).items():
+            if name in self.encodings:
+                self.encodings[name] = (self.encodings[name][0], level)
+        self.supported = list(self.encodings)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.supported)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message  # Held until the first body chunk shows whether to compress
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size \
+                    or "content-encoding" in headers \
+                    or not headers.get("content-type", "").startswith(_COMPRESSIBLE):
+                await send(start)
+                await send(message)
+                return
+
+            compress, level = self.encodings[encoding]
+            body = compress(body, level)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
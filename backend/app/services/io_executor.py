@@ -0,0 +1,199 @@
+# backend/app/services/io_executor.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.services.metrics import REGISTRY
+from app.services.profiler import current_profile
+
+_OP_SECONDS = REGISTRY.histogram("echoide_io_operation_seconds",
+                                 "Run time of file/project operations on the IO pool", ["operation"])
+_OP_QUEUE_WAIT = REGISTRY.histogram("echoide_io_queue_wait_seconds",
+                                    "Time operations wait for an IO worker", ["operation"])
+_OP_RESULTS = REGISTRY.counter("echoide_io_operations_total", "IO operations by outcome",
+                               ["operation", "outcome"])
+_POOL_ACTIVE = REGISTRY.gauge("echoide_io_active", "IO operations running")
+_POOL_QUEUED = REGISTRY.gauge("echoide_io_queued", "IO operations waiting for a worker")
+
+
+class IOTimeoutError(Exception):
+    """Raised when a blocking operation does not finish within its timeout"""
+
+
+class IOExecutor:
+    """Runs blocking filesystem work on a sized thread pool.
+
+    Async endpoints await `run()` instead of calling FileService/ProjectService
+    directly, so a long `os.walk` no longer stalls the event loop. Each call has
+    a per-operation timeout; calls that time out or are cancelled before a
+    worker picks them up never run at all. Operations that can hold a worker
+    for minutes (running cells and programs) are given pools of their own
+    with `dedicate`, so they cannot take every worker from reads and listings.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="echoide-io")
+        self._lock = threading.Lock()
+        self._dedicated: Dict[str, ThreadPoolExecutor] = {}  # op -> its pool
+        self.dedicated: Dict[str, Dict] = {}  # pool name -> {"ops", "max_workers", "active", "queued"}
+
+        # Default timeouts (seconds) per operation name
+        self.timeouts: Dict[str, float] = {
+            "default": 30.0,
+            "list_directory": 10.0,
+            "read_file": 15.0,
+            "write_file": 15.0,
+            "delete_file": 10.0,
+            "create_directory": 10.0,
+            "get_file_info": 10.0,
+            "add_allowed_path": 10.0,
+            "is_path_allowed": 5.0,
+            "open_project": 120.0,
+            "get_project_structure": 60.0,
+            "index_project": 600.0,
+            "refresh_project": 600.0,
+            "execute_file": 75.0,  # Compile + run, each capped at 30s by subprocess (own pool, see main.py)
+            "diagnostics": 45.0,  # Checks have their own 20s timeout; this covers a busy pool
+            "kernel_start": 60.0,
+            "kernel_execute": 3600.0,  # Cells are interactive work; /api/kernel/{id}/interrupt stops them
+        }
+
+        # Saturation metrics
+        self.active = 0
+        self.queued = 0
+        self.peak_active = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.total_queue_wait = 0.0
+        self.total_run_time = 0.0
+        _POOL_ACTIVE.set_function(lambda: self.active)
+        _POOL_QUEUED.set_function(lambda: self.queued)
+
+    def dedicate(self, name: str, max_workers: int, ops) -> None:
+        """Run `ops` on a pool of `max_workers` threads of their own instead of the shared one"""
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"echoide-{name}")
+        with self._lock:
+            self.dedicated[name] = {"ops": list(ops), "max_workers": max_workers, "active": 0, "queued": 0}
+            for op in ops:
+                self._dedicated[op] = pool
+
+    def _lane(self, op: str) -> Optional[Dict]:
+        """Counters of the dedicated pool running `op`; None for the shared pool (caller holds the lock)"""
+        if op not in self._dedicated:
+            return None
+        return next(lane for lane in self.dedicated.values() if op in lane["ops"])
+
+    def _wrap(self, func: Callable, args: tuple, kwargs: dict, submitted_at: float, op: str, profile=None):
+        started_at = time.perf_counter()
+        with self._lock:
+            lane = self._lane(op)
+            if lane is None:
+                self.queued -= 1
+                self.active += 1
+                self.peak_active = max(self.peak_active, self.active)
+            else:
+                lane["queued"] -= 1
+                lane["active"] += 1
+            self.total_queue_wait += started_at - submitted_at
+        _OP_QUEUE_WAIT.labels(op).observe(started_at - submitted_at)
+        # Worker threads do not inherit the request's context; attach them to its profile explicitly
+        profile_token = profile.attach(f"io-worker:{op}") if profile is not None else None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if profile_token is not None:
+                profile.detach(profile_token)
+            run_time = time.perf_counter() - started_at
+            with self._lock:
+                lane = self._lane(op)
+                if lane is None:
+                    self.active -= 1
+                else:
+                    lane["active"] -= 1
+                self.total_run_time += run_time
+            _OP_SECONDS.labels(op).observe(run_time)
+
+    async def run(self, func: Callable, *args, op: Optional[str] = None,
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run `func(*args, **kwargs)` in the pool and await its result"""
+        op = op or getattr(func, "__name__", "default")
+        if timeout is None:
+            timeout = self.timeouts.get(op, self.timeouts["default"])
+
+        with self._lock:
+            lane = self._lane(op)
+            if lane is None:
+                self.queued += 1
+                self.peak_queued = max(self.peak_queued, self.queued)
+            else:
+                lane["queued"] += 1
+            pool = self._dedicated.get(op, self._pool)
+
+        future = pool.submit(self._wrap, func, args, kwargs, time.perf_counter(), op, current_profile())
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._abandon(future, op)
+            with self._lock:
+                self.timed_out += 1
+            _OP_RESULTS.labels(op, "timeout").inc()
+            raise IOTimeoutError(f"{op} timed out after {timeout:g}s")
+        except asyncio.CancelledError:
+            self._abandon(future, op)
+            with self._lock:
+                self.cancelled += 1
+            _OP_RESULTS.labels(op, "cancelled").inc()
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            _OP_RESULTS.labels(op, "error").inc()
+            raise
+
+        with self._lock:
+            self.completed += 1
+        _OP_RESULTS.labels(op, "ok").inc()
+        return result
+
+    def _abandon(self, future, op: str):
+        # A call still waiting in the queue can be dropped; one already running
+        # cannot be interrupted and simply finishes with nobody awaiting it
+        if future.cancel():
+            with self._lock:
+                lane = self._lane(op)
+                if lane is None:
+                    self.queued -= 1
+                else:
+                    lane["queued"] -= 1
+
+    def get_stats(self) -> Dict:
+        """Pool saturation metrics"""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "saturation": round(self.active / self.max_workers, 3),
+                "peak_active": self.peak_active,
+                "peak_queued": self.peak_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "cancelled": self.cancelled,
+                "avg_queue_wait_ms": round(self.total_queue_wait / finished * 1000, 3) if finished else 0.0,
+                "avg_run_time_ms": round(self.total_run_time / finished * 1000, 3) if finished else 0.0,
+                "dedicated": {name: dict(lane) for name, lane in self.dedicated.items()},
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for pool in set(self._dedicated.values()):
+            pool.shutdown(wait=False, cancel_futures=True)
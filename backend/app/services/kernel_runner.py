@@ -0,0 +1,137 @@
+# backend/app/services/kernel_runner.py
+# Child process of a KernelService kernel; not imported by the backend.
+# Reads one JSON request per line on stdin and runs its code in a namespace
+# kept for the life of the process. Replies are JSON lines on the original
+# stdout: stream chunks, the value of a trailing expression, errors, and a
+# final "done" per request. fd 1 is pointed at stderr, so output written
+# below Python (C extensions, child processes) cannot corrupt the protocol.
+import ast
+import json
+import linecache
+import os
+import signal
+import sys
+import time
+import traceback
+
+_protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+os.dup2(2, 1)
+
+
+_streams = []
+
+
+def send(message):
+    if message["type"] != "stream":
+        for stream in _streams:
+            stream.flush()
+    _protocol.write(json.dumps(message) + "\n")
+    _protocol.flush()
+
+
+class _Stream:
+    """sys.stdout/sys.stderr replacement sending whole lines as stream messages.
+
+    Like a line-buffered terminal: text without a newline waits for the next
+    newline, flush(), another message or the end of the cell.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.request_id = None
+        self.pending = []
+
+    def write(self, text):
+        if text:
+            self.pending.append(text)
+            if "\n" in text:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            text, self.pending = "".join(self.pending), []
+            send({"type": "stream", "id": self.request_id, "name": self.name, "text": text})
+
+    def isatty(self):
+        return False
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+        except ImportError:
+            return 0.0
+
+
+def _compile(code, filename):
+    """Code objects for the body and, like a REPL, for a trailing expression"""
+    # Tracebacks show the source even when it was never saved to disk
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+    tree = ast.parse(code, filename, "exec")
+    last = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        last = ast.Expression(tree.body.pop().value)
+    body = compile(tree, filename, "exec")
+    return body, compile(last, filename, "eval") if last is not None else None
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    sys.path[0] = os.getcwd()  # Workspace modules import as they would from a script there
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    stdout, stderr = _Stream("stdout"), _Stream("stderr")
+    sys.stdout, sys.stderr = stdout, stderr
+    _streams.extend((stdout, stderr))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Only honoured while user code runs
+    if hasattr(signal, "SIGBREAK"):  # Windows: the service sends CTRL_BREAK_EVENT
+        signal.signal(signal.SIGBREAK, _interrupt)
+    send({"type": "ready", "pid": os.getpid(), "python": sys.version.split()[0]})
+
+    counter = 0
+    for line in sys.stdin:
+        request = json.loads(line)
+        request_id = request.get("id")
+        stdout.request_id = stderr.request_id = request_id
+        counter += 1
+        filename = request.get("filename") or f"<cell {counter}>"
+        started = time.perf_counter()
+        status = "ok"
+        signal.signal(signal.SIGINT, _interrupt)
+        try:
+            body, last = _compile(request["code"], filename)
+            exec(body, namespace)
+            if last is not None:
+                value = eval(last, namespace)
+                if value is not None:
+                    namespace["_"] = value
+                    send({"type": "result", "id": request_id, "repr": repr(value)[:100000]})
+        except KeyboardInterrupt:
+            status = "interrupted"
+            send({"type": "error", "id": request_id, "ename": "KeyboardInterrupt", "evalue": "",
+                  "traceback": "KeyboardInterrupt\n"})
+        except BaseException as e:  # SystemExit included: the kernel keeps running
+            status = "error"
+            # Drop the runner's own frames (and the compiler's, for syntax errors in the cell)
+            frames = [] if isinstance(e, SyntaxError) and e.filename == filename else \
+                [frame for frame in traceback.extract_tb(e.__traceback__) if frame.filename != __file__]
+            text = "".join(traceback.format_list(frames)) + "".join(traceback.format_exception_only(type(e), e))
+            send({"type": "error", "id": request_id, "ename": type(e).__name__, "evalue": str(e),
+                  "traceback": "Traceback (most recent call last):\n" + text if frames else text})
+        finally:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+        send({"type": "done", "id": request_id, "status": status,
+              "duration": round(time.perf_counter() - started, 6), "memory_mb": round(_rss_mb(), 1)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+# backend/app/services/kernel_service.py
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from app.services.metrics import REGISTRY
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kernel_runner.py")
+
+_CELLS = REGISTRY.counter("echoide_kernel_cells_total", "Cells run in persistent kernels by status", ["status"])
+_CELL_SECONDS = REGISTRY.histogram("echoide_kernel_cell_seconds", "Time to run one cell in a persistent kernel")
+_KERNEL_STARTS = REGISTRY.counter("echoide_kernel_starts_total", "Kernel processes started (including restarts)")
+_EVICTIONS = REGISTRY.counter("echoide_kernel_evictions_total", "Kernels stopped by the service", ["reason"])
+_KERNELS = REGISTRY.gauge("echoide_kernels", "Persistent kernel processes alive")
+
+_CELL_MARKER = re.compile(r"^\s*# ?%%")
+
+
+def select_code(code: str, cell: Optional[int] = None, start_line: Optional[int] = None,
+                end_line: Optional[int] = None) -> str:
+    """The part of a buffer to run: a `# %%` cell, a 1-based line range, or everything.
+
+    The selection is dedented, so an indented block can be run on its own, and
+    padded with blank lines so tracebacks report line numbers of the buffer.
+    """
+    lines = code.splitlines()
+    first = 1
+    if cell is not None:
+        starts = [0] + [i for i, line in enumerate(lines) if _CELL_MARKER.match(line) and i > 0]
+        if not 0 <= cell < len(starts):
+            raise ValueError(f"Cell {cell} out of range (buffer has {len(starts)} cells)")
+        end = starts[cell + 1] if cell + 1 < len(starts) else len(lines)
+        first, lines = starts[cell] + 1, lines[starts[cell]:end]
+        if lines and _CELL_MARKER.match(lines[0]):
+            # Left in, a marker less indented than the cell body would stop dedent
+            first, lines = first + 1, lines[1:]
+    elif start_line is not None or end_line is not None:
+        start_line = max(1, start_line or 1)
+        end_line = min(len(lines), end_line or len(lines))
+        if start_line > end_line:
+            raise ValueError(f"Empty line range {start_line}-{end_line}")
+        first, lines = start_line, lines[start_line - 1:end_line]
+    return "\n" * (first - 1) + textwrap.dedent("\n".join(lines))
+
+
+def _process_rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process from /proc; None where that is not available"""
+    try:
+        with open(f"/proc/{pid}/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Kernel:
+    """One long-lived Python process whose namespace survives between cells.
+
+    The process runs kernel_runner.py and speaks JSON lines over its pipes.
+    Reader threads move its messages into a queue; `execute` sends one cell
+    and yields messages until that cell is done. Cells are run one at a
+    time, later ones wait their turn. The process is started in its own
+    session/process group so an interrupt reaches the kernel only.
+    """
+
+    START_TIMEOUT = 30.0
+
+    def __init__(self, kernel_id: str, workspace: str, python: str):
+        self.kernel_id = kernel_id
+        self.workspace = workspace
+        self.python = python
+        self.process: Optional[subprocess.Popen] = None
+        self.messages: "queue.Queue[Dict]" = queue.Queue()
+        self.python_version: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.last_used = time.time()
+        self.execution_count = 0
+        self.memory_mb: Optional[float] = None
+        self.busy = False
+        self.lost_namespace = False  # The process died on its own; the next cell is told
+        self._next_id = 0
+        self._lock = threading.Lock()       # Process lifecycle
+        self._run_lock = threading.Lock()   # One cell at a time
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        with self._lock:
+            if self.alive:
+                return
+            if self.process is not None:  # Exited without shutdown(): crashed, os._exit, killed
+                self.lost_namespace = True
+            kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" \
+                else {"start_new_session": True}
+            process = subprocess.Popen(
+                [self.python, "-u", RUNNER],
+                cwd=self.workspace,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                **kwargs
+            )
+            messages: "queue.Queue[Dict]" = queue.Queue()
+            threading.Thread(target=self._read_protocol, args=(process, messages),
+                             name=f"kernel-{self.kernel_id}-out", daemon=True).start()
+            threading.Thread(target=self._read_stderr, args=(process, messages),
+                             name=f"kernel-{self.kernel_id}-err", daemon=True).start()
+            try:
+                ready = messages.get(timeout=self.START_TIMEOUT)
+            except queue.Empty:
+                ready = {"type": "exit"}
+            if ready.get("type") != "ready":
+                process.kill()
+                raise Exception(f"Kernel for {self.workspace} failed to start")
+            self.process, self.messages = process, messages
+            self.python_version = ready.get("python")
+            self.started_at = self.last_used = time.time()
+            self.execution_count = 0
+            self.memory_mb = None
+            _KERNEL_STARTS.inc()
+
+    def _read_protocol(self, process: subprocess.Popen, messages: "queue.Queue[Dict]") -> None:
+        for line in process.stdout:
+            try:
+                messages.put(json.loads(line))
+            except ValueError:
+                continue
+        process.wait()
+        messages.put({"type": "exit", "exit_code": process.returncode})
+
+    def _read_stderr(self, process: subprocess.Popen, messages: "queue.Queue[Dict]") -> None:
+        # Output written straight to fd 1/2, below sys.stdout (C extensions, subprocesses)
+        for line in process.stderr:
+            messages.put({"type": "stream", "id": None, "name": "stderr", "text": line})
+
+    def shutdown(self) -> None:
+        with self._lock:
+            process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.terminate()
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def restart(self) -> None:
+        """Fresh process and empty namespace; a running cell ends with status "dead" """
+        self.shutdown()
+        self.start()
+
+    def interrupt(self) -> bool:
+        """Raise KeyboardInterrupt in the running cell; False when nothing is running"""
+        process = self.process
+        if not self.busy or process is None or process.poll() is not None:
+            return False
+        if os.name == "nt":
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.kill(process.pid, signal.SIGINT)
+        return True
+
+    def execute(self, code: str, filename: Optional[str] = None) -> Iterator[Dict]:
+        """Run code against the kernel's namespace, yielding messages as they arrive.
+
+        Message types: "stream" (name, text), "result" (repr of a trailing
+        expression), "error" (ename, evalue, traceback) and a final "done"
+        (status ok/error/interrupted/dead, duration, memory_mb).
+        """
+        with self._run_lock:
+            self.start()
+            if self.lost_namespace:
+                self.lost_namespace = False
+                yield {"type": "status", "state": "restarted", "kernel_id": self.kernel_id,
+                       "reason": "kernel process exited; namespace was reset"}
+            self._next_id += 1
+            request_id = self._next_id
+            process, messages = self.process, self.messages
+            self.busy = True
+            started = time.perf_counter()
+            done = None
+            try:
+                process.stdin.write(json.dumps({"id": request_id, "code": code, "filename": filename}) + "\n")
+                process.stdin.flush()
+                while done is None:
+                    message = messages.get()
+                    if message["type"] == "exit":
+                        done = {"type": "done", "id": request_id, "status": "dead",
+                                "duration": round(time.perf_counter() - started, 6), "memory_mb": None,
+                                "error": f"Kernel process exited with code {message.get('exit_code')}"}
+                        messages.put(message)  # Later cells must see it too
+                    elif message.get("id") not in (request_id, None):
+                        continue  # Left over from a cell whose client went away
+                    elif message["type"] == "stream":
+                        yield self._coalesce(message, messages)
+                    elif message["type"] == "done":
+                        done = message
+                    else:
+                        yield message
+            except (BrokenPipeError, OSError) as e:
+                done = {"type": "done", "id": request_id, "status": "dead",
+                        "duration": round(time.perf_counter() - started, 6), "memory_mb": None, "error": str(e)}
+            finally:
+                self.busy = False
+                self.last_used = time.time()
+            self.execution_count += 1
+            self.memory_mb = done.get("memory_mb")
+            _CELLS.labels(done["status"]).inc()
+            _CELL_SECONDS.observe(done["duration"])
+            yield done
+
+    @staticmethod
+    def _coalesce(message: Dict, messages: "queue.Queue[Dict]") -> Dict:
+        """Merge stream chunks already queued behind this one, so print loops are not one message per write"""
+        text = [message["text"]]
+        pending = []
+        while len(text) < 1000:
+            try:
+                following = messages.get_nowait()
+            except queue.Empty:
+                break
+            if following["type"] == "stream" and following["name"] == message["name"]:
+                text.append(following["text"])
+            else:
+                pending.append(following)
+                break
+        if pending:
+            # Put back the one message that ended the run, ahead of anything newer
+            with messages.mutex:
+                messages.queue.appendleft(pending[0])
+        return {**message, "text": "".join(text)}
+
+    def info(self) -> Dict:
+        memory = _process_rss_mb(self.process.pid) if self.alive else None
+        return {
+            "kernel_id": self.kernel_id,
+            "workspace": self.workspace,
+            "alive": self.alive,
+            "busy": self.busy,
+            "pid": self.process.pid if self.alive else None,
+            "python": self.python_version,
+            "execution_count": self.execution_count,
+            "memory_mb": round(memory, 1) if memory is not None else self.memory_mb,
+            "started_at": self.started_at,
+            "idle_seconds": round(time.time() - self.last_used, 1) if not self.busy else 0.0,
+        }
+
+
+class KernelService:
+    """Persistent Python kernels, one per workspace.
+
+    Running a cell against a kernel reuses everything earlier cells built
+    (imports, loaded data, models), so re-running the last step of a script
+    costs only that step. Kernels idle for `idle_timeout` seconds are shut
+    down, a kernel whose memory goes over `max_memory_mb` is restarted, and
+    starting more than `max_kernels` evicts the least recently used idle one.
+    """
+
+    def __init__(self, python: Optional[str] = None, idle_timeout: float = 1800.0,
+                 max_memory_mb: float = 2048.0, max_kernels: int = 8, reap_interval: float = 30.0):
+        self.python = python or shutil.which("python") or sys.executable
+        self.idle_timeout = idle_timeout
+        self.max_memory_mb = max_memory_mb
+        self.max_kernels = max_kernels
+        self.reap_interval = reap_interval
+        self.kernels: Dict[str, Kernel] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        _KERNELS.set_function(lambda: sum(1 for kernel in list(self.kernels.values()) if kernel.alive))
+
+    @classmethod
+    def from_env(cls) -> "KernelService":
+        return cls(
+            python=os.environ.get("ECHOIDE_KERNEL_PYTHON"),
+            idle_timeout=float(os.environ.get("ECHOIDE_KERNEL_IDLE_TIMEOUT", "1800")),
+            max_memory_mb=float(os.environ.get("ECHOIDE_KERNEL_MAX_MEMORY_MB", "2048")),
+            max_kernels=int(os.environ.get("ECHOIDE_KERNEL_MAX", "8")),
+        )
+
+    @staticmethod
+    def kernel_id(workspace: str) -> str:
+        return hashlib.sha1(os.path.realpath(workspace).encode("utf-8")).hexdigest()[:12]
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._reap_loop, name="kernel-reaper", daemon=True)
+            self._thread.start()
+
+    def get(self, kernel_id: str) -> Kernel:
+        kernel = self.kernels.get(kernel_id)
+        if kernel is None:
+            raise KeyError(f"Kernel not found: {kernel_id}")
+        return kernel
+
+    def get_or_start(self, workspace: str) -> Kernel:
+        """The workspace's kernel, starting it (and evicting another if at capacity) when needed"""
+        try:
+            kernel_id = self.kernel_id(workspace)
+            with self._lock:
+                kernel = self.kernels.get(kernel_id)
+                if kernel is None:
+                    self._make_room()
+                    kernel = self.kernels[kernel_id] = Kernel(kernel_id, os.path.realpath(workspace), self.python)
+            kernel.start()
+            return kernel
+        except Exception as e:
+            raise Exception(f"Failed to start kernel: {str(e)}")
+
+    def _make_room(self) -> None:
+        if len(self.kernels) < self.max_kernels:
+            return
+        idle = [kernel for kernel in self.kernels.values() if not kernel.busy]
+        if not idle:
+            raise Exception(f"All {self.max_kernels} kernels are busy")
+        victim = min(idle, key=lambda kernel: kernel.last_used)
+        del self.kernels[victim.kernel_id]
+        victim.shutdown()
+        _EVICTIONS.labels("capacity").inc()
+
+    def execute(self, workspace: str, code: str, filename: Optional[str] = None) -> Iterator[Dict]:
+        kernel = self.get_or_start(workspace)
+        for message in kernel.execute(code, filename):
+            yield message
+            if message["type"] == "done" and (message.get("memory_mb") or 0) > self.max_memory_mb:
+                kernel.restart()
+                _EVICTIONS.labels("memory").inc()
+                yield {"type": "status", "state": "restarted", "kernel_id": kernel.kernel_id,
+                       "reason": f"memory {message['memory_mb']} MB over the {self.max_memory_mb:g} MB limit"}
+
+    def run(self, workspace: str, code: str, filename: Optional[str] = None) -> Dict:
+        """execute() collected into one result, shaped like /api/execute's"""
+        stdout, stderr, result, error, done, restarted = [], [], None, None, {}, False
+        for message in self.execute(workspace, code, filename):
+            kind = message["type"]
+            if kind == "stream":
+                (stdout if message["name"] == "stdout" else stderr).append(message["text"])
+            elif kind == "result":
+                result = message["repr"]
+            elif kind == "error":
+                error = message
+                stderr.append(message["traceback"])
+            elif kind == "done":
+                done = message
+            elif kind == "status":
+                restarted = True
+        return {
+            "success": done.get("status") == "ok",
+            "status": done.get("status"),
+            "stdout": "".join(stdout),
+            "stderr": "".join(stderr),
+            "result": result,
+            "error": f"{error['ename']}: {error['evalue']}" if error else done.get("error"),
+            "duration": done.get("duration"),
+            "memory_mb": done.get("memory_mb"),
+            "restarted": restarted,
+        }
+
+    def interrupt(self, kernel_id: str) -> bool:
+        return self.get(kernel_id).interrupt()
+
+    def restart(self, kernel_id: str) -> Dict:
+        kernel = self.get(kernel_id)
+        try:
+            kernel.restart()
+        except Exception as e:
+            raise Exception(f"Failed to restart kernel: {str(e)}")
+        return kernel.info()
+
+    def shutdown_kernel(self, kernel_id: str) -> None:
+        with self._lock:
+            kernel = self.kernels.pop(kernel_id, None)
+        if kernel is None:
+            raise KeyError(f"Kernel not found: {kernel_id}")
+        kernel.shutdown()
+
+    def list_kernels(self) -> List[Dict]:
+        return [kernel.info() for kernel in list(self.kernels.values())]
+
+    def _reap_loop(self) -> None:
+        while not self._stop.wait(self.reap_interval):
+            self.reap()
+
+    def reap(self) -> None:
+        """Shut down idle kernels and restart ones over the memory limit"""
+        now = time.time()
+        for kernel in list(self.kernels.values()):
+            if not kernel.busy and now - kernel.last_used > self.idle_timeout:
+                with self._lock:
+                    self.kernels.pop(kernel.kernel_id, None)
+                kernel.shutdown()
+                _EVICTIONS.labels("idle").inc()
+                continue
+            memory = _process_rss_mb(kernel.process.pid) if kernel.alive else None
+            if memory is not None and memory > self.max_memory_mb:
+                # A running cell ends with status "dead"; the next one gets a fresh namespace
+                kernel.restart()
+                _EVICTIONS.labels("memory").inc()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        with self._lock:
+            kernels, self.kernels = list(self.kernels.values()), {}
+        for kernel in kernels:
+            kernel.shutdown()
@@ -0,0 +1,86 @@
+# backend/app/services/lazy.py
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LazyService:
+    """Stand-in for a service that is built on first use.
+
+    Attribute access is forwarded to the real instance, which `factory`
+    creates the first time it is needed (once, even when several threads
+    race for it). Factories import their module themselves, so nothing
+    heavy is imported until then. The stand-in's own names are prefixed
+    (`_lazy_*`, `lazy_*`) so they cannot hide the service's attributes;
+    `initialized` is the one exception.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.lazy_name = name
+        self._lazy_factory = factory
+        self._lazy_instance = None
+        self._lazy_lock = threading.Lock()
+        self.lazy_init_seconds: Optional[float] = None
+        self.lazy_error: Optional[str] = None
+
+    @property
+    def initialized(self) -> bool:
+        return self._lazy_instance is not None
+
+    def lazy_resolve(self) -> Any:
+        instance = self._lazy_instance
+        if instance is None:
+            with self._lazy_lock:
+                instance = self._lazy_instance
+                if instance is None:
+                    started = time.perf_counter()
+                    try:
+                        instance = self._lazy_factory()
+                    except Exception as e:
+                        self.lazy_error = str(e)
+                        raise
+                    self.lazy_init_seconds = time.perf_counter() - started
+                    self.lazy_error = None
+                    self._lazy_instance = instance
+        return instance
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only reached for names LazyService itself does not define
+        return getattr(self.lazy_resolve(), attr)
+
+    def lazy_status(self) -> Dict:
+        return {
+            "initialized": self.initialized,
+            "init_ms": round(self.lazy_init_seconds * 1000, 2) if self.lazy_init_seconds is not None else None,
+            "error": self.lazy_error,
+        }
+
+
+class Readiness:
+    """Background warm-up of lazy services, reported by /api/ready"""
+
+    def __init__(self, services: List[LazyService]):
+        self.services = services
+        self.started_at = time.perf_counter()
+        self.ready_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def warm_up(self) -> None:
+        """Build every service in order; a failure is recorded and the rest still build"""
+        for service in self.services:
+            try:
+                service.lazy_resolve()
+            except Exception:
+                continue
+        if not any(service.lazy_error for service in self.services):
+            self.ready_seconds = time.perf_counter() - self.started_at
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "ready_ms": round(self.ready_seconds * 1000, 2) if self.ready_seconds is not None else None,
+            "services": {service.lazy_name: service.lazy_status() for service in self.services},
+        }
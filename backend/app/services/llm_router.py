@@ -0,0 +1,253 @@
+# backend/app/services/llm_router.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from app.services.metrics import REGISTRY
+
+
+class BackendUnavailable(Exception):
+    """No Ollama backend could serve the request"""
+
+
+_BACKEND_LATENCY = REGISTRY.histogram("echoide_llm_backend_request_seconds",
+                                      "Latency of successful requests per Ollama backend", ["backend"])
+_BACKEND_OUTSTANDING = REGISTRY.gauge("echoide_llm_backend_outstanding",
+                                      "Requests in flight per Ollama backend", ["backend"])
+_BACKEND_HEALTHY = REGISTRY.gauge("echoide_llm_backend_healthy", "1 if the backend passed its last check",
+                                  ["backend"])
+_BACKEND_FAILURES = REGISTRY.counter("echoide_llm_backend_failures_total",
+                                     "Failed attempts (connection errors, retryable statuses)", ["backend"])
+
+
+def _normalize_model(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaBackend:
+    """One Ollama server: health, installed/loaded models and request stats"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True  # Optimistic until the first check says otherwise
+        self.checked_at = 0.0
+        self.models: Optional[Set[str]] = None   # From /api/tags; None = unknown
+        self.loaded: Set[str] = set()            # From /api/ps (models in memory)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.latency = _BACKEND_LATENCY.labels(self.url)
+        _BACKEND_OUTSTANDING.labels(self.url).set_function(lambda: self.outstanding)
+        _BACKEND_HEALTHY.labels(self.url).set_function(lambda: self.healthy)
+
+    def check_health(self, timeout: float = 2.0) -> bool:
+        try:
+            response = requests.get(f"{self.url}/api/tags", timeout=timeout)
+            response.raise_for_status()
+            self.models = {_normalize_model(m["name"]) for m in response.json().get("models", [])}
+            try:
+                # /api/ps only exists on newer Ollama versions
+                response = requests.get(f"{self.url}/api/ps", timeout=timeout)
+                self.loaded = ({_normalize_model(m["name"]) for m in response.json().get("models", [])}
+                               if response.ok else set())
+            except (requests.RequestException, ValueError):
+                self.loaded = set()
+            self.healthy = True
+            self.last_error = None
+        except Exception as e:
+            self.healthy = False
+            self.last_error = str(e)
+        self.checked_at = time.time()
+        return self.healthy
+
+    def affinity(self, model: Optional[str]) -> int:
+        """0 = model already in memory, 1 = installed, 2 = unknown, 3 = not installed"""
+        if not model:
+            return 1
+        model = _normalize_model(model)
+        if model in self.loaded:
+            return 0
+        if self.models is None:
+            return 2
+        return 1 if model in self.models else 3
+
+    def get_stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "checked_at": self.checked_at,
+            "models": sorted(self.models) if self.models is not None else None,
+            "loaded": sorted(self.loaded),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class BackendPool:
+    """Routes Ollama calls across several servers.
+
+    A backend is picked among healthy ones by model affinity (loaded, then
+    installed) and then by fewest outstanding requests. Connection errors,
+    5xx responses and "model not found" 404s fail over to the next candidate
+    for idempotent calls; generation and embedding requests have no server
+    side effects, so they are all treated as idempotent by default. A daemon
+    thread re-checks every backend each `health_interval` seconds, which is
+    also how a backend that failed comes back into rotation.
+    """
+
+    RETRYABLE_STATUS = {404, 500, 502, 503, 504}
+
+    def __init__(self, urls: List[str], health_interval: float = 15.0):
+        if not urls:
+            raise ValueError("At least one Ollama URL is required")
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "BackendPool":
+        """Backends from ECHOIDE_OLLAMA_URLS (comma separated), default localhost"""
+        urls = os.environ.get("ECHOIDE_OLLAMA_URLS", "http://localhost:11434")
+        return cls([url.strip() for url in urls.split(",") if url.strip()])
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _health_loop(self) -> None:
+        while not self._stop.is_set():
+            self.check_all()
+            self._stop.wait(self.health_interval)
+
+    def check_all(self) -> None:
+        for backend in self.backends:
+            backend.check_health()
+
+    def known_model(self, model: Optional[str]) -> Optional[str]:
+        """`model` with its tag if some backend has it installed or loaded; None otherwise"""
+        if not model:
+            return None
+        model = _normalize_model(model)
+        for backend in self.backends:
+            if model in backend.loaded or (backend.models is not None and model in backend.models):
+                return model
+        return None
+
+    def _candidates(self, model: Optional[str], prefer: Optional[str] = None) -> List[OllamaBackend]:
+        """All backends in routing order; unhealthy ones last, as a last resort.
+
+        A healthy `prefer` backend (the URL that served an earlier request of
+        the same conversation) goes first, since its KV cache may still hold
+        the prompt's prefix.
+        """
+        with self._lock:
+            return sorted(self.backends, key=lambda b: (not b.healthy, b.url != prefer, b.affinity(model),
+                                                        b.outstanding, b.latency.mean()))
+
+    def _acquire(self, backend: OllamaBackend) -> None:
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+
+    def _release(self, backend: OllamaBackend, started: Optional[float], error: Optional[str] = None) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            if started is not None:
+                backend.latency.observe(time.perf_counter() - started)
+            if error is not None:
+                backend.failures += 1
+                backend.last_error = error
+        if error is not None:
+            _BACKEND_FAILURES.labels(backend.url).inc()
+
+    def _send(self, path: str, payload: Dict, timeout: float, idempotent: bool, stream: bool,
+              prefer: Optional[str] = None):
+        """Yield (backend, response, started) for each usable response, best backend first"""
+        candidates = self._candidates(payload.get("model"), prefer)
+        if not idempotent:
+            candidates = candidates[:1]
+        last_error = None
+        for backend in candidates:
+            self._acquire(backend)
+            started = time.perf_counter()
+            try:
+                response = requests.post(f"{backend.url}{path}", json=payload, stream=stream, timeout=timeout)
+            except requests.RequestException as e:
+                self._release(backend, None, str(e))
+                if isinstance(e, requests.ConnectionError):
+                    backend.healthy = False
+                last_error = e
+                continue
+            yield backend, response, started
+        if last_error is not None:
+            raise BackendUnavailable(f"No Ollama backend reachable: {last_error}")
+        raise BackendUnavailable("No Ollama backend returned a usable response")
+
+    def post(self, path: str, payload: Dict, timeout: float, idempotent: bool = True,
+             prefer: Optional[str] = None) -> requests.Response:
+        """POST to the best backend, failing over on retryable errors.
+
+        Returns the first non-retryable response, or the last retryable one
+        if every backend gave one; raises BackendUnavailable if no backend
+        could be reached at all. The URL of the backend that answered is
+        set as `response.backend_url`.
+        """
+        last_response = None
+        try:
+            for backend, response, started in self._send(path, payload, timeout, idempotent, stream=False,
+                                                         prefer=prefer):
+                if response.status_code in self.RETRYABLE_STATUS:
+                    self._release(backend, None, f"HTTP {response.status_code}")
+                    last_response = response
+                    continue
+                self._release(backend, started)
+                response.backend_url = backend.url
+                return response
+        except BackendUnavailable:
+            if last_response is None:
+                raise
+        return last_response
+
+    @contextmanager
+    def stream(self, path: str, payload: Dict, timeout: float, idempotent: bool = True):
+        """Streaming POST; failover only happens before the body is read"""
+        last_response = None
+        try:
+            for backend, response, started in self._send(path, payload, timeout, idempotent, stream=True):
+                if response.status_code in self.RETRYABLE_STATUS:
+                    response.close()
+                    self._release(backend, None, f"HTTP {response.status_code}")
+                    last_response = response
+                    continue
+                try:
+                    with response:
+                        yield response
+                finally:
+                    self._release(backend, started)
+                return
+        except BackendUnavailable:
+            if last_response is None:
+                raise
+        yield last_response
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "health_interval": self.health_interval,
+                "backends": [backend.get_stats() for backend in self.backends],
+            }
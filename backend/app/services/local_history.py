@@ -0,0 +1,251 @@
+# backend/app/services/local_history.py
+import difflib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.services.metrics import REGISTRY
+
+_SAVES = REGISTRY.counter("echoide_history_saves_total", "File versions recorded in local history",
+                          ["blob"])  # blob: new, shared (content already stored), unchanged (no new version)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replace `path` with `data`: temp file in the same directory, fsync, rename.
+
+    Readers see the old content or the new, never a partial file, and the
+    new content is on disk before the rename makes it visible. An existing
+    file keeps its permission bits.
+    """
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = None
+    try:
+        with open(temp_path, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class LocalHistory:
+    """Versions of saved files, kept under ~/.echoide/history.
+
+    Each version's content goes into a content-addressed blob store
+    (blobs/<sha256[:2]>/<sha256>, zlib-compressed), so saving the same
+    content again, or content another file already has, costs an index row
+    and no new blob. The index is a SQLite database shared by all workers.
+    Retention keeps at most `max_versions` per file, drops versions older
+    than `max_days` (a file's newest version is always kept) and, past
+    `max_bytes` of blobs, the oldest versions of all files; blobs no
+    version refers to any more are then deleted.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            saved_at REAL NOT NULL,
+            blob TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            source TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS versions_path ON versions (path, id);
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            stored INTEGER NOT NULL
+        );
+    """
+
+    PRUNE_EVERY = 200  # Recorded versions between whole-store retention passes
+
+    def __init__(self, root: Optional[str] = None, max_versions: int = 100, max_days: float = 30,
+                 max_bytes: int = 256 * 1024 * 1024, max_file_bytes: int = 10 * 1024 * 1024):
+        self.root = root or os.path.join(os.path.expanduser("~"), ".echoide", "history")
+        self.max_versions = max_versions
+        self.max_days = max_days
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes  # Larger files are saved without history
+        os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+        self._recorded = 0
+
+    @classmethod
+    def from_env(cls) -> "LocalHistory":
+        """ECHOIDE_HISTORY_MAX_VERSIONS, ECHOIDE_HISTORY_DAYS and ECHOIDE_HISTORY_MAX_MB"""
+        return cls(max_versions=int(os.environ.get("ECHOIDE_HISTORY_MAX_VERSIONS", "100")),
+                   max_days=float(os.environ.get("ECHOIDE_HISTORY_DAYS", "30")),
+                   max_bytes=int(float(os.environ.get("ECHOIDE_HISTORY_MAX_MB", "256")) * 1024 * 1024))
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction; a save and a prune in different workers cannot interleave"""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    # Blobs
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _store_blob(self, connection: sqlite3.Connection, digest: str, data: bytes) -> bool:
+        """Store content under its hash; False if it was already there"""
+        path = self._blob_path(digest)
+        if connection.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() and os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as handle:
+            handle.write(compressed)
+        os.replace(temp_path, path)
+        connection.execute("INSERT OR IGNORE INTO blobs (hash, size, stored) VALUES (?, ?, ?)",
+                           (digest, len(data), len(compressed)))
+        return True
+
+    def _read_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as handle:
+            return zlib.decompress(handle.read())
+
+    # Versions
+
+    def record(self, path: str, data: bytes, source: str = "save") -> Optional[int]:
+        """Add a version of `path` with content `data`; its id, or None when it is the newest already"""
+        if len(data) > self.max_file_bytes:
+            return None
+        path = os.path.realpath(path)
+        digest = hashlib.sha256(data).hexdigest()
+        with self._transaction() as connection:
+            latest = connection.execute("SELECT blob FROM versions WHERE path = ? ORDER BY id DESC LIMIT 1",
+                                        (path,)).fetchone()
+            if latest is not None and latest[0] == digest:
+                _SAVES.labels("unchanged").inc()
+                return None
+            new_blob = self._store_blob(connection, digest, data)
+            version_id = connection.execute(
+                "INSERT INTO versions (path, saved_at, blob, size, source) VALUES (?, ?, ?, ?, ?)",
+                (path, time.time(), digest, len(data), source)).lastrowid
+            # Versions past max_versions; their blobs go in the next prune
+            connection.execute(
+                "DELETE FROM versions WHERE path = ? AND id <= (SELECT id FROM versions WHERE path = ? "
+                "ORDER BY id DESC LIMIT 1 OFFSET ?)", (path, path, self.max_versions))
+        _SAVES.labels("new" if new_blob else "shared").inc()
+        self._recorded += 1
+        if self._recorded % self.PRUNE_EVERY == 0:
+            self.prune()
+        return version_id
+
+    def has_versions(self, path: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM versions WHERE path = ? LIMIT 1",
+                                       (os.path.realpath(path),)).fetchone() is not None
+
+    def list_versions(self, path: str) -> List[Dict]:
+        """Versions of a file, newest first"""
+        rows = self._connect().execute(
+            "SELECT id, saved_at, size, source, blob FROM versions WHERE path = ? ORDER BY id DESC",
+            (os.path.realpath(path),)).fetchall()
+        return [{"id": row[0], "saved_at": row[1], "size": row[2], "source": row[3], "hash": row[4]}
+                for row in rows]
+
+    def get_version(self, version_id: int) -> Tuple[str, bytes]:
+        """(path, content) of a version; KeyError if it does not exist (any more)"""
+        row = self._connect().execute("SELECT path, blob FROM versions WHERE id = ?", (version_id,)).fetchone()
+        if row is None:
+            raise KeyError(version_id)
+        return row[0], self._read_blob(row[1])
+
+    def diff(self, version_id: int, other_id: Optional[int] = None, context: int = 3) -> str:
+        """Unified diff from a version to another one, or to the file as it is on disk"""
+        path, old = self.get_version(version_id)
+        if other_id is not None:
+            _, new = self.get_version(other_id)
+            new_label = f"{path} (version {other_id})"
+        else:
+            try:
+                with open(path, "rb") as handle:
+                    new = handle.read()
+            except FileNotFoundError:
+                new = b""
+            new_label = path
+        return "".join(difflib.unified_diff(
+            old.decode("utf-8", errors="replace").splitlines(keepends=True),
+            new.decode("utf-8", errors="replace").splitlines(keepends=True),
+            f"{path} (version {version_id})", new_label, n=context))
+
+    # Retention
+
+    def prune(self) -> Dict:
+        """Apply the age and size limits to the whole store and delete unreferenced blobs"""
+        with self._transaction() as connection:
+            # Versions past max_days, except the newest of each file
+            connection.execute(
+                "DELETE FROM versions WHERE saved_at < ? AND id NOT IN "
+                "(SELECT MAX(id) FROM versions GROUP BY path)", (time.time() - self.max_days * 86400,))
+            orphans = self._orphans(connection)
+            stored = connection.execute("SELECT COALESCE(SUM(stored), 0) FROM blobs").fetchone()[0]
+            while stored > self.max_bytes:
+                # Oldest versions first, in batches, keeping every file's newest
+                deleted = connection.execute(
+                    "DELETE FROM versions WHERE id IN (SELECT id FROM versions WHERE id NOT IN "
+                    "(SELECT MAX(id) FROM versions GROUP BY path) ORDER BY id LIMIT 10)").rowcount
+                if not deleted:
+                    break
+                orphans += self._orphans(connection)
+                stored = connection.execute("SELECT COALESCE(SUM(stored), 0) FROM blobs").fetchone()[0]
+            # Still under the write lock, so no save can be storing one of these again meanwhile
+            for digest in orphans:
+                try:
+                    os.remove(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
+        return {"removed_blobs": len(orphans), "stored_bytes": stored}
+
+    @staticmethod
+    def _orphans(connection: sqlite3.Connection) -> List[str]:
+        """Drop the rows of blobs no version refers to; their hashes"""
+        orphans = [row[0] for row in connection.execute(
+            "SELECT hash FROM blobs WHERE hash NOT IN (SELECT blob FROM versions)").fetchall()]
+        connection.executemany("DELETE FROM blobs WHERE hash = ?", [(digest,) for digest in orphans])
+        return orphans
+
+    def get_stats(self) -> Dict:
+        connection = self._connect()
+        versions, files = connection.execute("SELECT COUNT(*), COUNT(DISTINCT path) FROM versions").fetchone()
+        blobs, size, stored = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored), 0) FROM blobs").fetchone()
+        return {"files": files, "versions": versions, "blobs": blobs, "content_bytes": size,
+                "stored_bytes": stored, "max_versions": self.max_versions, "max_days": self.max_days,
+                "max_bytes": self.max_bytes}
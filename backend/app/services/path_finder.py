@@ -0,0 +1,314 @@
+# backend/app/services/path_finder.py
+import heapq
+import os
+import re
+import threading
+from itertools import accumulate
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+# One bit per letter and digit of a path; anything non-ASCII shares the top bit
+_CHAR_BITS = np.zeros(256, dtype=np.uint64)
+for _bit, _char in enumerate("abcdefghijklmnopqrstuvwxyz0123456789"):
+    _CHAR_BITS[ord(_char)] = 1 << _bit
+_CHAR_BITS[128:] = _CHAR_BITS[ord("?")] = 1 << 63  # "?" stands for characters latin-1 cannot encode
+
+
+def fold_case(text: str) -> str:
+    """Lowercase `text` one character for one, so offsets into it are offsets into `text`"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    if "\n" in text:
+        # Only the lines holding a character that lowercases to several ("İ") take the slow path
+        return "\n".join(fold_case(line) for line in text.split("\n"))
+    return "".join(char.lower()[0] for char in text)
+
+
+def char_mask(text: str) -> int:
+    """Bitmask of the characters in (lowercased) `text`"""
+    mask = 0
+    for code in set(text.encode("latin-1", errors="replace")):
+        mask |= int(_CHAR_BITS[code])
+    return mask
+
+
+def line_masks(lowered: str, offsets: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """char_mask of every line of a newline-joined blob, computed in chunks of lines"""
+    codes = np.frombuffer(lowered.encode("latin-1", errors="replace"), dtype=np.uint8)
+    masks = np.zeros(len(offsets) - 1, dtype=np.uint64)
+    for first in range(0, len(masks), chunk):
+        last = min(first + chunk, len(masks))
+        start = int(offsets[first])
+        bits = _CHAR_BITS[codes[start:int(offsets[last]) - 1]]
+        masks[first:last] = np.bitwise_or.reduceat(bits, (offsets[first:last] - start).astype(np.int64))
+    return masks
+
+
+class PathIndex:
+    """Compact, fuzzy-searchable list of the file paths in one project.
+
+    Paths are kept in one newline-joined string (plus a lowercased copy and a
+    lowercased basename-only copy) with uint32 offset arrays, instead of 500k
+    str objects, and a 64-bit mask of the characters in each path and each
+    basename. A query is matched against the basenames (substring matches
+    first, then subsequence), then against full paths if that found fewer
+    than MAX_SCORED. Each pass only looks at the lines whose mask has every
+    character of the query (one vectorised AND over all paths) and checks
+    at most MAX_CHECKED (MAX_CHECKED_FULL) of them with a backtracking-free
+    subsequence regex. Paths are sorted shallow/short first, so the lines
+    checked are the ones the finder prefers anyway, and a query for a rare
+    name costs no more than a common one however large the project is.
+    """
+
+    MAX_SCORED = 120
+    MAX_CHECKED = 2000  # Candidate basenames checked per query
+    MAX_CHECKED_FULL = 6000  # Candidate full paths checked when the basenames gave too few hits
+    MERGE_THRESHOLD = 2000  # Added paths kept aside before folding into the blobs
+
+    def __init__(self, root: str, paths: List[str]):
+        self.root = root
+        self.generation = 0
+        self._lock = threading.RLock()
+        self._build(paths)
+
+    @staticmethod
+    def _sort_key(path: str):
+        return (path.count('/'), len(path), path)
+
+    @staticmethod
+    def _offsets(parts: List[str]) -> np.ndarray:
+        return np.fromiter(accumulate((len(part) + 1 for part in parts), initial=0),
+                           dtype=np.uint32, count=len(parts) + 1)
+
+    def _build(self, paths: List[str]) -> None:
+        paths = sorted(set(paths), key=self._sort_key)
+        basenames = [path[path.rfind('/') + 1:] for path in paths]
+
+        self.blob = "\n".join(paths) + "\n"
+        self.lowered = fold_case(self.blob)  # Shares self.offsets with the blob
+        self.offsets = self._offsets(paths)
+        self.base_lowered = fold_case("\n".join(basenames) + "\n")
+        self.base_offsets = self._offsets(basenames)
+        self.masks = line_masks(self.lowered, self.offsets)
+        self.base_masks = line_masks(self.base_lowered, self.base_offsets)
+        self.count = len(paths)
+        self.removed: Set[int] = set()
+        self.added: List[str] = []
+        self.generation += 1
+
+    def path(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def _find_id(self, path: str) -> int:
+        if self.blob.startswith(path + "\n"):
+            return 0
+        position = self.blob.find("\n" + path + "\n")
+        return int(np.searchsorted(self.offsets, position + 1)) if position >= 0 else -1
+
+    def all_paths(self) -> List[str]:
+        with self._lock:
+            return [self.path(i) for i in range(self.count) if i not in self.removed] + list(self.added)
+
+    def add(self, path: str) -> None:
+        with self._lock:
+            if path in self.added:
+                return
+            i = self._find_id(path)
+            if i >= 0 and i not in self.removed:
+                return
+            if i >= 0:
+                self.removed.discard(i)
+            else:
+                self.added.append(path)
+            self.generation += 1
+            if len(self.added) > self.MERGE_THRESHOLD:
+                self._build(self.all_paths())
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            if path in self.added:
+                self.added.remove(path)
+            else:
+                i = self._find_id(path)
+                if i < 0:
+                    return
+                self.removed.add(i)
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return self.count - len(self.removed) + len(self.added)
+
+    @staticmethod
+    def _subsequence_pattern(needle: str) -> str:
+        # "a[^b\n]*b[^c\n]*c": each gap stops at the first occurrence of the
+        # next character, so the regex never backtracks inside a line
+        parts = [re.escape(needle[0])]
+        for char in needle[1:]:
+            parts.append(f"[^{re.escape(char)}\\n]*{re.escape(char)}")
+        return "".join(parts)
+
+    def _scan(self, pattern, blob: str, offsets: np.ndarray, candidates: np.ndarray, checks: int,
+              found: Dict[int, None], needle: Optional[str] = None) -> List[int]:
+        """New ids among the first `checks` candidate lines matching `pattern`.
+
+        With `needle`, lines that contain it come first and the scan stops once
+        they fill the MAX_SCORED slots; the other matches follow.
+        """
+        hits, fuzzy = [], []
+        search, find = pattern.search, blob.find
+        checked = candidates[:checks]
+        for i, start, end in zip(checked.tolist(), offsets[checked].tolist(), offsets[checked + 1].tolist()):
+            if i in found or i in self.removed or not search(blob, start, end - 1):
+                continue
+            if needle is None or find(needle, start, end - 1) >= 0:
+                hits.append(i)
+                if len(found) + len(hits) >= self.MAX_SCORED:
+                    break
+            else:
+                fuzzy.append(i)
+        return hits + fuzzy
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        needle = "".join(fold_case(query).split())
+        if not needle:
+            return []
+
+        subsequence = re.compile(self._subsequence_pattern(needle))
+        wanted = np.uint64(char_mask(needle))
+        found: Dict[int, None] = {}  # Insertion-ordered set of ids
+        with self._lock:
+            if '/' not in needle:
+                # Basename substring and basename subsequence matches, in one pass
+                candidates = np.flatnonzero((self.base_masks & wanted) == wanted)
+                hits = self._scan(subsequence, self.base_lowered, self.base_offsets, candidates,
+                                  self.MAX_CHECKED, found, needle)
+                found.update(dict.fromkeys(hits[:self.MAX_SCORED]))
+            if len(found) < self.MAX_SCORED:
+                candidates = np.flatnonzero((self.masks & wanted) == wanted)
+                hits = self._scan(subsequence, self.lowered, self.offsets, candidates,
+                                  self.MAX_CHECKED_FULL, found)
+                found.update(dict.fromkeys(hits))
+
+            candidates = [self.path(i) for i in found]
+            candidates.extend(path for path in self.added if subsequence.search(fold_case(path)))
+
+        scored = [(score_path(path, needle), path) for path in candidates]
+        best = heapq.nlargest(limit, scored, key=lambda item: item[0])
+        return [
+            {
+                "path": os.path.join(self.root, path.replace('/', os.sep)),
+                "relative_path": path,
+                "name": path[path.rfind('/') + 1:],
+                "score": score,
+                "positions": match_positions(fold_case(path), needle),
+            }
+            for score, path in best
+        ]
+
+
+_SEPARATORS = '/\\_-. '
+
+
+def match_positions(lowered: str, needle: str) -> List[int]:
+    """Tightest match of `needle` as a subsequence, preferring the basename"""
+    base_start = lowered.rfind('/') + 1
+    for start in (base_start, 0):
+        positions = []
+        position = start
+        for char in needle:
+            position = lowered.find(char, position)
+            if position < 0:
+                break
+            positions.append(position)
+            position += 1
+        else:
+            # Walk back from the end of the forward match to drop leading slack
+            end = positions[-1]
+            back = []
+            for char in reversed(needle):
+                end = lowered.rfind(char, start, end + 1)
+                back.append(end)
+                end -= 1
+            return back[::-1]
+    return []
+
+
+def score_path(path: str, needle: str) -> int:
+    """fzf-style score: boundary and camelCase bonuses, consecutive bonus, gap penalty"""
+    lowered = fold_case(path)
+    positions = match_positions(lowered, needle)
+    if not positions:
+        return -(1 << 30)
+
+    base_start = lowered.rfind('/') + 1
+    score = 0
+    previous = -2
+    for position in positions:
+        before = path[position - 1] if position > 0 else '/'
+        if before in _SEPARATORS:
+            score += 10 if before == '/' else 8
+        elif path[position].isupper() and before.islower():
+            score += 7
+        if position == previous + 1:
+            score += 5
+        elif previous >= 0:
+            score -= min(position - previous - 1, 8)
+        previous = position
+
+    if positions[0] >= base_start:
+        score += 20
+        if lowered.startswith(needle, base_start):
+            score += 15
+    return score * 16 - len(path)
+
+
+class PathFinderService:
+    """Per-project path indexes for the "go to file" finder"""
+
+    def __init__(self, project_service):
+        self.project_service = project_service
+        self.indexes: Dict[str, PathIndex] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _root(project_path: str) -> str:
+        return os.path.abspath(project_path)
+
+    def build_index(self, project_path: str) -> PathIndex:
+        """(Re)build the index from a fresh ProjectService scan"""
+        root = self._root(project_path)
+        if not os.path.isdir(root):
+            raise Exception(f"Invalid project directory: {project_path}")
+        index = PathIndex(root, self.project_service.scan_files(root))
+        with self._lock:
+            self.indexes[root] = index
+        return index
+
+    def get_index(self, project_path: str) -> PathIndex:
+        index = self.indexes.get(self._root(project_path))
+        return index if index is not None else self.build_index(project_path)
+
+    def find(self, project_path: str, query: str, limit: int = 20) -> List[Dict]:
+        try:
+            return self.get_index(project_path).search(query, limit)
+        except Exception as e:
+            raise Exception(f"Failed to find file: {str(e)}")
+
+    def _locate(self, path: str):
+        abs_path = os.path.abspath(path)
+        for root, index in list(self.indexes.items()):
+            if abs_path.startswith(root.rstrip(os.sep) + os.sep):
+                return index, os.path.relpath(abs_path, root).replace(os.sep, '/')
+        return None, None
+
+    def notify_changed(self, path: str) -> None:
+        index, rel_path = self._locate(path)
+        if index is not None and os.path.isfile(path):
+            index.add(rel_path)
+
+    def notify_deleted(self, path: str) -> None:
+        index, rel_path = self._locate(path)
+        if index is not None:
+            index.remove(rel_path)
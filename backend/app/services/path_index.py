@@ -0,0 +1,98 @@
+# backend/app/services/path_index.py
+import os
+from typing import Dict, List, Optional
+
+
+class AllowedPathIndex:
+    """Allow-list of root directories stored as a path-component trie.
+
+    Roots and queried paths are canonicalised with realpath, so symlinks that
+    point outside every root are rejected and `/home/a` no longer admits the
+    sibling `/home/ab`. Every query is resolved again, since a symlink can be
+    re-pointed at any time; only the trie walk is cached, keyed by the
+    canonical path, until the set of roots changes.
+    """
+
+    _TERMINAL = ""  # Key marking "a root ends at this node" (never a valid component)
+
+    def __init__(self, roots: Optional[List[str]] = None, cache_size: int = 4096):
+        self._trie: Dict = {}
+        self._roots: List[str] = []
+        self._cache: Dict[str, bool] = {}
+        self.cache_size = cache_size
+
+        for root in roots or []:
+            self.add(root)
+
+    @staticmethod
+    def canonicalize(path: str) -> str:
+        """Resolve symlinks, '..' segments and case (on Windows) once"""
+        return os.path.normcase(os.path.realpath(os.path.abspath(path)))
+
+    @staticmethod
+    def _components(canonical_path: str) -> List[str]:
+        drive, rest = os.path.splitdrive(canonical_path)
+        parts = [part for part in rest.replace("\\", "/").split("/") if part]
+        return [drive or "/"] + parts
+
+    def add(self, path: str) -> bool:
+        """Add a root; returns False if it was already covered by an existing root"""
+        canonical = self.canonicalize(path)
+        node = self._trie
+
+        for component in self._components(canonical):
+            if self._TERMINAL in node:
+                return False  # An ancestor root already grants access
+            node = node.setdefault(component, {})
+
+        if self._TERMINAL in node:
+            return False
+
+        # Any roots below this one are now redundant
+        node.clear()
+        node[self._TERMINAL] = True
+        self._roots = [root for root in self._roots if not self._is_under(root, canonical)]
+        self._roots.append(canonical)
+        self._cache.clear()
+        return True
+
+    @staticmethod
+    def _is_under(path: str, root: str) -> bool:
+        return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+    def contains(self, path: str) -> bool:
+        """Check whether `path` resolves to a location inside any root"""
+        try:
+            canonical = self.canonicalize(path)
+        except (OSError, ValueError):
+            return False
+        cached = self._cache.get(canonical)
+        if cached is not None:
+            return cached
+
+        try:
+            node = self._trie
+            allowed = False
+            for component in self._components(canonical):
+                if self._TERMINAL in node:
+                    allowed = True
+                    break
+                node = node.get(component)
+                if node is None:
+                    break
+            else:
+                allowed = self._TERMINAL in node
+        except (OSError, ValueError):
+            allowed = False
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[canonical] = allowed
+        return allowed
+
+    def roots(self) -> List[str]:
+        """Canonical roots currently in the index (redundant nested roots removed)"""
+        return list(self._roots)
+
+    def __len__(self) -> int:
+        return len(self._roots)
@@ -0,0 +1,237 @@
+# backend/app/services/profiler.py
+import collections
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+PROFILE_HEADER = b"x-echoide-profile"
+PROFILE_ID_HEADER = b"x-echoide-profile-id"
+
+_CURRENT: ContextVar[Optional["RequestProfile"]] = ContextVar("echoide_profile", default=None)
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    """Profile of the request being handled, if it is being profiled"""
+    return _CURRENT.get()
+
+
+_frame_labels: Dict[object, str] = {}  # Code object -> "func (file.py:line)"
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        # ';' separates frames in the collapsed format
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+        _frame_labels[code] = label
+    return label
+
+
+def _collapse(frame, root: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(root)
+    labels.reverse()
+    return ";".join(labels)
+
+
+class RequestProfile:
+    """Stack samples and wall/CPU times of one request.
+
+    Samples come from the event loop thread for the whole request and from
+    IO worker threads while they run work submitted by it. The loop thread
+    is shared, so loop samples and loop CPU include whatever other requests
+    it served at the same time.
+    """
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = time.time()
+        self.status = 0
+        self.wall_seconds = 0.0
+        self.loop_cpu_seconds = 0.0
+        self.worker_cpu_seconds = 0.0
+        self.samples = 0
+        self.stacks: collections.Counter = collections.Counter()
+        self._threads: Dict[int, str] = {}  # Thread id -> flame graph root label
+        self._depth: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, root: str) -> tuple:
+        """Sample the calling thread until detach(); returns the token detach() needs"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._depth[ident] = self._depth.get(ident, 0) + 1
+            self._threads[ident] = root
+        return ident, time.thread_time()
+
+    def detach(self, token: tuple, worker: bool = True) -> None:
+        ident, cpu_started = token
+        cpu = time.thread_time() - cpu_started
+        with self._lock:
+            if worker:
+                self.worker_cpu_seconds += cpu
+            else:
+                self.loop_cpu_seconds += cpu
+            self._depth[ident] -= 1
+            if not self._depth[ident]:
+                del self._depth[ident], self._threads[ident]
+
+    def sample(self, frames: Dict[int, object]) -> None:
+        with self._lock:
+            threads = list(self._threads.items())
+        collapsed = [_collapse(frames[ident], root) for ident, root in threads if ident in frames]
+        with self._lock:
+            self.samples += 1
+            self.stacks.update(collapsed)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: one 'root;frame;...;leaf count' line per stack"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 10) -> Dict:
+        with self._lock:
+            leaves = collections.Counter()
+            for stack, count in self.stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            cpu = self.loop_cpu_seconds + self.worker_cpu_seconds
+            return {
+                "id": self.id,
+                "method": self.method,
+                "path": self.path,
+                "status": self.status,
+                "reason": self.reason,
+                "started_at": self.started_at,
+                "wall_seconds": round(self.wall_seconds, 6),
+                "cpu_seconds": round(cpu, 6),
+                "loop_cpu_seconds": round(self.loop_cpu_seconds, 6),
+                "worker_cpu_seconds": round(self.worker_cpu_seconds, 6),
+                "off_cpu_seconds": round(max(0.0, self.wall_seconds - cpu), 6),
+                "samples": self.samples,
+                "top_frames": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(top)],
+            }
+
+
+class RequestProfiler:
+    """Sampling profiler for individual requests.
+
+    A request is profiled when it carries `X-EchoIDE-Profile: 1`, or at
+    random with probability `sample_rate`. One sampler thread reads every
+    profiled thread's stack each `interval` seconds, and only runs while a
+    profiled request is in flight, so unprofiled traffic pays a header check
+    and one random() call. Finished profiles are kept in a ring of the last
+    `capacity`.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, interval: float = 0.005, capacity: int = 50):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.profiles: collections.deque = collections.deque(maxlen=capacity)
+        self._active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        return cls(
+            sample_rate=float(os.environ.get("ECHOIDE_PROFILE_SAMPLE_RATE", "0")),
+            interval=float(os.environ.get("ECHOIDE_PROFILE_INTERVAL_MS", "5")) / 1000,
+            capacity=int(os.environ.get("ECHOIDE_PROFILE_CAPACITY", "50")),
+        )
+
+    def should_profile(self, headers) -> Optional[str]:
+        """'header', 'sampled' or None"""
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                return "header" if value.strip().lower() in (b"1", b"true", b"yes", b"on") else None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def begin(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active.append(profile)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="echoide-profiler", daemon=True)
+                self._sampler.start()
+
+    def end(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active.remove(profile)
+            self.profiles.append(profile)
+
+    def _sample_loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            for profile in active:
+                profile.sample(frames)
+            del frames
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in list(self.profiles):
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def list_profiles(self) -> List[Dict]:
+        return [profile.summary(top=3) for profile in reversed(list(self.profiles))]
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles opted-in or sampled requests.
+
+    Profiled responses carry an `X-EchoIDE-Profile-Id` header; the profile
+    is then available from /api/debug/profiles/{id}.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, exclude_prefix: str = "/api/debug/"):
+        self.app = app
+        self.profiler = profiler
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+        reason = self.profiler.should_profile(scope["headers"])
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + \
+                    [(PROFILE_ID_HEADER, profile.id.encode("ascii"))]
+            await send(message)
+
+        context_token = _CURRENT.set(profile)
+        loop_token = profile.attach("event-loop")
+        started = time.perf_counter()
+        self.profiler.begin(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.wall_seconds = time.perf_counter() - started
+            profile.detach(loop_token, worker=False)
+            self.profiler.end(profile)
+            _CURRENT.reset(context_token)
@@ -10,6 +10,10 @@ class ProjectService:
             'package.json', 'requirements.txt', 'Cargo.toml', 'pom.xml',
             'go.mod', 'composer.json', '.gitignore', 'README.md'
         }
+        self.ignore_directories = {
+            'node_modules', '__pycache__', '.git', 'venv', '.venv', 'target',
+            'dist', 'build', '.idea', '.vscode', '.pytest_cache'
+        }
     
     def open_project(self, project_path: str) -> Dict:
         """Open and analyze a project directory"""
@@ -42,6 +46,17 @@ class ProjectService:
         except Exception as e:
             raise Exception(f"Failed to get project structure: {str(e)}")
     
+    def scan_files(self, project_path: str) -> List[str]:
+        """List every file in the project as a '/'-separated path relative to the root"""
+        abs_path = os.path.abspath(project_path)
+        paths = []
+        for root, dirs, files in os.walk(abs_path):
+            dirs[:] = [d for d in dirs if d not in self.ignore_directories]
+            rel_root = os.path.relpath(root, abs_path).replace(os.sep, '/')
+            prefix = '' if rel_root == '.' else rel_root + '/'
+            paths.extend(prefix + name for name in files)
+        return paths
+    
     def _detect_project_type(self, path: str) -> str:
         """Detect project type based on files"""
         files = os.listdir(path)
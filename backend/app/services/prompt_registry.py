@@ -0,0 +1,249 @@
+# backend/app/services/prompt_registry.py
+import json
+import os
+import string
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.services.token_utils import estimate_tokens
+
+_FORMATTER = string.Formatter()
+
+
+class PromptTemplateError(Exception):
+    """One or more prompt template files are invalid"""
+
+
+def _fields(text: str) -> List[str]:
+    return [field for _, field, _, _ in _FORMATTER.parse(text) if field is not None]
+
+
+def _literal_text(text: str) -> str:
+    """The template with its placeholders dropped"""
+    return ''.join(literal for literal, _, _, _ in _FORMATTER.parse(text))
+
+
+def _escape(text: str) -> str:
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def _partial_format(text: str, values: Dict[str, str]) -> str:
+    """Fill in `values`, leaving every other placeholder for the per-request format"""
+    parts = []
+    for literal, field, spec, conversion in _FORMATTER.parse(text):
+        parts.append(_escape(literal))
+        if field is None:
+            continue
+        if field in values:
+            parts.append(_escape(format(values[field], spec or '')))
+        else:
+            parts.append('{' + field + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}')
+    return ''.join(parts)
+
+
+class PreparedPrompt:
+    """A template with everything but the per-request fields already rendered"""
+
+    __slots__ = ('name', 'model', 'options', 'system', 'user', 'system_is_static', 'static_tokens')
+
+    def __init__(self, name: str, model: str, options: Dict, system: str, user: str):
+        self.name = name
+        self.model = model
+        self.options = options
+        self.system_is_static = not _fields(system)
+        self.system = _literal_text(system) if self.system_is_static else system
+        self.user = user
+        # Tokens the template itself costs, without the per-request fields
+        self.static_tokens = estimate_tokens(_literal_text(system)) + estimate_tokens(_literal_text(user))
+
+    def render(self, **values) -> Tuple[str, str]:
+        """(system, user) message contents"""
+        system = self.system if self.system_is_static else self.system.format_map(values)
+        return system, self.user.format_map(values)
+
+
+class PromptRegistry:
+    """Prompt templates loaded once from JSON files.
+
+    Each file in app/prompts/ (overridable per user in ~/.echoide/prompts/)
+    defines one template: `system` and `user` format strings, the default
+    `model` and `options`, `key_fields` whose values select an entry of
+    `values` (e.g. "review/python"), a `default` entry for keys not listed,
+    the per-request `dynamic` fields, optional `key_options` adding options
+    for some keys (e.g. stop sequences per language), and optional
+    `variants` keyed by model name or family ("llama3" matches "llama3:8b")
+    overriding system, user or options. Every known key is rendered up front, so a request costs one
+    dict lookup plus formatting the per-request fields.
+    """
+
+    MAX_LAZY = 512  # Prepared prompts kept for keys rendered from `default`
+    MAX_MODELS = 256  # (template, model) variant lookups kept; model names come from clients too
+
+    def __init__(self, directories: Optional[List[str]] = None):
+        self.directories = directories or [
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts"),
+            os.path.join(os.path.expanduser("~"), ".echoide", "prompts"),
+        ]
+        self.templates: Dict[str, Dict] = {}
+        self.sources: Dict[str, str] = {}
+        self.prepared: Dict[Tuple[str, str, str], PreparedPrompt] = {}
+        self._variant_by_model: Dict[Tuple[str, str], str] = {}
+        self._lazy = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        """(Re)load all templates; raises PromptTemplateError and keeps the old set on failure"""
+        templates, sources = {}, {}
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    with open(path, "r", encoding="utf-8") as handle:
+                        templates[filename[:-5]] = json.load(handle)
+                    sources[filename[:-5]] = path
+                except (OSError, ValueError) as e:
+                    raise PromptTemplateError(f"{path}: {str(e)}")
+
+        errors = []
+        for name, template in templates.items():
+            errors.extend(f"{sources[name]}: {error}" for error in self._validate(template))
+        if errors:
+            raise PromptTemplateError("Invalid prompt templates:\n" + "\n".join(errors))
+
+        prepared = {}
+        for name, template in templates.items():
+            for key in template.get("values", {}):
+                for variant in [""] + list(template.get("variants", {})):
+                    prepared[(name, key, variant)] = self._prepare(name, template, key, variant)
+
+        with self._lock:
+            self.templates, self.sources, self.prepared = templates, sources, prepared
+            self._variant_by_model = {}
+            self._lazy = 0
+
+    @staticmethod
+    def _validate(template: Dict) -> List[str]:
+        errors = []
+        for field in ("system", "user", "model"):
+            if not isinstance(template.get(field), str):
+                errors.append(f"'{field}' must be a string")
+        if errors:
+            return errors
+
+        key_fields = template.get("key_fields", [])
+        values = template.get("values", {})
+        default = template.get("default", {})
+        value_fields = set(default) if default else set(next(iter(values.values()), {}))
+        allowed = set(key_fields) | value_fields | set(template.get("dynamic", []))
+
+        for key, entry in values.items():
+            if len(key.split("/")) != len(key_fields):
+                errors.append(f"value key '{key}' does not match key_fields {key_fields}")
+            if set(entry) != value_fields:
+                errors.append(f"value '{key}' has fields {sorted(entry)}, expected {sorted(value_fields)}")
+        for key, options in template.get("key_options", {}).items():
+            if len(key.split("/")) != len(key_fields):
+                errors.append(f"key_options key '{key}' does not match key_fields {key_fields}")
+            if not isinstance(options, dict):
+                errors.append(f"key_options '{key}' must be an object")
+        for key, entry in [("default", default)] + list(values.items()):
+            for field, text in entry.items():
+                try:
+                    unknown = set(_fields(text)) - set(key_fields)
+                except ValueError as e:
+                    errors.append(f"{key}.{field}: {str(e)}")
+                    continue
+                if unknown:
+                    errors.append(f"{key}.{field} uses {sorted(unknown)}; values may only use key_fields")
+
+        parts = [("", template)] + [(f"variants.{name}.", variant)
+                                    for name, variant in template.get("variants", {}).items()]
+        for prefix, part in parts:
+            for field in ("system", "user"):
+                if field not in part:
+                    continue
+                try:
+                    unknown = set(_fields(part[field])) - allowed
+                except ValueError as e:
+                    errors.append(f"{prefix}{field}: {str(e)}")
+                    continue
+                if unknown:
+                    errors.append(f"{prefix}{field} uses undeclared placeholders {sorted(unknown)}")
+        if errors:
+            return errors
+
+        # Trial render of the fallback and every variant with dummy request values
+        dummy = {field: "x" for field in template.get("dynamic", [])}
+        sample_key = "/".join(f"<{field}>" for field in key_fields)
+        for variant in [""] + list(template.get("variants", {})):
+            try:
+                PromptRegistry._prepare("", template, sample_key, variant).render(**dummy)
+            except (KeyError, ValueError, IndexError) as e:
+                errors.append(f"{variant or 'default'} variant does not render: {str(e)}")
+        return errors
+
+    @staticmethod
+    def _prepare(name: str, template: Dict, key: str, variant: str) -> PreparedPrompt:
+        key_fields = template.get("key_fields", [])
+        key_values = dict(zip(key_fields, key.split("/")))
+        entry = template.get("values", {}).get(key, template.get("default", {}))
+        static = dict(key_values)
+        static.update({field: text.format_map(key_values) for field, text in entry.items()})
+
+        override = template.get("variants", {}).get(variant, {}) if variant else {}
+        options = {**template.get("options", {}), **template.get("key_options", {}).get(key, {}),
+                   **override.get("options", {})}
+        return PreparedPrompt(
+            name,
+            override.get("model", template["model"]),
+            options,
+            _partial_format(override.get("system", template["system"]), static),
+            _partial_format(override.get("user", template["user"]), static),
+        )
+
+    def _variant(self, name: str, model: Optional[str]) -> str:
+        if not model:
+            return ""
+        variant = self._variant_by_model.get((name, model))
+        if variant is None:
+            variants = self.templates[name].get("variants", {})
+            family = model.split(":")[0]
+            variant = model if model in variants else family if family in variants else ""
+            with self._lock:
+                if len(self._variant_by_model) < self.MAX_MODELS:  # Do not grow without bound
+                    self._variant_by_model[(name, model)] = variant
+        return variant
+
+    def get(self, name: str, model: Optional[str] = None, **key_values) -> PreparedPrompt:
+        template = self.templates.get(name)
+        if template is None:
+            raise PromptTemplateError(f"Unknown prompt template: {name}")
+        key = "/".join(str(key_values[field]) for field in template.get("key_fields", []))
+        variant = self._variant(name, model)
+        prepared = self.prepared.get((name, key, variant))
+        if prepared is None:
+            prepared = self._prepare(name, template, key, variant)
+            with self._lock:
+                if self._lazy < self.MAX_LAZY:  # Keys come from clients; do not grow without bound
+                    self.prepared[(name, key, variant)] = prepared
+                    self._lazy += 1
+        return prepared
+
+    def list_templates(self) -> List[Dict]:
+        return [
+            {
+                "name": name,
+                "source": self.sources[name],
+                "description": template.get("description", ""),
+                "model": template["model"],
+                "keys": len(template.get("values", {})),
+                "variants": sorted(template.get("variants", {})),
+                "static_tokens": self.get(name, **{field: "default" for field in template.get("key_fields", [])}).static_tokens,
+            }
+            for name, template in sorted(self.templates.items())
+        ]
@@ -0,0 +1,435 @@
+# backend/app/services/retrieval_service.py
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from app.services.llm_router import BackendPool
+from app.services.token_utils import estimate_tokens
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+
+
+class OllamaEmbedder:
+    """Embeddings from the local Ollama server"""
+
+    def __init__(self, pool: BackendPool, model: str = "nomic-embed-text"):
+        self.pool = pool
+        self.model = model
+        self.name = f"ollama:{model}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        try:
+            response = self.pool.post("/api/embed", {"model": self.model, "input": texts}, timeout=120)
+            if response.status_code != 404:
+                response.raise_for_status()
+                return np.asarray(response.json()["embeddings"], dtype=np.float32)
+
+            # Older Ollama versions only have the one-prompt-per-call endpoint
+            vectors = []
+            for text in texts:
+                response = self.pool.post("/api/embeddings", {"model": self.model, "prompt": text}, timeout=60)
+                response.raise_for_status()
+                vectors.append(response.json()["embedding"])
+            return np.asarray(vectors, dtype=np.float32)
+        except Exception as e:
+            raise Exception(f"Embedding request failed: {str(e)}")
+
+
+class HashingEmbedder:
+    """Deterministic local stand-in: signed feature hashing of identifiers.
+
+    Needs no model server, so benchmarks and offline setups still get
+    lexical retrieval (ECHOIDE_EMBEDDER=hashing).
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text):
+                # Split snake_case and camelCase so partial names still overlap
+                for part in [word.lower()] + re.findall(r"[a-z]+|[A-Z][a-z]*|\d+", word):
+                    digest = zlib.crc32(part.lower().encode("utf-8"))
+                    matrix[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        return matrix
+
+
+class RetrievalIndex:
+    """Chunk embeddings of one workspace in a memory-mapped float32 matrix.
+
+    `chunks.json` maps each chunk (path, line range, content hash) to a row of
+    `vectors.f32`. On refresh, chunks whose hash already has a row keep their
+    vector and only new or changed chunks are sent to the embedder. A saved
+    or deleted file is re-chunked on its own (`update_files`): its old rows
+    are masked out and its new chunks kept in a small in-memory matrix next
+    to the mapped one, until MERGE_THRESHOLD of them call for a refresh.
+    Search re-reads each hit from disk and drops it unless the lines still
+    hash to what was embedded.
+    """
+
+    CHUNK_LINES = 40
+    CHUNK_OVERLAP = 10
+    BATCH_SIZE = 32
+    MAX_FILE_SIZE = 512 * 1024
+    MERGE_THRESHOLD = 512  # Chunks kept beside the matrix before it is rewritten
+
+    def __init__(self, root: str, storage_dir: str, embedder, extensions, skip_directories):
+        self.root = root
+        self.storage_dir = storage_dir
+        self.embedder = embedder
+        self.extensions = extensions
+        self.skip_directories = skip_directories
+        self.chunks: List[Dict] = []
+        self.files: Dict[str, List] = {}
+        self.matrix: Optional[np.ndarray] = None
+        self.removed: Set[int] = set()            # Rows of `matrix` whose file changed since
+        self.extra: List[Dict] = []               # Chunks of files changed since, not in `matrix`
+        self.extra_matrix: Optional[np.ndarray] = None
+        self.refreshed = False                    # A full refresh ran in this process
+        self._lock = threading.RLock()
+        self.building = threading.Lock()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.storage_dir, "chunks.json")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.storage_dir, "vectors.f32")
+
+    def load(self) -> None:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+            if meta.get("embedder") != self.embedder.name or not meta["chunks"]:
+                return
+            matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                               shape=(len(meta["chunks"]), meta["dim"]))
+        except (OSError, ValueError, KeyError):
+            return
+        with self._lock:
+            self.chunks, self.files, self.matrix = meta["chunks"], meta["files"], matrix
+
+    def _iter_files(self):
+        for current, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in self.skip_directories and not d.startswith(".")]
+            for name in files:
+                if os.path.splitext(name)[1].lower() in self.extensions:
+                    yield os.path.join(current, name)
+
+    @staticmethod
+    def _hash(rel_path: str, text: str) -> str:
+        # The path is part of the hash so a copied file keeps its own rows
+        return hashlib.sha1(f"{rel_path}\0{text}".encode("utf-8")).hexdigest()
+
+    def _read_lines(self, rel_path: str) -> Optional[List[str]]:
+        abs_path = os.path.join(self.root, rel_path)
+        try:
+            if os.path.getsize(abs_path) > self.MAX_FILE_SIZE:
+                return None
+            with open(abs_path, "r", encoding="utf-8", errors="replace") as handle:
+                return handle.read().split("\n")
+        except OSError:
+            return None
+
+    def _chunk_file(self, rel_path: str, texts: Dict[str, str]) -> List[Dict]:
+        """Chunks of a file as it is now; their text goes into `texts` by hash, for embedding"""
+        lines = self._read_lines(rel_path)
+        if lines is None:
+            return []
+
+        chunks = []
+        step = self.CHUNK_LINES - self.CHUNK_OVERLAP
+        for start in range(0, max(len(lines) - self.CHUNK_OVERLAP, 1), step):
+            text = "\n".join(lines[start:start + self.CHUNK_LINES])
+            if not text.strip():
+                continue
+            digest = self._hash(rel_path, text)
+            texts[digest] = text
+            chunks.append({"path": rel_path, "start": start + 1,
+                           "end": min(start + self.CHUNK_LINES, len(lines)), "hash": digest})
+        return chunks
+
+    def _embed(self, chunks: List[Dict], texts: Dict[str, str]) -> Dict[str, np.ndarray]:
+        vectors = {}
+        for start in range(0, len(chunks), self.BATCH_SIZE):
+            batch = chunks[start:start + self.BATCH_SIZE]
+            for chunk, vector in zip(batch, self.embedder.embed([f"{c['path']}\n{texts[c['hash']]}" for c in batch])):
+                vectors[chunk["hash"]] = vector
+        return vectors
+
+    def _current(self):
+        """(chunks, vector lookup by hash) of everything indexed now, matrix rows and extra ones"""
+        with self._lock:
+            chunks, matrix, removed = self.chunks, self.matrix, self.removed
+            extra, extra_matrix = self.extra, self.extra_matrix
+        live = [chunk for row, chunk in enumerate(chunks) if row not in removed] + extra
+        rows = {chunk["hash"]: (matrix, row) for row, chunk in enumerate(chunks) if row not in removed}
+        rows.update({chunk["hash"]: (extra_matrix, row) for row, chunk in enumerate(extra)})
+        return live, rows
+
+    def refresh(self) -> Dict:
+        """Re-chunk changed files and embed only chunks with unseen hashes"""
+        with self.building:
+            old_chunks, old_rows = self._current()
+            with self._lock:
+                old_files = self.files
+            chunks_by_file: Dict[str, List[Dict]] = {}
+            for chunk in old_chunks:
+                chunks_by_file.setdefault(chunk["path"], []).append(chunk)
+
+            files, chunks, texts = {}, [], {}
+            for abs_path in self._iter_files():
+                rel_path = os.path.relpath(abs_path, self.root)
+                try:
+                    stat_info = os.stat(abs_path)
+                except OSError:
+                    continue
+                files[rel_path] = [stat_info.st_mtime, stat_info.st_size]
+                if old_files.get(rel_path) == files[rel_path] and rel_path in chunks_by_file:
+                    chunks.extend(chunks_by_file[rel_path])
+                else:
+                    chunks.extend(self._chunk_file(rel_path, texts))
+
+            missing = [chunk for chunk in chunks if chunk["hash"] not in old_rows]
+            new_vectors = self._embed(missing, texts)
+
+            if chunks:
+                dim = len(next(iter(new_vectors.values()))) if new_vectors else \
+                    next(iter(old_rows.values()))[0].shape[1]
+                matrix = np.empty((len(chunks), dim), dtype=np.float32)
+                for row, chunk in enumerate(chunks):
+                    vector = new_vectors.get(chunk["hash"])
+                    if vector is None:
+                        source, source_row = old_rows[chunk["hash"]]
+                        vector = source[source_row]
+                    matrix[row] = vector
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix /= np.maximum(norms, 1e-12)
+                self._save(chunks, files, matrix)
+            else:
+                matrix = None
+
+            with self._lock:
+                self.chunks, self.files = chunks, files
+                self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                        shape=matrix.shape) if matrix is not None else None
+                self.removed, self.extra, self.extra_matrix = set(), [], None
+                self.refreshed = True
+            return {"chunks": len(chunks), "embedded": len(missing), "files": len(files)}
+
+    def update_files(self, rel_paths) -> Dict:
+        """Re-chunk just these files (saved, created or deleted) and embed their new chunks"""
+        paths = set(rel_paths)
+        with self.building:
+            if self.matrix is None:
+                return {"chunks": 0, "embedded": 0}  # Nothing built yet; the first refresh indexes them
+            _, old_rows = self._current()
+            new_chunks, texts, files = [], {}, {}
+            for rel_path in paths:
+                directories = rel_path.split(os.sep)[:-1]
+                if any(d in self.skip_directories or d.startswith(".") for d in directories):
+                    continue
+                abs_path = os.path.join(self.root, rel_path)
+                try:
+                    stat_info = os.stat(abs_path)
+                except OSError:
+                    continue
+                if os.path.splitext(rel_path)[1].lower() in self.extensions:
+                    files[rel_path] = [stat_info.st_mtime, stat_info.st_size]
+                    new_chunks.extend(self._chunk_file(rel_path, texts))
+
+            missing = [chunk for chunk in new_chunks if chunk["hash"] not in old_rows]
+            new_vectors = self._embed(missing, texts)
+            vectors = []
+            for chunk in new_chunks:
+                vector = new_vectors.get(chunk["hash"])
+                if vector is None:
+                    source, source_row = old_rows[chunk["hash"]]
+                    vector = source[source_row]
+                vectors.append(np.asarray(vector, dtype=np.float32) / max(float(np.linalg.norm(vector)), 1e-12))
+
+            with self._lock:
+                self.removed = self.removed | {row for row, chunk in enumerate(self.chunks) if chunk["path"] in paths}
+                keep = [row for row, chunk in enumerate(self.extra) if chunk["path"] not in paths]
+                parts = ([self.extra_matrix[keep]] if keep else []) + ([np.vstack(vectors)] if vectors else [])
+                self.extra = [self.extra[row] for row in keep] + new_chunks
+                self.extra_matrix = np.vstack(parts) if parts else None
+                self.files = {**{path: entry for path, entry in self.files.items() if path not in paths}, **files}
+                merge = len(self.extra) > self.MERGE_THRESHOLD
+        if merge:
+            self.refresh()
+        return {"chunks": len(new_chunks), "embedded": len(missing)}
+
+    def _save(self, chunks: List[Dict], files: Dict, matrix: np.ndarray) -> None:
+        os.makedirs(self.storage_dir, exist_ok=True)
+        temp_vectors = f"{self._vectors_path}.{os.getpid()}.tmp"  # Workers may save at once
+        matrix.tofile(temp_vectors)
+        # Drop the old mapping before replacing the file underneath it (Windows)
+        with self._lock:
+            self.matrix = None
+        os.replace(temp_vectors, self._vectors_path)
+        temp_meta = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(temp_meta, "w", encoding="utf-8") as handle:
+            json.dump({"embedder": self.embedder.name, "dim": int(matrix.shape[1]),
+                       "chunks": chunks, "files": files}, handle)
+        os.replace(temp_meta, self._meta_path)
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        with self._lock:
+            matrix, chunks, removed = self.matrix, self.chunks, self.removed
+            extra, extra_matrix = self.extra, self.extra_matrix
+        if matrix is None or not chunks:
+            return []
+
+        vector = self.embedder.embed([query])[0]
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        scores = matrix @ vector
+        if removed:
+            scores[list(removed)] = -np.inf
+        if extra_matrix is not None:
+            scores = np.concatenate([scores, extra_matrix @ vector])
+            chunks = chunks + extra
+        k = min(k, len(chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results, lines_by_path = [], {}
+        for row in top.tolist():
+            if not np.isfinite(scores[row]):
+                continue
+            chunk = chunks[row]
+            if chunk["path"] not in lines_by_path:
+                lines_by_path[chunk["path"]] = self._read_lines(chunk["path"])
+            lines = lines_by_path[chunk["path"]]
+            text = "\n".join(lines[chunk["start"] - 1:chunk["end"]]) if lines is not None else None
+            # The file may have changed since it was embedded; never hand out lines that were not
+            if text is None or self._hash(chunk["path"], text) != chunk["hash"]:
+                continue
+            results.append({**chunk, "score": float(scores[row]), "text": text})
+        return results
+
+
+class RetrievalService:
+    """Workspace retrieval used to add related project code to AI prompts"""
+
+    def __init__(self, file_service, pool: Optional[BackendPool] = None, debounce: float = 1.0):
+        self.file_service = file_service
+        self.debounce = debounce
+        self.storage_dir = os.path.join(os.path.expanduser("~"), ".echoide", "retrieval")
+        if os.environ.get("ECHOIDE_EMBEDDER") == "hashing":
+            self.embedder = HashingEmbedder()
+        else:
+            self.embedder = OllamaEmbedder(pool or BackendPool.from_env(),
+                                           os.environ.get("ECHOIDE_EMBED_MODEL", "nomic-embed-text"))
+        self.indexes: Dict[str, RetrievalIndex] = {}
+        self._pending: Dict[str, Set[str]] = {}  # root -> changed paths, flushed after `debounce`
+        self._timers: Dict[str, threading.Timer] = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, project_path: str) -> RetrievalIndex:
+        root = os.path.realpath(os.path.abspath(project_path))
+        if not os.path.isdir(root):
+            raise Exception(f"Invalid project directory: {project_path}")
+        if not self.file_service.is_path_allowed(root):
+            raise PermissionError(f"Access denied to project: {project_path}")
+        with self._lock:
+            index = self.indexes.get(root)
+            if index is None:
+                digest = hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+                index = RetrievalIndex(root, os.path.join(self.storage_dir, digest), self.embedder,
+                                       self.file_service.allowed_extensions, self.file_service.skip_directories)
+                index.load()
+                self.indexes[root] = index
+        return index
+
+    def refresh_project(self, project_path: str) -> Dict:
+        try:
+            return self.get_index(project_path).refresh()
+        except Exception as e:
+            raise Exception(f"Failed to build retrieval index: {str(e)}")
+
+    def notify_changed(self, path: str) -> None:
+        """A file was written or deleted; re-chunk it shortly (saves in a burst are batched)"""
+        abs_path = os.path.realpath(os.path.abspath(path))
+        for root, index in list(self.indexes.items()):
+            if abs_path.startswith(root.rstrip(os.sep) + os.sep):
+                with self._lock:
+                    self._pending.setdefault(root, set()).add(os.path.relpath(abs_path, root))
+                    if root not in self._timers:
+                        timer = self._timers[root] = threading.Timer(self.debounce, self._flush, (index,))
+                        timer.daemon = True
+                        timer.start()
+                return
+
+    def _flush(self, index: RetrievalIndex) -> None:
+        with self._lock:
+            paths = self._pending.pop(index.root, set())
+            self._timers.pop(index.root, None)
+        try:
+            index.update_files(paths)
+        except Exception:
+            index.refreshed = False  # The next retrieval refreshes the whole index instead
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers, self._pending = {}, {}
+
+    def search(self, project_path: str, query: str, k: int = 5) -> List[Dict]:
+        try:
+            return self.get_index(project_path).search(query, k)
+        except Exception as e:
+            raise Exception(f"Retrieval failed: {str(e)}")
+
+    def retrieve_context(self, project_path: Optional[str], query: str, token_budget: int,
+                         exclude_text: str = "") -> str:
+        """Best-matching snippets formatted for a prompt, within `token_budget`.
+
+        Never raises: if the index is not built yet (or the embedder is down),
+        a background refresh is started and the prompt goes out without
+        snippets rather than waiting on it. An index loaded from disk is
+        refreshed the same way once, for files changed while the server was
+        down; until then its stale chunks are dropped at search time.
+        """
+        if not project_path or token_budget <= 0 or not query.strip():
+            return ""
+        try:
+            index = self.get_index(project_path)
+            if not index.refreshed and not index.building.locked():
+                threading.Thread(target=self._refresh_quietly, args=(index,), daemon=True).start()
+            if index.matrix is None:
+                return ""
+            results = index.search(query, k=8)
+        except Exception:
+            return ""
+
+        parts, used = [], 0
+        for result in results:
+            text = result["text"].strip()
+            if not text or (exclude_text and text in exclude_text):
+                continue
+            snippet = f"# {result['path']} (lines {result['start']}-{result['end']})\n{text}"
+            cost = estimate_tokens(snippet)
+            if used + cost > token_budget:
+                continue
+            parts.append(snippet)
+            used += cost
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _refresh_quietly(index: RetrievalIndex) -> None:
+        try:
+            index.refresh()
+        except Exception:
+            pass
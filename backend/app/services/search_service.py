@@ -0,0 +1,426 @@
+# backend/app/services/search_service.py
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Set
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse
+
+
+class TrigramIndex:
+    """Inverted trigram index over the text files of one workspace root.
+
+    Every file is reduced to the set of lowercased 3-character substrings it
+    contains; a query is answered by intersecting the posting lists of the
+    query's trigrams and only scanning the few candidate files that survive.
+    Updates are incremental: a changed file gets a new id and its old id is
+    marked dead, and the postings are compacted once too many ids are dead.
+    """
+
+    MAGIC = b"ECHOTRI1"
+    MAX_FILE_SIZE = 4 * 1024 * 1024  # Larger files are almost never source code
+
+    def __init__(self, root: str, extensions: Set[str], skip_directories: Set[str], index_path: str):
+        self.root = root
+        self.extensions = extensions
+        self.skip_directories = skip_directories
+        self.index_path = index_path
+
+        self.files: List[Optional[str]] = []           # id -> relative path (None once dead)
+        self.file_meta: Dict[str, tuple] = {}          # relative path -> (id, mtime, size)
+        self.postings: Dict[str, Set[int]] = {}        # trigram -> file ids
+        self.dead_count = 0
+        self.dirty = False
+        self.last_saved = 0.0
+        self._lock = threading.RLock()
+        self.ready = threading.Event()
+
+    # Building and incremental updates
+
+    def _iter_files(self) -> Iterator[str]:
+        for current, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in self.skip_directories and not d.startswith('.')]
+            for name in files:
+                if os.path.splitext(name)[1].lower() in self.extensions:
+                    yield os.path.join(current, name)
+
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        text = text.lower()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _read_text(self, abs_path: str) -> Optional[str]:
+        try:
+            if os.path.getsize(abs_path) > self.MAX_FILE_SIZE:
+                return None
+            with open(abs_path, 'r', encoding='utf-8', errors='replace') as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+    def _add(self, rel_path: str, abs_path: str, stat_info) -> None:
+        text = self._read_text(abs_path)
+        if text is None:
+            return
+        file_id = len(self.files)
+        self.files.append(rel_path)
+        self.file_meta[rel_path] = (file_id, stat_info.st_mtime, stat_info.st_size)
+        for trigram in self._trigrams(text):
+            posting = self.postings.get(trigram)
+            if posting is None:
+                self.postings[trigram] = {file_id}
+            else:
+                posting.add(file_id)
+
+    def _drop(self, rel_path: str) -> None:
+        meta = self.file_meta.pop(rel_path, None)
+        if meta is not None:
+            self.files[meta[0]] = None
+            self.dead_count += 1
+
+    def update_file(self, abs_path: str) -> None:
+        """Re-index one file (or drop it if it no longer exists)"""
+        rel_path = os.path.relpath(abs_path, self.root)
+        with self._lock:
+            self._drop(rel_path)
+            if os.path.isfile(abs_path) and os.path.splitext(abs_path)[1].lower() in self.extensions:
+                self._add(rel_path, abs_path, os.stat(abs_path))
+            self.dirty = True
+            self._maybe_compact()
+
+    def remove_file(self, abs_path: str) -> None:
+        with self._lock:
+            self._drop(os.path.relpath(abs_path, self.root))
+            self.dirty = True
+
+    def refresh(self) -> Dict:
+        """Stat the tree and re-index only files whose mtime or size changed"""
+        seen = set()
+        changed = 0
+        with self._lock:
+            for abs_path in self._iter_files():
+                rel_path = os.path.relpath(abs_path, self.root)
+                seen.add(rel_path)
+                try:
+                    stat_info = os.stat(abs_path)
+                except OSError:
+                    continue
+                meta = self.file_meta.get(rel_path)
+                if meta and meta[1] == stat_info.st_mtime and meta[2] == stat_info.st_size:
+                    continue
+                self._drop(rel_path)
+                self._add(rel_path, abs_path, stat_info)
+                changed += 1
+
+            removed = [rel_path for rel_path in self.file_meta if rel_path not in seen]
+            for rel_path in removed:
+                self._drop(rel_path)
+
+            if changed or removed:
+                self.dirty = True
+            self._maybe_compact()
+            return {"changed": changed, "removed": len(removed), **self.stats()}
+
+    def _maybe_compact(self, force: bool = False) -> None:
+        if not self.dead_count:
+            return
+        if not force and (self.dead_count <= 1024 or self.dead_count * 3 < len(self.files)):
+            return
+        remap = {}
+        files = []
+        for old_id, rel_path in enumerate(self.files):
+            if rel_path is not None:
+                remap[old_id] = len(files)
+                files.append(rel_path)
+        postings = {}
+        for trigram, ids in self.postings.items():
+            live = {remap[i] for i in ids if i in remap}
+            if live:
+                postings[trigram] = live
+        self.files = files
+        self.postings = postings
+        self.file_meta = {path: (remap[meta[0]], meta[1], meta[2]) for path, meta in self.file_meta.items()}
+        self.dead_count = 0
+
+    def stats(self) -> Dict:
+        return {"files": len(self.file_meta), "trigrams": len(self.postings)}
+
+    # On-disk format: MAGIC + zlib(header_len, header, postings), where the
+    # postings are [len][trigram utf-8][count][delta-encoded ids] as varints
+
+    @staticmethod
+    def _write_varint(out: bytearray, value: int) -> None:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    @staticmethod
+    def _read_varint(data: bytes, pos: int):
+        result = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, pos
+            shift += 7
+
+    def save(self) -> None:
+        with self._lock:
+            # Ids are stored positionally, so the saved file never has dead slots
+            self._maybe_compact(force=True)
+            header = "\n".join(
+                f"{meta[1]!r}\t{meta[2]}\t{path}"
+                for path, meta in sorted(self.file_meta.items(), key=lambda item: item[1][0])
+            ).encode('utf-8')
+            body = bytearray()
+            for trigram, ids in self.postings.items():
+                encoded = trigram.encode('utf-8')
+                self._write_varint(body, len(encoded))
+                body += encoded
+                self._write_varint(body, len(ids))
+                previous = 0
+                for file_id in sorted(ids):
+                    self._write_varint(body, file_id - previous)
+                    previous = file_id
+            payload = struct.pack("<I", len(header)) + header + bytes(body)
+            self.dirty = False
+            self.last_saved = time.time()
+
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"  # Workers may save the same index at once
+        with open(temp_path, 'wb') as handle:
+            handle.write(self.MAGIC + zlib.compress(payload, 6))
+        os.replace(temp_path, self.index_path)
+
+    def load(self) -> bool:
+        try:
+            with open(self.index_path, 'rb') as handle:
+                data = handle.read()
+            if not data.startswith(self.MAGIC):
+                return False
+            payload = zlib.decompress(data[len(self.MAGIC):])
+        except (OSError, zlib.error):
+            return False
+
+        header_len = struct.unpack_from("<I", payload)[0]
+        header = payload[4:4 + header_len].decode('utf-8')
+        files, file_meta = [], {}
+        for line in header.split("\n") if header else []:
+            mtime, size, path = line.split("\t", 2)
+            file_meta[path] = (len(files), float(mtime), int(size))
+            files.append(path)
+
+        postings = {}
+        pos = 4 + header_len
+        while pos < len(payload):
+            length, pos = self._read_varint(payload, pos)
+            trigram = payload[pos:pos + length].decode('utf-8')
+            pos += length
+            count, pos = self._read_varint(payload, pos)
+            ids = set()
+            file_id = 0
+            for _ in range(count):
+                delta, pos = self._read_varint(payload, pos)
+                file_id += delta
+                ids.add(file_id)
+            postings[trigram] = ids
+
+        with self._lock:
+            self.files, self.file_meta, self.postings = files, file_meta, postings
+            self.dead_count = 0
+            self.dirty = False
+        return True
+
+    # Querying
+
+    @staticmethod
+    def required_literals(pattern: str) -> List[str]:
+        """Literal runs that any match of `pattern` must contain"""
+        try:
+            parsed = sre_parse.parse(pattern)
+        except re.error:
+            return []
+        runs, current = [], []
+        for op, value in parsed:
+            if op is sre_parse.LITERAL:
+                current.append(chr(value))
+                continue
+            if current:
+                runs.append("".join(current))
+            current = []
+        if current:
+            runs.append("".join(current))
+        return [run for run in runs if len(run) >= 3]
+
+    def candidates(self, literals: List[str]) -> List[str]:
+        """Relative paths of files that contain every trigram of every literal"""
+        trigrams = set()
+        for literal in literals:
+            trigrams |= self._trigrams(literal)
+
+        with self._lock:
+            if not trigrams:
+                return [path for path in self.files if path is not None]
+            postings = []
+            for trigram in trigrams:
+                posting = self.postings.get(trigram)
+                if not posting:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            ids = set(postings[0])
+            for posting in postings[1:]:
+                ids &= posting
+                if not ids:
+                    return []
+            return [self.files[i] for i in ids if self.files[i] is not None]
+
+
+class SearchService:
+    """Workspace full-text search backed by one TrigramIndex per project root"""
+
+    def __init__(self, file_service):
+        self.file_service = file_service
+        self.storage_dir = os.path.join(os.path.expanduser("~"), ".echoide", "search")
+        self.indexes: Dict[str, TrigramIndex] = {}
+        self._lock = threading.Lock()
+        self.save_interval = 30.0
+
+    def _index_path(self, root: str) -> str:
+        digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.storage_dir, f"{digest}.tri")
+
+    def get_index(self, project_path: str) -> TrigramIndex:
+        """Load (or build) the index for a project root and bring it up to date"""
+        root = os.path.realpath(os.path.abspath(project_path))
+        if not os.path.isdir(root):
+            raise Exception(f"Invalid project directory: {project_path}")
+
+        with self._lock:
+            index = self.indexes.get(root)
+            building = index is None
+            if building:
+                index = TrigramIndex(
+                    root,
+                    self.file_service.allowed_extensions,
+                    self.file_service.skip_directories,
+                    self._index_path(root),
+                )
+                self.indexes[root] = index
+        if not building:
+            # Outside the service lock: a slow build must not hold up other projects
+            index.ready.wait()
+            if self.indexes.get(root) is not index:
+                raise Exception(f"Failed to index {project_path}")
+            return index
+
+        try:
+            index.load()
+            index.refresh()
+            if index.dirty:
+                index.save()
+        except Exception:
+            with self._lock:
+                if self.indexes.get(root) is index:
+                    del self.indexes[root]  # Not kept half-built: the next request builds it again
+            raise
+        finally:
+            index.ready.set()
+        return index
+
+    def refresh_project(self, project_path: str) -> Dict:
+        """Re-stat a project and re-index only what changed"""
+        try:
+            index = self.get_index(project_path)
+            stats = index.refresh()
+            if index.dirty:
+                index.save()
+            return stats
+        except Exception as e:
+            raise Exception(f"Failed to index project: {str(e)}")
+
+    def _index_for_file(self, path: str) -> Optional[TrigramIndex]:
+        abs_path = os.path.realpath(os.path.abspath(path))
+        for root, index in list(self.indexes.items()):
+            if abs_path.startswith(root.rstrip(os.sep) + os.sep):
+                return index
+        return None
+
+    def notify_changed(self, path: str) -> None:
+        """Keep indexes current after a write through the file API"""
+        index = self._index_for_file(path)
+        if index is not None:
+            index.update_file(os.path.realpath(os.path.abspath(path)))
+            if time.time() - index.last_saved > self.save_interval:
+                index.save()
+
+    def notify_deleted(self, path: str) -> None:
+        index = self._index_for_file(path)
+        if index is not None:
+            index.remove_file(os.path.realpath(os.path.abspath(path)))
+
+    def save_all(self) -> None:
+        for index in list(self.indexes.values()):
+            if index.dirty:
+                index.save()
+
+    def search(self, project_path: str, query: str, is_regex: bool = False,
+               case_sensitive: bool = False, max_results: int = 500) -> Iterator[Dict]:
+        """Return an iterator of per-file line matches, best-ranked files first"""
+        matcher = self.compile_query(query, is_regex, case_sensitive)
+        index = self.get_index(project_path)
+        if is_regex:
+            literals = TrigramIndex.required_literals(query)
+        else:
+            literals = [query] if len(query) >= 3 else []
+
+        # Rank candidates before scanning so the stream starts with the most
+        # relevant files: name hits first, then shallower paths
+        needle = query.lower()
+        candidates = index.candidates(literals)
+        candidates.sort(key=lambda rel: (needle not in os.path.basename(rel).lower(), rel.count(os.sep), rel))
+        return self._scan(index, candidates, matcher, max_results)
+
+    @staticmethod
+    def compile_query(query: str, is_regex: bool = False, case_sensitive: bool = False):
+        """The pattern a search matches lines with; ValueError for an empty query or a bad regex"""
+        if not query:
+            raise ValueError("Query is required")
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if not is_regex:
+            return re.compile(re.escape(query), flags)
+        try:
+            return re.compile(query, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {str(e)}")
+
+    @staticmethod
+    def _scan(index: TrigramIndex, candidates: List[str], matcher, max_results: int) -> Iterator[Dict]:
+        remaining = max_results
+        for rel_path in candidates:
+            abs_path = os.path.join(index.root, rel_path)
+            text = index._read_text(abs_path)
+            if text is None or not matcher.search(text):
+                continue
+
+            matches = []
+            for line_number, line in enumerate(text.splitlines(), 1):
+                ranges = [[m.start(), m.end()] for m in matcher.finditer(line) if m.end() > m.start()]
+                if ranges:
+                    matches.append({"line": line_number, "text": line[:500], "ranges": ranges})
+                    remaining -= 1
+                    if remaining <= 0:
+                        break
+            if matches:
+                yield {"path": abs_path, "matches": matches}
+            if remaining <= 0:
+                return
@@ -0,0 +1,208 @@
+# backend/app/services/shared_state.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def default_state_path() -> str:
+    return os.environ.get("ECHOIDE_SHARED_STATE") or \
+        os.path.join(os.path.expanduser("~"), ".echoide", "state", "shared.db")
+
+
+class SharedState:
+    """State every worker process must agree on, in one SQLite database.
+
+    WAL mode lets readers run alongside the single writer, so the common
+    case (reads) never blocks. Holds chat session history and summaries,
+    workspaces added at runtime and a log of file changes that workers
+    replay into their own in-memory indexes. Each thread gets its own
+    connection.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chat_exchanges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            exchange TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS chat_exchanges_session ON chat_exchanges (session_id, id);
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS allowed_paths (
+            path TEXT PRIMARY KEY,
+            added_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS generations (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS file_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            changed_at REAL NOT NULL
+        );
+    """
+
+    CHANGE_LOG_KEEP = 10000  # Rows of file_changes kept; workers further behind rebuild on demand anyway
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_state_path()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; fine for session state
+            self._local.connection = connection
+        return connection
+
+    def _write(self, statements: List[Tuple[str, tuple]]) -> None:
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                connection.execute(sql, params)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def reset(self) -> None:
+        """Forget sessions, workspaces and the change log (ECHOIDE_RESET_STATE=1 at launch)"""
+        self._write([(f"DELETE FROM {table}", ()) for table in
+                     ("chat_exchanges", "chat_summaries", "allowed_paths", "generations", "file_changes")])
+
+    def reset_change_log(self) -> None:
+        """Drop the file change log (called once before workers start; their indexes are built from disk)"""
+        self._write([("DELETE FROM file_changes", ())])
+
+    # Chat sessions
+
+    def session_history(self, session_id: str, limit: int = 10) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT exchange FROM chat_exchanges WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def append_exchange(self, session_id: str, exchange: Dict, keep: int = 10) -> None:
+        self._write([
+            ("INSERT INTO chat_exchanges (session_id, exchange) VALUES (?, ?)", (session_id, json.dumps(exchange))),
+            ("DELETE FROM chat_exchanges WHERE session_id = ? AND id NOT IN "
+             "(SELECT id FROM chat_exchanges WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+             (session_id, session_id, keep)),
+        ])
+
+    def session_summary(self, session_id: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT summary FROM chat_summaries WHERE session_id = ?",
+                                      (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_session_summary(self, session_id: str, summary: Dict) -> None:
+        self._write([("INSERT INTO chat_summaries (session_id, summary) VALUES (?, ?) "
+                      "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary",
+                      (session_id, json.dumps(summary)))])
+
+    # Workspaces added at runtime
+
+    def add_allowed_path(self, path: str) -> None:
+        self._write([
+            ("INSERT OR IGNORE INTO allowed_paths (path, added_at) VALUES (?, ?)", (path, time.time())),
+            ("INSERT INTO generations (name, value) VALUES ('allowed_paths', 1) "
+             "ON CONFLICT(name) DO UPDATE SET value = value + 1", ()),
+        ])
+
+    def allowed_paths(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT path FROM allowed_paths ORDER BY added_at")]
+
+    def generation(self, name: str) -> int:
+        """Counter bumped whenever `name` changes; compare it to decide whether to reload"""
+        row = self._connect().execute("SELECT value FROM generations WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    # File change log
+
+    def record_change(self, path: str, kind: str) -> None:
+        self._write([
+            ("INSERT INTO file_changes (path, kind, pid, changed_at) VALUES (?, ?, ?, ?)",
+             (path, kind, os.getpid(), time.time())),
+            ("DELETE FROM file_changes WHERE seq <= (SELECT MAX(seq) FROM file_changes) - ?",
+             (self.CHANGE_LOG_KEEP,)),
+        ])
+
+    def changes_since(self, seq: int) -> List[Tuple[int, str, str, int]]:
+        return self._connect().execute(
+            "SELECT seq, path, kind, pid FROM file_changes WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+
+    def last_change(self) -> int:
+        return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM file_changes").fetchone()[0]
+
+
+class ChangeFeed:
+    """File changes other workers recorded since this feed last looked"""
+
+    def __init__(self, state: SharedState):
+        self.state = state
+        self.seq = state.last_change()  # Changes from before this worker started are already on disk
+        self._lock = threading.Lock()
+
+    def poll(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            rows = self.state.changes_since(self.seq)
+            if rows:
+                self.seq = rows[-1][0]
+        pid = os.getpid()
+        return [(path, kind) for _, path, kind, writer in rows if writer != pid]
+
+
+class MemorySessionStore:
+    """Chat history for a single process (the default)"""
+
+    def __init__(self):
+        self.sessions: Dict[str, List[Dict]] = {}
+        self.summaries: Dict[str, Dict] = {}
+
+    def history(self, session_id: str, limit: int = 10) -> List[Dict]:
+        return self.sessions.get(session_id, [])[-limit:]
+
+    def append(self, session_id: str, exchange: Dict, keep: int = 10) -> None:
+        history = self.sessions.setdefault(session_id, [])
+        history.append(exchange)
+        if len(history) > keep:
+            self.sessions[session_id] = history[-keep:]
+
+    def summary(self, session_id: str) -> Optional[Dict]:
+        """Summary of the session's older turns (see HistoryCompactor), if one was written"""
+        return self.summaries.get(session_id)
+
+    def set_summary(self, session_id: str, summary: Dict) -> None:
+        self.summaries[session_id] = summary
+
+
+class SharedSessionStore:
+    """Chat history in SharedState, so any worker can continue a session"""
+
+    def __init__(self, state: SharedState):
+        self.state = state
+
+    def history(self, session_id: str, limit: int = 10) -> List[Dict]:
+        return self.state.session_history(session_id, limit)
+
+    def append(self, session_id: str, exchange: Dict, keep: int = 10) -> None:
+        self.state.append_exchange(session_id, exchange, keep)
+
+    def summary(self, session_id: str) -> Optional[Dict]:
+        return self.state.session_summary(session_id)
+
+    def set_summary(self, session_id: str, summary: Dict) -> None:
+        self.state.set_session_summary(session_id, summary)
@@ -0,0 +1,136 @@
+# backend/app/services/speculative_completion.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SpeculationCancelled(Exception):
+    """Raised inside a speculative request once a real request pre-empts it"""
+
+
+class SpeculativeCompletionEngine:
+    """Prefetches completions at likely trigger points while the user is idle.
+
+    The editor reports every edit with its document version and cursor offset.
+    If the cursor sits right after a newline, `:` or `{` and no further edit
+    arrives within `idle_delay`, a background completion runs and its result is
+    cached under (document, version, offset), so Monaco's next
+    provideCompletionItems for that exact state is answered immediately.
+    Speculation only runs while no real request is in flight, and every running
+    speculation is cancelled the moment one arrives.
+    """
+
+    TRIGGER_CHARS = (':', '{')
+    MAX_DOCUMENTS = 1024  # Documents whose latest version is remembered; ids come from clients
+
+    def __init__(self, complete_fn: Callable[..., Awaitable[str]], idle_delay: float = 0.35,
+                 max_entries: int = 128):
+        self.complete_fn = complete_fn
+        self.idle_delay = idle_delay
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self.pending: Dict[str, Tuple[asyncio.Task, threading.Event]] = {}
+        self.latest_version: "OrderedDict[str, int]" = OrderedDict()
+        self.foreground_requests = 0
+        self.stats = {"scheduled": 0, "completed": 0, "cancelled": 0, "failed": 0, "hits": 0, "misses": 0}
+
+    @classmethod
+    def is_trigger_point(cls, before_cursor: str) -> bool:
+        """True right after a newline (plus auto-indent), ':' or '{'"""
+        line_start = before_cursor.rfind('\n') + 1
+        if line_start and not before_cursor[line_start:].strip():
+            return True
+        return before_cursor.rstrip(' \t')[-1:] in cls.TRIGGER_CHARS
+
+    def note_edit(self, document_id: str, version: int, code: str, cursor_position: int,
+                  language: str, project_path: Optional[str] = None) -> bool:
+        """Record an edit; returns True if a speculative completion was scheduled"""
+        if version < self.latest_version.get(document_id, -1):
+            return False  # Out-of-order report of an older state
+        self.latest_version[document_id] = version
+        self.latest_version.move_to_end(document_id)
+        while len(self.latest_version) > self.MAX_DOCUMENTS:
+            self.latest_version.popitem(last=False)  # Least recently edited; its speculation fails the version check
+        self._cancel(document_id)
+
+        # Entries for older versions of this document can never be hit again
+        for key in [key for key in self.cache if key[0] == document_id and key[1] < version]:
+            del self.cache[key]
+
+        if not self.is_trigger_point(code[:cursor_position]):
+            return False
+
+        cancel_event = threading.Event()
+        task = asyncio.get_running_loop().create_task(
+            self._speculate(document_id, version, code, cursor_position, language, project_path, cancel_event)
+        )
+        self.pending[document_id] = (task, cancel_event)
+        self.stats["scheduled"] += 1
+        return True
+
+    async def _speculate(self, document_id: str, version: int, code: str, cursor_position: int,
+                         language: str, project_path: Optional[str], cancel_event: threading.Event):
+        try:
+            await asyncio.sleep(self.idle_delay)
+            if self.foreground_requests or cancel_event.is_set():
+                self.stats["cancelled"] += 1
+                return
+            completion = await self.complete_fn(code, cursor_position, language, project_path,
+                                                cancel_event=cancel_event)
+            if cancel_event.is_set() or self.latest_version.get(document_id) != version:
+                self.stats["cancelled"] += 1
+                return
+            self.cache[(document_id, version, cursor_position)] = completion
+            self.cache.move_to_end((document_id, version, cursor_position))
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+            self.stats["completed"] += 1
+        except (asyncio.CancelledError, SpeculationCancelled):
+            self.stats["cancelled"] += 1
+        except Exception:
+            self.stats["failed"] += 1
+        finally:
+            current = self.pending.get(document_id)
+            if current is not None and current[1] is cancel_event:
+                del self.pending[document_id]
+
+    def _cancel(self, document_id: str) -> None:
+        entry = self.pending.pop(document_id, None)
+        if entry is not None:
+            task, cancel_event = entry
+            cancel_event.set()  # Lets the worker thread close its upstream stream
+            task.cancel()
+
+    def cancel_all(self) -> None:
+        for document_id in list(self.pending):
+            self._cancel(document_id)
+
+    def lookup(self, document_id: Optional[str], version: Optional[int], cursor_position: int) -> Optional[str]:
+        if document_id is None or version is None:
+            return None
+        completion = self.cache.get((document_id, version, cursor_position))
+        self.stats["hits" if completion is not None else "misses"] += 1
+        return completion
+
+    @asynccontextmanager
+    async def foreground(self):
+        """Wrap a real completion request: background work is dropped at once"""
+        self.foreground_requests += 1
+        self.cancel_all()
+        try:
+            yield
+        finally:
+            self.foreground_requests -= 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "cached": len(self.cache),
+            "in_flight": len(self.pending),
+            "timestamp": time.time(),
+        }
@@ -0,0 +1,602 @@
+# backend/app/services/symbol_service.py
+import ast
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+LANGUAGE_BY_EXTENSION = {
+    '.py': 'python', '.js': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript', '.jsx': 'javascript', '.ts': 'typescript',
+    '.tsx': 'typescript', '.java': 'java', '.cs': 'csharp', '.kt': 'kotlin',
+    '.go': 'go', '.rs': 'rust', '.c': 'c', '.h': 'c', '.cpp': 'cpp', '.hpp': 'cpp',
+    '.rb': 'ruby', '.php': 'php', '.swift': 'swift', '.scala': 'scala', '.dart': 'dart'
+}
+
+# Definition patterns for the languages we tokenise instead of parsing.
+# Each entry is (kind, compiled regex with the name in group 1).
+_C_STYLE_METHOD = r'^[ \t]*(?:(?:public|private|protected|internal|static|final|abstract|virtual|override|async|synchronized|inline|extern|const)\s+)*[\w<>\[\],.?*&:]+\s+[*&]?(\w+)\s*\([^;{}]*\)\s*(?:const\s*)?(?:throws [\w., ]+)?\{'
+_DEFINITION_PATTERNS = {
+    'javascript': [
+        ('class', r'^\s*(?:export\s+)?(?:default\s+)?class\s+(\w+)'),
+        ('function', r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(\w+)'),
+        ('function', r'^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?(?:function|\([^)]*\)\s*=>|\w+\s*=>)'),
+        ('variable', r'^(?:export\s+)?(?:const|let|var)\s+(\w+)\s*='),
+        ('method', r'^\s+(?:static\s+)?(?:async\s+)?(?!if\b|for\b|while\b|switch\b|catch\b|return\b)(\w+)\s*\([^)]*\)\s*\{'),
+    ],
+    'java': [
+        ('class', r'^\s*(?:(?:public|private|protected|static|final|abstract|sealed)\s+)*(?:class|interface|enum|record)\s+(\w+)'),
+        ('method', _C_STYLE_METHOD),
+    ],
+    'csharp': [
+        ('class', r'^\s*(?:(?:public|private|protected|internal|static|sealed|abstract|partial)\s+)*(?:class|interface|enum|struct|record)\s+(\w+)'),
+        ('method', _C_STYLE_METHOD),
+    ],
+    'kotlin': [
+        ('class', r'^\s*(?:(?:data|sealed|open|abstract|private|internal)\s+)*(?:class|interface|object)\s+(\w+)'),
+        ('function', r'^\s*(?:(?:private|public|internal|override|suspend|inline)\s+)*fun\s+(?:<[^>]*>\s*)?(?:\w+\.)?(\w+)'),
+    ],
+    'go': [
+        ('function', r'^func\s+(?:\([^)]*\)\s*)?(\w+)'),
+        ('class', r'^type\s+(\w+)\s+(?:struct|interface)'),
+        ('variable', r'^(?:var|const)\s+(\w+)'),
+    ],
+    'rust': [
+        ('function', r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(\w+)'),
+        ('class', r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|union)\s+(\w+)'),
+        ('variable', r'^\s*(?:pub\s+)?(?:const|static)\s+(\w+)'),
+    ],
+    'c': [
+        ('class', r'^\s*(?:typedef\s+)?(?:struct|enum|union)\s+(\w+)\s*\{'),
+        ('function', _C_STYLE_METHOD),
+    ],
+    'cpp': [
+        ('class', r'^\s*(?:template\s*<[^>]*>\s*)?(?:class|struct|enum(?:\s+class)?|union)\s+(\w+)[^;]*$'),
+        ('function', _C_STYLE_METHOD),
+    ],
+    'ruby': [
+        ('class', r'^\s*(?:class|module)\s+([A-Z]\w*)'),
+        ('method', r'^\s*def\s+(?:self\.)?(\w+[?!]?)'),
+    ],
+    'php': [
+        ('class', r'^\s*(?:(?:abstract|final)\s+)?(?:class|interface|trait)\s+(\w+)'),
+        ('function', r'^\s*(?:(?:public|private|protected|static)\s+)*function\s+(\w+)'),
+    ],
+    'swift': [
+        ('class', r'^\s*(?:(?:public|private|open|final)\s+)*(?:class|struct|enum|protocol|extension)\s+(\w+)'),
+        ('function', r'^\s*(?:(?:public|private|open|static|override)\s+)*func\s+(\w+)'),
+    ],
+    'scala': [
+        ('class', r'^\s*(?:(?:case|abstract|sealed)\s+)*(?:class|object|trait)\s+(\w+)'),
+        ('function', r'^\s*def\s+(\w+)'),
+    ],
+    'dart': [
+        ('class', r'^\s*(?:abstract\s+)?(?:class|mixin|enum)\s+(\w+)'),
+        ('function', _C_STYLE_METHOD),
+    ],
+}
+_DEFINITION_PATTERNS['typescript'] = _DEFINITION_PATTERNS['javascript'] + [
+    ('class', r'^\s*(?:export\s+)?(?:interface|type|enum)\s+(\w+)'),
+]
+# Used for Python files that do not parse (usually mid-edit)
+_DEFINITION_PATTERNS['python_fallback'] = [
+    ('class', r'^\s*class\s+(\w+)'),
+    ('function', r'^\s*(?:async\s+)?def\s+(\w+)'),
+]
+_COMPILED_PATTERNS = {
+    language: [(kind, re.compile(pattern, re.MULTILINE)) for kind, pattern in patterns]
+    for language, patterns in _DEFINITION_PATTERNS.items()
+}
+
+_IMPORT_PATTERNS = {
+    'javascript': re.compile(r'''(?:import\s[^'"]*?from\s*|import\s*\(?\s*|require\s*\(\s*)['"]([^'"]+)['"]'''),
+    'java': re.compile(r'^\s*import\s+(?:static\s+)?([\w.*]+)\s*;', re.MULTILINE),
+    'csharp': re.compile(r'^\s*using\s+(?:static\s+)?([\w.]+)\s*;', re.MULTILINE),
+    'kotlin': re.compile(r'^\s*import\s+([\w.*]+)', re.MULTILINE),
+    'go': re.compile(r'^\s*(?:import\s+)?(?:\w+\s+)?"([\w./-]+)"', re.MULTILINE),
+    'rust': re.compile(r'^\s*use\s+([\w:{}, *]+);', re.MULTILINE),
+    'c': re.compile(r'^\s*#\s*include\s*[<"]([^>"]+)[>"]', re.MULTILINE),
+    'ruby': re.compile(r'''^\s*require(?:_relative)?\s+['"]([^'"]+)['"]''', re.MULTILINE),
+    'php': re.compile(r'^\s*(?:use|require|include)(?:_once)?\s+[\'"(]?([\w\\/.]+)', re.MULTILINE),
+}
+_IMPORT_PATTERNS['typescript'] = _IMPORT_PATTERNS['javascript']
+_IMPORT_PATTERNS['cpp'] = _IMPORT_PATTERNS['c']
+
+_IDENTIFIER = re.compile(r'[A-Za-z_]\w*')
+_KEYWORDS = {
+    'if', 'else', 'for', 'while', 'do', 'return', 'switch', 'case', 'break', 'continue',
+    'new', 'class', 'struct', 'enum', 'interface', 'function', 'def', 'fn', 'func', 'let',
+    'const', 'var', 'public', 'private', 'protected', 'static', 'void', 'int', 'float',
+    'double', 'char', 'bool', 'boolean', 'string', 'true', 'false', 'null', 'nil', 'None',
+    'this', 'self', 'import', 'from', 'export', 'package', 'using', 'namespace', 'try',
+    'catch', 'finally', 'throw', 'throws', 'async', 'await', 'yield', 'in', 'of', 'end',
+    'type', 'impl', 'pub', 'mut', 'use', 'match', 'extends', 'implements', 'include',
+}
+
+
+class _PythonSymbolVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.definitions: List[Dict] = []
+        self.imports: List[Dict] = []
+        self.references: List[List] = []
+        self._containers: List[Tuple[str, str]] = []  # (name, kind)
+
+    def _define(self, name: str, kind: str, node, column: Optional[int] = None):
+        self.definitions.append({
+            "name": name,
+            "kind": kind,
+            "line": node.lineno,
+            "column": node.col_offset if column is None else column,
+            "end_line": getattr(node, "end_lineno", node.lineno),
+            "container": ".".join(container for container, _ in self._containers) or None,
+        })
+
+    def _visit_function(self, node):
+        in_class = bool(self._containers) and self._containers[-1][1] == "class"
+        # The name follows "def " / "async def " (after any decorators)
+        column = node.col_offset + (10 if isinstance(node, ast.AsyncFunctionDef) else 4)
+        self._define(node.name, "method" if in_class else "function", node, column)
+        self._containers.append((node.name, "function"))
+        self.generic_visit(node)
+        self._containers.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_ClassDef(self, node):
+        self._define(node.name, "class", node, node.col_offset + 6)
+        self._containers.append((node.name, "class"))
+        self.generic_visit(node)
+        self._containers.pop()
+
+    def visit_Assign(self, node):
+        # Module and class level names only; locals would swamp the index
+        if not self._containers or self._containers[-1][1] == "class":
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self._define(target.id, "variable", target)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        if isinstance(node.target, ast.Name) and (not self._containers or self._containers[-1][1] == "class"):
+            self._define(node.target.id, "variable", node.target)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append({"name": alias.asname or alias.name.split('.')[0], "module": alias.name, "line": node.lineno})
+
+    def visit_ImportFrom(self, node):
+        # "module" has no leading dots; "level" says which package a relative import starts from
+        for alias in node.names:
+            module = f"{node.module}.{alias.name}" if node.module else alias.name
+            self.imports.append({"name": alias.asname or alias.name, "module": module, "line": node.lineno,
+                                 "level": node.level})
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.references.append([node.id, node.lineno, node.col_offset])
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load) and getattr(node, "end_col_offset", None) is not None:
+            self.references.append([node.attr, node.end_lineno, node.end_col_offset - len(node.attr)])
+        self.generic_visit(node)
+
+
+def _extract_tokenised(text: str, language: str) -> Dict:
+    line_starts = [0] + [m.end() for m in re.finditer('\n', text)]
+
+    def position(offset: int) -> Tuple[int, int]:
+        line = bisect_left(line_starts, offset + 1)
+        return line, offset - line_starts[line - 1]
+
+    definitions, seen = [], set()
+    for kind, pattern in _COMPILED_PATTERNS.get(language, []):
+        for match in pattern.finditer(text):
+            name = match.group(1)
+            if name in _KEYWORDS or match.start(1) in seen:
+                continue
+            seen.add(match.start(1))
+            line, column = position(match.start(1))
+            definitions.append({"name": name, "kind": kind, "line": line, "column": column,
+                                "end_line": line, "container": None})
+    definitions.sort(key=lambda d: (d["line"], d["column"]))
+
+    imports = []
+    import_pattern = _IMPORT_PATTERNS.get(language)
+    if import_pattern is not None:
+        for match in import_pattern.finditer(text):
+            module = match.group(1).strip()
+            imports.append({"name": re.split(r'[./\\:]', module.rstrip('/*'))[-1] or module,
+                            "module": module, "line": position(match.start(1))[0]})
+
+    references = []
+    for line_number, line in enumerate(text.split('\n'), 1):
+        for match in _IDENTIFIER.finditer(line):
+            if match.group() not in _KEYWORDS:
+                references.append([match.group(), line_number, match.start()])
+
+    return {"definitions": definitions, "imports": imports, "references": references}
+
+
+def extract_symbols(text: str, language: str) -> Dict:
+    """Definitions, imports and references of one file (runs in worker processes)"""
+    if language == 'python':
+        try:
+            tree = ast.parse(text)
+        except (SyntaxError, ValueError):
+            return _extract_tokenised(text, 'python_fallback')
+        visitor = _PythonSymbolVisitor()
+        visitor.visit(tree)
+        return {"definitions": visitor.definitions, "imports": visitor.imports, "references": visitor.references}
+    return _extract_tokenised(text, language)
+
+
+
+def _index_file(abs_path: str, language: str) -> Tuple[str, Optional[Dict]]:
+    try:
+        with open(abs_path, 'rb') as handle:
+            data = handle.read()
+    except OSError:
+        return "", None
+    digest = hashlib.sha1(data).hexdigest()
+    return digest, extract_symbols(data.decode('utf-8', errors='replace'), language)
+
+
+def enclosing_blocks(before_cursor: str) -> List[str]:
+    """Python blocks enclosing the end of `before_cursor`, outermost first.
+
+    Works on incomplete code by following indentation rather than parsing.
+    """
+    lines = before_cursor.split('\n')
+    current = lines[-1]
+    indent = len(current) - len(current.lstrip()) if current.strip() else None
+    blocks = []
+    header = re.compile(r'(async\s+def|def|class|for|while|if|elif|else|try|except|finally|with)\b\s*(\w*)')
+
+    for line in reversed(lines[:-1]):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        line_indent = len(line) - len(line.lstrip())
+        if indent is None:
+            # Cursor on an empty line: the previous statement sets the level
+            indent = line_indent + (4 if stripped.endswith(':') else 0)
+        if line_indent < indent:
+            match = header.match(stripped)
+            if match and stripped.endswith(':'):
+                keyword, name = match.group(1), match.group(2)
+                if keyword in ('def', 'async def', 'class'):
+                    blocks.append(f"{'function' if 'def' in keyword else 'class'} {name}")
+                else:
+                    blocks.append(f"{keyword} block")
+            indent = line_indent
+            if indent == 0:
+                break
+    return blocks[::-1]
+
+
+class SymbolIndex:
+    """Symbols of one workspace, keyed by content hash and persisted between runs"""
+
+    FORMAT = 2  # Bumped when extract_symbols output changes, so stored symbols are re-extracted
+
+    def __init__(self, root: str, index_path: str, skip_directories):
+        self.root = root
+        self.index_path = index_path
+        self.skip_directories = skip_directories
+        self.files: Dict[str, List] = {}        # rel path -> [mtime, size, hash]
+        self.by_hash: Dict[str, Dict] = {}      # content hash -> extracted symbols
+        self.definitions: Dict[str, List[Tuple[str, Dict]]] = {}
+        self.sorted_names: List[str] = []
+        self.sorted_lower: List[str] = []     # Lowercased sorted_names, for bisect
+        self.dirty = False
+        self._lock = threading.RLock()
+        self.ready = threading.Event()
+
+    def _iter_files(self):
+        for current, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in self.skip_directories and not d.startswith('.')]
+            for name in files:
+                language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(name)[1].lower())
+                if language:
+                    yield os.path.join(current, name), language
+
+    def load(self) -> None:
+        try:
+            with open(self.index_path, 'rb') as handle:
+                data = json.loads(zlib.decompress(handle.read()))
+            if data.get("format") != self.FORMAT:
+                raise ValueError("Symbol index from an older version")
+            self.files, self.by_hash = data["files"], data["by_hash"]
+        except (OSError, ValueError, KeyError, zlib.error):
+            self.files, self.by_hash = {}, {}
+
+    def save(self) -> None:
+        with self._lock:
+            live = {entry[2] for entry in self.files.values()}
+            self.by_hash = {digest: symbols for digest, symbols in self.by_hash.items() if digest in live}
+            payload = zlib.compress(json.dumps({"format": self.FORMAT, "files": self.files,
+                                                     "by_hash": self.by_hash}).encode('utf-8'), 6)
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"  # Workers may save the same index at once
+        with open(temp_path, 'wb') as handle:
+            handle.write(payload)
+        os.replace(temp_path, self.index_path)
+
+    def refresh(self, pool_factory) -> Dict:
+        """Re-index files whose stat changed; new content hashes go to the process pool"""
+        seen, pending = set(), []
+        for abs_path, language in self._iter_files():
+            rel_path = os.path.relpath(abs_path, self.root)
+            seen.add(rel_path)
+            try:
+                stat_info = os.stat(abs_path)
+            except OSError:
+                continue
+            entry = self.files.get(rel_path)
+            if entry and entry[0] == stat_info.st_mtime and entry[1] == stat_info.st_size:
+                continue
+            pending.append((rel_path, abs_path, language, stat_info))
+
+        results = []
+        if len(pending) > 8:
+            pool = pool_factory()
+            futures = [pool.submit(_index_file, abs_path, language) for _, abs_path, language, _ in pending]
+            results = [future.result() for future in futures]
+        else:
+            results = [_index_file(abs_path, language) for _, abs_path, language, _ in pending]
+
+        with self._lock:
+            for (rel_path, _, _, stat_info), (digest, symbols) in zip(pending, results):
+                if symbols is None:
+                    continue
+                self.files[rel_path] = [stat_info.st_mtime, stat_info.st_size, digest]
+                self.by_hash.setdefault(digest, symbols)
+            removed = [rel_path for rel_path in self.files if rel_path not in seen]
+            for rel_path in removed:
+                del self.files[rel_path]
+            if pending or removed:
+                self.dirty = True
+                self._rebuild_lookup()
+        return {"indexed": len(pending), "removed": len(removed), "files": len(self.files)}
+
+    def update_file(self, abs_path: str) -> None:
+        rel_path = os.path.relpath(abs_path, self.root)
+        language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(abs_path)[1].lower())
+        with self._lock:
+            if not language or not os.path.isfile(abs_path):
+                entry = self.files.pop(rel_path, None)
+                if entry is not None:
+                    self.dirty = True
+                    self._remove_definitions(rel_path, entry[2])
+                return
+            stat_info = os.stat(abs_path)
+            digest, symbols = _index_file(abs_path, language)
+            if symbols is None:
+                return
+            previous = self.files.get(rel_path)
+            self.files[rel_path] = [stat_info.st_mtime, stat_info.st_size, digest]
+            self.by_hash.setdefault(digest, symbols)
+            self.dirty = True
+            if previous is None or previous[2] != digest:
+                # Only this file's entries change; a save must not cost a pass over the whole project
+                if previous is not None:
+                    self._remove_definitions(rel_path, previous[2])
+                self._add_definitions(rel_path, digest)
+
+    def _rebuild_lookup(self) -> None:
+        definitions: Dict[str, List[Tuple[str, Dict]]] = {}
+        for rel_path, entry in self.files.items():
+            for definition in self.by_hash.get(entry[2], {}).get("definitions", []):
+                definitions.setdefault(definition["name"], []).append((rel_path, definition))
+        self.definitions = definitions
+        self.sorted_names = sorted(definitions, key=str.lower)
+        self.sorted_lower = [name.lower() for name in self.sorted_names]
+
+    def _add_definitions(self, rel_path: str, digest: str) -> None:
+        for definition in self.by_hash.get(digest, {}).get("definitions", []):
+            name = definition["name"]
+            if name not in self.definitions:
+                position = bisect_right(self.sorted_lower, name.lower())
+                self.sorted_names.insert(position, name)
+                self.sorted_lower.insert(position, name.lower())
+            self.definitions.setdefault(name, []).append((rel_path, definition))
+
+    def _remove_definitions(self, rel_path: str, digest: str) -> None:
+        for name in {definition["name"] for definition in self.by_hash.get(digest, {}).get("definitions", [])}:
+            remaining = [item for item in self.definitions.get(name, []) if item[0] != rel_path]
+            if remaining:
+                self.definitions[name] = remaining
+            elif self.definitions.pop(name, None) is not None:
+                position = bisect_left(self.sorted_lower, name.lower())
+                while self.sorted_names[position] != name:
+                    position += 1
+                del self.sorted_names[position]
+                del self.sorted_lower[position]
+
+    def symbols_for(self, rel_path: str) -> Optional[Dict]:
+        entry = self.files.get(rel_path)
+        return self.by_hash.get(entry[2]) if entry else None
+
+    def file_symbols(self) -> Dict[str, Tuple[str, Dict]]:
+        """(content hash, symbols) of every indexed file, copied under the lock"""
+        with self._lock:
+            return {rel_path: (entry[2], self.by_hash.get(entry[2], {})) for rel_path, entry in self.files.items()}
+
+    def identifier_at(self, rel_path: str, line: int, column: int) -> Optional[str]:
+        """Name referenced or defined at line:column of an indexed file, from its stored symbols"""
+        symbols = self.symbols_for(rel_path)
+        if symbols is None:
+            return None
+        for name, ref_line, ref_column in symbols.get("references", []):
+            if ref_line == line and ref_column <= column <= ref_column + len(name):
+                return name
+        for definition in symbols.get("definitions", []):
+            if definition["line"] == line and \
+                    definition["column"] <= column <= definition["column"] + len(definition["name"]):
+                return definition["name"]
+        return None
+
+
+class SymbolService:
+    """Outline, workspace-symbol and go-to-definition lookups over SymbolIndex"""
+
+    def __init__(self, file_service):
+        self.file_service = file_service
+        self.storage_dir = os.path.join(os.path.expanduser("~"), ".echoide", "symbols")
+        self.indexes: Dict[str, SymbolIndex] = {}
+        self.max_workers = max(1, min(4, (os.cpu_count() or 2) - 1))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def get_index(self, project_path: str) -> SymbolIndex:
+        root = os.path.realpath(os.path.abspath(project_path))
+        if not os.path.isdir(root):
+            raise Exception(f"Invalid project directory: {project_path}")
+
+        with self._lock:
+            index = self.indexes.get(root)
+            building = index is None
+            if building:
+                digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:16]
+                index = SymbolIndex(root, os.path.join(self.storage_dir, f"{digest}.json.z"),
+                                    self.file_service.skip_directories)
+                self.indexes[root] = index
+        if not building:
+            # Outside the service lock: another project's index, or the pool, must not wait on this build
+            index.ready.wait()
+            if self.indexes.get(root) is not index:
+                raise Exception(f"Failed to index {project_path}")
+            return index
+
+        try:
+            index.load()
+            index.refresh(self._get_pool)
+            index._rebuild_lookup()
+            if index.dirty:
+                index.save()
+        except Exception:
+            with self._lock:
+                if self.indexes.get(root) is index:
+                    del self.indexes[root]  # Not kept half-built: the next request builds it again
+            raise
+        finally:
+            index.ready.set()
+        return index
+
+    def refresh_project(self, project_path: str) -> Dict:
+        try:
+            index = self.get_index(project_path)
+            stats = index.refresh(self._get_pool)
+            if index.dirty:
+                index.save()
+            return stats
+        except Exception as e:
+            raise Exception(f"Failed to index symbols: {str(e)}")
+
+    def _locate(self, path: str):
+        abs_path = os.path.realpath(os.path.abspath(path))
+        for root, index in list(self.indexes.items()):
+            if abs_path.startswith(root.rstrip(os.sep) + os.sep):
+                return index, abs_path
+        return None, abs_path
+
+    def notify_changed(self, path: str) -> None:
+        index, abs_path = self._locate(path)
+        if index is not None:
+            index.update_file(abs_path)
+
+    def save_all(self) -> None:
+        for index in list(self.indexes.values()):
+            if index.dirty:
+                index.save()
+
+    def shutdown(self) -> None:
+        self.save_all()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_outline(self, path: str) -> List[Dict]:
+        """Definitions of one file in source order (indexed files come from the index)"""
+        try:
+            index, abs_path = self._locate(path)
+            symbols = index.symbols_for(os.path.relpath(abs_path, index.root)) if index else None
+            if symbols is None:
+                language = LANGUAGE_BY_EXTENSION.get(os.path.splitext(abs_path)[1].lower())
+                if not language:
+                    return []
+                symbols = _index_file(abs_path, language)[1] or {}
+            return symbols.get("definitions", [])
+        except Exception as e:
+            raise Exception(f"Failed to get outline: {str(e)}")
+
+    def _location(self, index: SymbolIndex, rel_path: str, definition: Dict) -> Dict:
+        return {**definition, "path": os.path.join(index.root, rel_path), "relative_path": rel_path}
+
+    def workspace_symbols(self, project_path: str, query: str, limit: int = 50) -> List[Dict]:
+        """Definitions whose name starts with (then contains) `query`, case-insensitively"""
+        index = self.get_index(project_path)
+        needle = query.lower()
+        with index._lock:
+            names, lowered = index.sorted_names, index.sorted_lower
+            position = bisect_left(lowered, needle)
+            matched = []
+            while position < len(names) and lowered[position].startswith(needle) and len(matched) < limit:
+                matched.append(names[position])
+                position += 1
+            if len(matched) < limit and needle:
+                for name, lower in zip(names, lowered):
+                    if needle in lower and not lower.startswith(needle):
+                        matched.append(name)
+                        if len(matched) >= limit:
+                            break
+
+            results = []
+            for name in matched:
+                for rel_path, definition in index.definitions[name]:
+                    results.append(self._location(index, rel_path, definition))
+        return results[:limit]
+
+    def find_definition(self, project_path: str, name: Optional[str] = None, path: Optional[str] = None,
+                        line: Optional[int] = None, column: Optional[int] = None) -> List[Dict]:
+        """Definitions of `name`, or of the identifier at path:line:column (1-based line, 0-based column)"""
+        index = self.get_index(project_path)
+        current = None
+        if path:
+            abs_path = os.path.realpath(path)
+            if not abs_path.startswith(index.root.rstrip(os.sep) + os.sep):
+                raise PermissionError(f"Path is outside the project: {path}")
+            current = os.path.relpath(abs_path, index.root)
+
+        with index._lock:
+            # The file is never read here: positions come from the index, which only holds project files
+            if name is None and current and line:
+                name = index.identifier_at(current, line, column or 0)
+            if not name:
+                return []
+            candidates = list(index.definitions.get(name, []))
+            imported_modules = set()
+            if current:
+                symbols = index.symbols_for(current) or {}
+                imported_modules = {item["module"] for item in symbols.get("imports", []) if item["name"] == name}
+
+        def rank(candidate):
+            rel_path, _ = candidate
+            module = os.path.splitext(rel_path)[0].replace(os.sep, '.')
+            imported = any(module.endswith(m.rsplit('.', 1)[0]) or module.endswith(m) for m in imported_modules)
+            return (rel_path != current, not imported, rel_path.count(os.sep), rel_path)
+
+        candidates.sort(key=rank)
+        return [self._location(index, rel_path, definition) for rel_path, definition in candidates]
@@ -0,0 +1,467 @@
+# backend/app/services/test_service.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.services.metrics import REGISTRY
+
+_TEST_FILES = REGISTRY.counter("echoide_test_files_total", "Test files reported by /api/tests/run",
+                               ["framework", "source"])  # source: run or cached
+_SHARD_SECONDS = REGISTRY.histogram("echoide_test_shard_seconds", "Wall time of one test shard", ["framework"])
+
+_PYTEST_FILE = re.compile(r"^(test_.*|.*_test)\.py$")
+_UNITTEST_FILE = re.compile(r"^test.*\.py$")
+_NODE_FILE = re.compile(r"^(.*[.\-_]test|test-.*|test)\.[cm]?js$")  # node --test's default patterns
+_JS_EXTENSIONS = (".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx")
+# Files whose content changes how every test runs
+_CONFIG_FILES = ("pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini", "package.json")
+
+# unittest -v result lines; the test id is module.Class.test (3.11+) or module.Class
+_UNITTEST_RESULT = re.compile(r"^(\w+) \(([\w.]+)\)(?:\n.*)?? \.\.\. "
+                              r"(ok|FAIL|ERROR|skipped.*|expected failure|unexpected success)$", re.MULTILINE)
+_UNITTEST_DETAIL = re.compile(r"^(?:FAIL|ERROR): (\w+) \(([\w.]+)\)\n(?:[^\n]*\n)?-{70}\n(.*?)(?=^={70}$|^-{70}$)",
+                              re.MULTILINE | re.DOTALL)
+_TAP_RESULT = re.compile(r"^(not ok|ok) \d+ - (.*?)(?: # (SKIP|TODO).*)?$")
+
+MAX_MESSAGE = 4000
+
+
+def _status_of(tests: List[Dict], fallback: str) -> str:
+    statuses = {test["status"] for test in tests}
+    for status in ("error", "failed", "passed", "skipped"):
+        if status in statuses:
+            return status
+    return fallback
+
+
+class TestService:
+    """Runs a workspace's pytest, unittest and `node --test` suites.
+
+    The test file is the unit of selection, caching and scheduling. A test
+    file's key hashes the content of the file, of every workspace file it
+    imports (transitively, from the SymbolService import index), of its
+    conftest.py files and of the project's test configuration. A file whose
+    key matches its last run is not run again: its cached result is
+    reported instead, so after an edit only the affected tests run. The
+    files that do run are split into shards, balanced by their last
+    duration, and run as parallel processes; results stream back per file
+    as each shard finishes.
+    """
+
+    def __init__(self, symbol_service, workers: Optional[int] = None, timeout: float = 600.0):
+        self.symbol_service = symbol_service
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.python = os.environ.get("ECHOIDE_TEST_PYTHON") or shutil.which("python") or sys.executable
+        self.node = shutil.which("node")
+        self.storage_dir = os.path.join(os.path.expanduser("~"), ".echoide", "tests")
+        self.caches: Dict[str, Dict] = {}
+        self._has_pytest: Optional[bool] = None
+        self._lock = threading.Lock()
+        self._run_locks: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def from_env(cls, symbol_service) -> "TestService":
+        workers = os.environ.get("ECHOIDE_TEST_WORKERS")
+        return cls(symbol_service, workers=int(workers) if workers else None,
+                   timeout=float(os.environ.get("ECHOIDE_TEST_TIMEOUT", "600")))
+
+    @property
+    def has_pytest(self) -> bool:
+        if self._has_pytest is None:
+            try:
+                self._has_pytest = subprocess.run([self.python, "-c", "import pytest"], capture_output=True,
+                                                  timeout=30).returncode == 0
+            except (OSError, subprocess.TimeoutExpired):
+                self._has_pytest = False
+        return self._has_pytest
+
+    # Discovery and the dependency map
+
+    def _framework(self, rel_path: str) -> Optional[str]:
+        name = os.path.basename(rel_path)
+        if name.endswith(".py"):
+            if self.has_pytest:
+                return "pytest" if _PYTEST_FILE.match(name) else None
+            return "unittest" if _UNITTEST_FILE.match(name) else None
+        if self.node and name.endswith((".js", ".mjs", ".cjs")):
+            in_test_dir = "test" in rel_path.split(os.sep)[:-1]
+            return "node" if _NODE_FILE.match(name) or in_test_dir else None
+        return None
+
+    @staticmethod
+    def _resolve_python(module: str, level: int, importer_dir: str, roots: List[str], files: Set[str]) -> List[str]:
+        """Workspace files run by importing `module`; nothing for the standard library and packages.
+
+        A relative import (`level` dots) starts from the importer's package
+        or one of its parents. An absolute one is tried from the importer's
+        own directory first (pytest puts it on sys.path), then the source roots.
+        """
+        parts = module.split(".")
+        if level:
+            base = importer_dir
+            for _ in range(level - 1):
+                if not base:
+                    return []  # Beyond the top of the workspace
+                base = os.path.dirname(base)
+            bases = [base]
+        else:
+            bases = [importer_dir] + roots
+        for base in bases:
+            for count in range(len(parts), 0, -1):
+                stem = os.path.join(base, *parts[:count])
+                found = [candidate for candidate in (stem + ".py", os.path.join(stem, "__init__.py"))
+                         if candidate in files]
+                if found:
+                    # Importing a.b.c also runs a/__init__.py and a/b/__init__.py
+                    found += [init for init in (os.path.join(base, *parts[:k], "__init__.py")
+                                                for k in range(1, count)) if init in files]
+                    return found
+        return []
+
+    @staticmethod
+    def _resolve_js(spec: str, importer_dir: str, files: Set[str]) -> List[str]:
+        if not spec.startswith("."):
+            return []  # Packages from node_modules
+        stem = os.path.normpath(os.path.join(importer_dir, spec))
+        for candidate in [stem] + [stem + ext for ext in _JS_EXTENSIONS] + \
+                [os.path.join(stem, "index" + ext) for ext in _JS_EXTENSIONS]:
+            if candidate in files:
+                return [candidate]
+        return []
+
+    def dependency_map(self, index, entries: Optional[Dict[str, Tuple[str, Dict]]] = None) -> Dict[str, List[str]]:
+        """Workspace files each indexed file imports (relative paths); `entries` is index.file_symbols()"""
+        if entries is None:
+            entries = index.file_symbols()
+        files = set(entries)
+        roots = [""] + [name for name in ("src", "lib") if os.path.isdir(os.path.join(index.root, name))]
+        resolved: Dict[Tuple[str, str], List[str]] = {}
+        dependencies = {}
+        for rel_path, (_, symbols) in entries.items():
+            importer_dir = os.path.dirname(rel_path)
+            python = rel_path.endswith(".py")
+            found: Set[str] = set()
+            for item in symbols.get("imports", []):
+                level = item.get("level", 0)
+                key = (importer_dir, item["module"], level)
+                if key not in resolved:
+                    resolved[key] = self._resolve_python(item["module"], level, importer_dir, roots, files) \
+                        if python else self._resolve_js(item["module"], importer_dir, files)
+                found.update(resolved[key])
+            found.discard(rel_path)
+            dependencies[rel_path] = sorted(found)
+        return dependencies
+
+    @staticmethod
+    def _closure(start: List[str], dependencies: Dict[str, List[str]]) -> Set[str]:
+        seen, stack = set(start), list(start)
+        while stack:
+            for dependency in dependencies.get(stack.pop(), []):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    stack.append(dependency)
+        return seen
+
+    def _salt(self, root: str, framework: str) -> str:
+        digest = hashlib.sha1(f"{framework}\0{self.python}\0{self.node}".encode("utf-8"))
+        for name in _CONFIG_FILES:
+            try:
+                with open(os.path.join(root, name), "rb") as handle:
+                    digest.update(name.encode("utf-8") + b"\0" + handle.read())
+            except OSError:
+                continue
+        return digest.hexdigest()
+
+    def plan(self, project_path: str) -> Tuple[str, List[Dict]]:
+        """Every test file with its framework, dependency count and input key"""
+        self.symbol_service.refresh_project(project_path)  # Edits made outside the IDE
+        index = self.symbol_service.get_index(project_path)
+        entries = index.file_symbols()
+        dependencies = self.dependency_map(index, entries)
+        digests = {rel_path: digest for rel_path, (digest, _) in entries.items()}
+        salts: Dict[str, str] = {}
+        tests = []
+        for rel_path in sorted(digests):
+            framework = self._framework(rel_path)
+            if framework is None:
+                continue
+            start = [rel_path]
+            if framework == "pytest":
+                # Fixtures come from conftest.py in the test's directory and every parent
+                parts = rel_path.split(os.sep)[:-1]
+                start += [conftest for conftest in (os.path.join(*parts[:depth], "conftest.py") if depth else
+                                                    "conftest.py" for depth in range(len(parts) + 1))
+                          if conftest in digests]
+            closure = self._closure(start, dependencies)
+            if framework not in salts:
+                salts[framework] = self._salt(index.root, framework)
+            key = hashlib.sha1("\n".join([salts[framework]] + sorted(
+                f"{path}:{digests[path]}" for path in closure if path in digests)).encode("utf-8")).hexdigest()
+            tests.append({"path": rel_path, "framework": framework, "dependencies": len(closure) - 1, "key": key})
+        return index.root, tests
+
+    # Result cache
+
+    def _cache_path(self, root: str) -> str:
+        return os.path.join(self.storage_dir, hashlib.sha1(root.encode("utf-8")).hexdigest()[:16] + ".json")
+
+    def _cache(self, root: str) -> Dict:
+        with self._lock:
+            cache = self.caches.get(root)
+            if cache is None:
+                try:
+                    with open(self._cache_path(root), "r", encoding="utf-8") as handle:
+                        cache = json.load(handle)
+                except (OSError, ValueError):
+                    cache = {}
+                self.caches[root] = cache
+            return cache
+
+    def _save_cache(self, root: str) -> None:
+        with self._lock:
+            payload = json.dumps(self.caches.get(root, {}))
+        os.makedirs(self.storage_dir, exist_ok=True)
+        path = self._cache_path(root)
+        temp_path = f"{path}.{os.getpid()}.tmp"  # Workers may save the same cache at once
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write(payload)
+        os.replace(temp_path, path)
+
+    def discover(self, project_path: str) -> Dict:
+        try:
+            root, tests = self.plan(project_path)
+            cache = self._cache(root)
+            for test in tests:
+                cached = cache.get(test["path"])
+                test["last_status"] = cached["status"] if cached else None
+                test["affected"] = cached is None or cached["key"] != test["key"]
+            return {"project_path": root, "tests": tests,
+                    "frameworks": sorted({test["framework"] for test in tests}),
+                    "affected": sum(1 for test in tests if test["affected"])}
+        except Exception as e:
+            raise Exception(f"Failed to discover tests: {str(e)}")
+
+    def last_results(self, project_path: str) -> Dict:
+        root = os.path.realpath(os.path.abspath(project_path))
+        return {"project_path": root, "results": self._cache(root)}
+
+    # Running
+
+    def _shards(self, tests: List[Dict], cache: Dict) -> List[Tuple[str, List[Dict]]]:
+        """Split tests into shards per framework, longest first onto the lightest shard"""
+        shards = []
+        for framework in sorted({test["framework"] for test in tests}):
+            group = [test for test in tests if test["framework"] == framework]
+            count = min(len(group), self.workers)
+            buckets: List[Tuple[float, List[Dict]]] = [(0.0, []) for _ in range(count)]
+            weight = lambda test: (cache.get(test["path"]) or {}).get("duration", 1.0)
+            for test in sorted(group, key=weight, reverse=True):
+                total, members = min(buckets, key=lambda bucket: bucket[0])
+                buckets.remove((total, members))
+                members.append(test)
+                buckets.append((total + weight(test), members))
+            shards += [(framework, members) for _, members in buckets if members]
+        return shards
+
+    def _execute(self, command: List[str], cwd: str, processes: List) -> Tuple[int, str]:
+        process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, encoding="utf-8", errors="replace")
+        processes.append(process)
+        try:
+            output, _ = process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            output, _ = process.communicate()
+            return -1, f"{output}\nTimed out after {self.timeout:g}s"
+        finally:
+            processes.remove(process)
+        return process.returncode, output
+
+    def _run_pytest(self, root: str, paths: List[str], processes: List) -> Dict[str, List[Dict]]:
+        handle, report = tempfile.mkstemp(prefix="echoide-pytest-", suffix=".xml")
+        os.close(handle)
+        try:
+            # xunit1 reports carry each test's file, which is how results are split per test file;
+            # a file that fails to import must not stop the others in its shard
+            code, output = self._execute([self.python, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+                                          "--continue-on-collection-errors",
+                                          "-o", "junit_family=xunit1", f"--junitxml={report}",
+                                          "--rootdir", root, *paths], root, processes)
+            tests: Dict[str, List[Dict]] = {path: [] for path in paths}
+            try:
+                cases = ET.parse(report).getroot().iter("testcase")
+            except (ET.ParseError, OSError):
+                cases = []
+            modules = {os.path.splitext(path)[0].replace(os.sep, "."): path for path in paths}
+            for case in cases:
+                path = os.path.normpath(case.get("file") or "") if case.get("file") else \
+                    modules.get(case.get("name", ""))  # Collection errors only carry the module name
+                if path not in tests:
+                    continue
+                status, message = "passed", None
+                for child in case:
+                    if child.tag in ("failure", "error", "skipped"):
+                        status = {"failure": "failed", "error": "error", "skipped": "skipped"}[child.tag]
+                        message = ((child.get("message") or "") + "\n" + (child.text or "")).strip()[:MAX_MESSAGE]
+                        break
+                name = f"{case.get('classname')}::{case.get('name')}" if case.get("classname") else case.get("name")
+                tests[path].append({"name": name, "status": status, "duration": float(case.get("time") or 0),
+                                    "message": message})
+            return self._finish(tests, code, output, ok_codes=(0, 1, 5))
+        finally:
+            os.remove(report)
+
+    def _run_unittest(self, root: str, paths: List[str], processes: List) -> Dict[str, List[Dict]]:
+        modules = {os.path.splitext(path)[0].replace(os.sep, "."): path for path in paths}
+        code, output = self._execute([self.python, "-m", "unittest", "-v", *modules], root, processes)
+        details = {(name, test_id): text.strip()[:MAX_MESSAGE]
+                   for name, test_id, text in _UNITTEST_DETAIL.findall(output)}
+        tests: Dict[str, List[Dict]] = {path: [] for path in paths}
+        for name, test_id, outcome in _UNITTEST_RESULT.findall(output):
+            if test_id.startswith("unittest.loader._FailedTest."):
+                # The module failed to import; only the last part of its name is reported
+                module = next((m for m in modules if m.rsplit(".", 1)[-1] == name), None)
+            else:
+                module = max((m for m in modules if test_id.startswith(m + ".")), key=len, default=None)
+            if module not in modules:
+                continue
+            status = {"ok": "passed", "FAIL": "failed", "ERROR": "error", "expected failure": "passed",
+                      "unexpected success": "failed"}.get(outcome, "skipped")
+            tests[modules[module]].append({"name": f"{test_id}" if test_id.endswith(name) else f"{test_id}.{name}",
+                                           "status": status, "duration": None,
+                                           "message": details.get((name, test_id))})
+        return self._finish(tests, code, output, ok_codes=(0, 1, 5))
+
+    def _run_node(self, root: str, paths: List[str], processes: List) -> Dict[str, List[Dict]]:
+        # One process per file: node --test reports tests of several files without saying which is whose
+        results = {}
+        for path in paths:
+            code, output = self._execute([self.node, "--test", "--test-reporter=tap", path], root, processes)
+            tests, current = [], None
+            for line in output.splitlines():
+                match = _TAP_RESULT.match(line)  # Top-level results only (not indented)
+                if match:
+                    status = "skipped" if match.group(3) else ("passed" if match.group(1) == "ok" else "failed")
+                    if status == "failed" and os.path.isabs(match.group(2)):
+                        status = "error"  # The file itself failed to load or exited
+                    current = {"name": match.group(2), "status": status, "duration": None,
+                               "message": "" if status in ("failed", "error") else None}
+                    tests.append(current)
+                elif current is not None and current["message"] is not None and line.startswith("  ") \
+                        and line.strip() not in ("---", "...") and len(current["message"]) < MAX_MESSAGE:
+                    current["message"] += line[2:] + "\n"
+                elif line and not line.startswith(" "):
+                    current = None
+            results.update(self._finish({path: tests}, code, output, ok_codes=(0, 1)))
+        return results
+
+    @staticmethod
+    def _finish(tests: Dict[str, List[Dict]], code: int, output: str, ok_codes) -> Dict[str, List[Dict]]:
+        """A file the runner reported nothing for gets one error entry with the runner's output"""
+        for path, entries in tests.items():
+            if not entries and code not in ok_codes:
+                entries.append({"name": os.path.basename(path), "status": "error", "duration": None,
+                                "message": output[-MAX_MESSAGE:]})
+        return tests
+
+    def _run_shard(self, root: str, framework: str, paths: List[str], processes: List) -> Tuple[Dict, float]:
+        started = time.perf_counter()
+        runner = {"pytest": self._run_pytest, "unittest": self._run_unittest, "node": self._run_node}[framework]
+        tests = runner(root, paths, processes)
+        elapsed = time.perf_counter() - started
+        _SHARD_SECONDS.labels(framework).observe(elapsed)
+        return tests, elapsed
+
+    def run(self, project_path: str, mode: str = "affected", paths: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Run tests, yielding a "plan", a "file" result per test file and a final "summary".
+
+        mode "affected" runs test files whose inputs changed since their last
+        run and reports the rest from cache; "all" runs everything. `paths`
+        (relative to the project, or absolute) narrows the run to those files
+        and always runs them.
+        """
+        started = time.perf_counter()
+        try:
+            root, tests = self.plan(project_path)
+        except Exception as e:
+            raise Exception(f"Failed to plan test run: {str(e)}")
+        if paths:
+            wanted = {os.path.relpath(os.path.realpath(path), root) if os.path.isabs(path) else os.path.normpath(path)
+                      for path in paths}
+            tests = [test for test in tests if test["path"] in wanted]
+
+        with self._lock:
+            run_lock = self._run_locks.setdefault(root, threading.Lock())
+        with run_lock:  # One run per project at a time; a second one then finds fresh cache entries
+            cache = self._cache(root)
+            to_run = [test for test in tests if paths or mode == "all" or
+                      (cache.get(test["path"]) or {}).get("key") != test["key"]]
+            selected = {test["path"] for test in to_run}
+            shards = self._shards(to_run, cache)
+            yield {"type": "plan", "project_path": root, "total": len(tests), "run": len(to_run),
+                   "cached": len(tests) - len(to_run), "shards": len(shards), "workers": self.workers}
+
+            totals = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+
+            def report(test: Dict, entry: Dict, cached: bool) -> Dict:
+                for item in entry["tests"]:
+                    totals[item["status"]] += 1
+                _TEST_FILES.labels(test["framework"], "cached" if cached else "run").inc()
+                return {"type": "file", "path": test["path"], "framework": test["framework"], "cached": cached,
+                        **{name: entry[name] for name in ("status", "duration", "tests", "finished_at")}}
+
+            for test in tests:
+                if test["path"] not in selected:
+                    yield report(test, cache[test["path"]], cached=True)
+
+            processes: List[subprocess.Popen] = []
+            by_path = {test["path"]: test for test in to_run}
+            pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="echoide-tests")
+            try:
+                futures = {pool.submit(self._run_shard, root, framework, [test["path"] for test in members],
+                                       processes): members for framework, members in shards}
+                for future in as_completed(futures):
+                    members = futures[future]
+                    try:
+                        results, elapsed = future.result()
+                    except Exception as e:
+                        results = {test["path"]: [{"name": os.path.basename(test["path"]), "status": "error",
+                                                   "duration": None, "message": str(e)}] for test in members}
+                        elapsed = 0.0
+                    # pytest times each test; for the others the shard's time is split evenly
+                    durations = {path: sum(item["duration"] or 0 for item in items) for path, items in results.items()}
+                    if not any(durations.values()):
+                        durations = {path: elapsed / len(results) for path in results}
+                    for path, items in results.items():
+                        test = by_path[path]
+                        entry = {"key": test["key"], "framework": test["framework"],
+                                 "status": _status_of(items, "empty"), "tests": items,
+                                 "duration": round(durations[path], 3), "finished_at": time.time()}
+                        with self._lock:
+                            cache[path] = entry
+                        yield report(test, entry, cached=False)
+            finally:
+                # A client that stops reading stops the run too
+                pool.shutdown(wait=False, cancel_futures=True)
+                for process in list(processes):
+                    process.kill()
+                if not paths:
+                    current = {test["path"] for test in tests}
+                    with self._lock:
+                        for path in [path for path in cache if path not in current]:
+                            del cache[path]  # Test files that no longer exist
+                self._save_cache(root)
+
+        yield {"type": "summary", **totals, "files": len(tests), "files_run": len(to_run),
+               "files_cached": len(tests) - len(to_run), "duration": round(time.perf_counter() - started, 3)}
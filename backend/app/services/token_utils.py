@@ -0,0 +1,23 @@
+# backend/app/services/token_utils.py
+import re
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate for prompt budgeting.
+
+    Code tokenises to roughly one token per word or punctuation mark, and
+    long identifiers split further, so take the larger of that count and the
+    common 4-characters-per-token rule of thumb.
+    """
+    if not text:
+        return 0
+    return max(len(_TOKEN_PATTERN.findall(text)), len(text) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim text from the end so that it fits in roughly `max_tokens`"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, max_tokens * 3)]
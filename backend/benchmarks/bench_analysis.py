@@ -0,0 +1,136 @@
+# backend/benchmarks/bench_analysis.py
+# Project-wide analysis against the fake Ollama server (--parallel slots).
+# "serial" is what a client has to do today: one /api/code/analyze request
+# per file. "job" is one batch job (/api/analysis/jobs) over the same files.
+# It is then run again after editing one file, and finally a "debug" job is
+# stopped half way by restarting the backend and resumed, counting how many
+# files each step sent to the model.
+# Run from backend/:  python -m benchmarks.bench_analysis [--files 60] [--parallel 2]
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.run_benchmarks import free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_project(root: str, files: int):
+    os.makedirs(os.path.join(root, "app"))
+    for i in range(files):
+        with open(os.path.join(root, "app", f"module_{i}.py"), "w") as handle:
+            handle.write("".join(f"def handler_{i}_{j}(request):\n    total = 0\n    for item in request.items:\n"
+                                 f"        total += item.value * {j}\n    return total\n\n" for j in range(1 + i % 12)))
+    with open(os.path.join(root, "app", "large.py"), "w") as handle:  # Too big for one request
+        handle.write("".join(f"class Model{j}:\n    def save(self, session):\n        session.add(self)\n"
+                             f"        session.commit()\n        return self.id_{j}\n\n" for j in range(400)))
+
+
+def start_backend(home: str, ollama_url: str, parallel: int):
+    port = free_port()
+    env = dict(os.environ, HOME=home, USERPROFILE=home, ECHOIDE_OLLAMA_URLS=ollama_url, ECHOIDE_PORT=str(port),
+               ECHOIDE_ANALYSIS_CONCURRENCY=str(parallel))
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if requests.get(base + "/api/ready", timeout=2).ok:
+                return process, base
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("backend did not become ready")
+
+
+def stop_backend(process):
+    process.terminate()  # Graceful: running jobs are left "interrupted"
+    process.wait(timeout=30)
+
+
+def run_job(base: str, url: str, body=None):
+    """(seconds, events) of a streamed job"""
+    started = time.perf_counter()
+    with requests.post(base + url, json=body, stream=True, timeout=600) as response:
+        response.raise_for_status()
+        events = [json.loads(line) for line in response.iter_lines() if line]
+    return time.perf_counter() - started, events
+
+
+def describe(label: str, seconds: float, events, model_requests: int):
+    files = [event for event in events if event["type"] == "file"]
+    analysed = sum(1 for event in files if event["status"] == "analysed")
+    done = events[-1]
+    print(f"{label:<30} {seconds * 1000:9.0f} ms   files {len(files):3d} (analysed {analysed:3d}, "
+          f"cached {len(files) - analysed:3d})   model requests {model_requests:4d}   {done['status']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch analysis jobs vs one request per file")
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--parallel", type=int, default=2, help="generations the fake server runs at once")
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    args = parser.parse_args(argv)
+
+    fake = FakeOllama(token_latency=args.token_latency, parallel=args.parallel).start()
+    home = tempfile.mkdtemp(prefix="echoide-analysis-")
+    project = os.path.join(home, "Projects", "review")
+    make_project(project, args.files)
+    process = None
+    try:
+        process, base = start_backend(home, fake.url, args.parallel)
+
+        before = fake.requests
+        started = time.perf_counter()
+        for name in sorted(os.listdir(os.path.join(project, "app"))):
+            with open(os.path.join(project, "app", name)) as handle:
+                code = handle.read()
+            requests.post(base + "/api/code/analyze", timeout=600, json={
+                "code": code, "language": "python", "analysis_type": "review"}).raise_for_status()
+        print(f"{'serial: one request per file':<30} {(time.perf_counter() - started) * 1000:9.0f} ms   "
+              f"files {args.files + 1:3d}{'':38}model requests {fake.requests - before:4d}")
+
+        job = {"project_path": project, "analysis_type": "review"}
+        for label, edit in (("job: first run", None), ("job: again, one file edited", "module_3.py")):
+            if edit:
+                with open(os.path.join(project, "app", edit), "a") as handle:
+                    handle.write("# edited\n")
+            before = fake.requests
+            seconds, events = run_job(base, "/api/analysis/jobs", job)
+            describe(label, seconds, events, fake.requests - before)
+
+        # Restart the backend half way through a job, then resume it
+        before = fake.requests
+        job = requests.post(base + "/api/analysis/jobs", json={
+            "project_path": project, "analysis_type": "debug", "stream": False}, timeout=30).json()
+        while requests.get(f"{base}/api/analysis/jobs/{job['id']}", timeout=30).json()["completed"] < args.files // 2:
+            time.sleep(0.05)
+        stop_backend(process)
+        state = json.load(open(os.path.join(home, ".echoide", "analysis", "jobs", job["id"], "job.json")))
+        print(f"{'job: stopped by restart':<30} {'':12} files {state['completed']:3d} done          "
+              f"{'':14}model requests {fake.requests - before:4d}   {state['status']}")
+        process, base = start_backend(home, fake.url, args.parallel)
+        before = fake.requests
+        seconds, events = run_job(base, f"/api/analysis/jobs/{job['id']}/resume")
+        describe("job: resumed", seconds, events, fake.requests - before)
+    finally:
+        if process is not None:
+            stop_backend(process)
+        fake.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# backend/benchmarks/bench_chat_history.py
+# A long chat session against the fake Ollama server (prefix cache on,
+# prefill at --prefill-rate tokens/s), with --pause seconds of "reading time"
+# between turns in which background summaries can run. Reports prompt tokens
+# per turn, how many exchanges were replayed and which turns the summary in
+# the system message covered, so that prompt size can be seen to stay within
+# the history budget however long the session gets. With --project N the
+# session runs against a generated project of N files (hashing embedder),
+# so every turn also carries up to chat_context_budget tokens of related
+# code, which must not pile up in the replayed history.
+# Run from backend/:  python -m benchmarks.bench_chat_history [--turns 60] [--project 200]
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_chat_prefix import CONTEXT, question
+from benchmarks.fake_ollama import FakeOllama
+
+
+def make_project(root: str, count: int) -> None:
+    for i in range(count):
+        directory = os.path.join(root, f"pkg{i // 20}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"orders_{i}.py"), "w") as handle:
+            handle.write("".join(f"def total_{i}_{j}(items):\n    total = 0\n    for item in items:\n"
+                                 f"        total += item.price * {j}\n    return total\n\n" for j in range(8)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prompt size of a long chat session with rolling summaries")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--prefill-rate", type=float, default=4000.0, help="prompt tokens per second")
+    parser.add_argument("--pause", type=float, default=1.0, help="seconds between turns")
+    parser.add_argument("--project", type=int, default=0, help="files in a generated project (0: no retrieval)")
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-history-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    fake = FakeOllama(token_latency=0.001, prompt_token_latency=1 / args.prefill_rate, prefix_cache=True).start()
+    os.environ["ECHOIDE_OLLAMA_URLS"] = fake.url
+    os.environ["ECHOIDE_EMBEDDER"] = "hashing"
+    project_path = None
+    if args.project:
+        project_path = os.path.join(home, "project")
+        make_project(project_path, args.project)
+
+    from fastapi.testclient import TestClient
+    import main as backend
+
+    try:
+        with TestClient(backend.app) as client:
+            backend.ai_service.compactor.idle_delay = args.pause / 5
+            if project_path:
+                client.post("/api/project/open", json={"project_path": project_path}).raise_for_status()
+                client.post("/api/retrieval/index", json={"project_path": project_path}).raise_for_status()
+            rows = []
+            for turn in range(args.turns):
+                started = time.perf_counter()
+                usage = client.post("/api/chat", json={
+                    "message": question(turn), "context": CONTEXT, "session_id": "bench-history",
+                    "project_path": project_path}).json()["usage"]
+                rows.append((time.perf_counter() - started, usage))
+                time.sleep(args.pause)
+            print(f"{'turn':>5} {'ms':>8} {'prompt':>7} {'history':>8} {'prefilled':>10} {'replayed':>9}  summary")
+            for turn, (seconds, usage) in enumerate(rows):
+                if turn % 5 == 4 or turn == len(rows) - 1:
+                    through = usage["summary_through"]
+                    print(f"{turn + 1:5d} {seconds * 1000:8.1f} {usage['prompt_tokens']:7d} "
+                          f"{usage['history_tokens']:8d} {usage['prefill_tokens']:10d} "
+                          f"{usage['history_exchanges']:9d}  {f'turns 1-{through}' if through else '-'}")
+            late = [usage["prompt_tokens"] for _, usage in rows[args.turns // 2:]]
+            print(f"late turns: prompt tokens median {statistics.median(late):.0f}, max {max(late)}   "
+                  f"history budget {backend.ai_service.compactor.budget}   "
+                  f"summaries {client.get('/api/chat/history/stats').json()}")
+    finally:
+        fake.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_chat_prefix.py
+# Multi-turn chat against the fake Ollama server with its prefix (KV) cache
+# on and prefill at --prefill-rate tokens/s. "window" is the old prompt
+# layout (context in the system prompt, the last 3 exchanges replayed);
+# "stable" is the append-only layout (`stable_prefix`), where each turn's
+# prompt starts with the previous one. Reports latency of the late turns and
+# the prompt tokens the server had to prefill over the whole session.
+# Run from backend/:  python -m benchmarks.bench_chat_prefix [--turns 16]
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+
+CONTEXT = "You are helping with coding tasks. Be helpful and provide code examples when appropriate."
+
+
+def question(turn: int) -> str:
+    code = "".join(f"    total += item.price * {turn + j}\n" for j in range(12))
+    return f"Turn {turn}: why is this slow, and how would you change it?\n\ndef total(items):\n{code}    return total"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append-only chat prompts vs a sliding history window")
+    parser.add_argument("--turns", type=int, default=16)
+    parser.add_argument("--prefill-rate", type=float, default=500.0, help="prompt tokens per second")
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-chat-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    fake = FakeOllama(token_latency=0.005, prompt_token_latency=1 / args.prefill_rate, prefix_cache=True).start()
+    os.environ["ECHOIDE_OLLAMA_URLS"] = fake.url
+
+    from fastapi.testclient import TestClient
+    import main as backend
+
+    try:
+        with TestClient(backend.app) as client:
+            for mode, stable in (("window", False), ("stable", True)):
+                latencies, prefilled, saved = [], 0, 0
+                for turn in range(args.turns):
+                    started = time.perf_counter()
+                    result = client.post("/api/chat", json={
+                        "message": question(turn), "context": CONTEXT, "session_id": f"bench-{mode}",
+                        "stable_prefix": stable}).json()
+                    latencies.append(time.perf_counter() - started)
+                    prefilled += result["usage"]["prefill_tokens"]
+                    saved += result["usage"]["saved_tokens"]
+                late = latencies[args.turns // 2:]
+                print(f"{mode:<7} late turns median {statistics.median(late) * 1000:7.1f} ms   "
+                      f"last {latencies[-1] * 1000:7.1f} ms   prefilled {prefilled:6d} tokens   "
+                      f"saved {saved:6d}   history replayed on the last turn "
+                      f"{result['usage']['history_exchanges']} exchanges")
+    finally:
+        fake.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
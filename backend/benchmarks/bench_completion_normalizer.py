@@ -0,0 +1,114 @@
+# backend/benchmarks/bench_completion_normalizer.py
+# Completion post-processing: checks normalize_completion against the golden
+# corpus in benchmarks/data/completion_golden.json (exit code 1 on any
+# mismatch), then times it against the previous _clean_completion +
+# _post_process_completion pair.
+# Run from backend/:  python -m benchmarks.bench_completion_normalizer
+# Regenerate expectations after an intended change:  ... --update
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.completion_normalizer import normalize_completion
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "completion_golden.json")
+
+
+def legacy_clean(completion, language):
+    """The previous AIService._clean_completion"""
+    unwanted_prefixes = [
+        "Here's the completion:", "The completion is:", "You can complete it with:",
+        "Here's what should be added:", "The missing code is:", "Complete with:", "Add this:",
+        f"```{language}", "Here's the completed code:", "// Completion:", "# Completion:",
+        "/* Completion:", "<!-- Completion:", "Completion:", "Answer:", "Response:",
+        f"{language} completion:", f"The {language} code:", "Here's the missing part:", "You need to add:"
+    ]
+    completion_lower = completion.lower()
+    for prefix in unwanted_prefixes:
+        if completion_lower.startswith(prefix.lower()):
+            completion = completion[len(prefix):].strip()
+            completion_lower = completion.lower()
+    unwanted_suffixes = ["```", "---", "***", "###", "~~~", "*/", "-->", "End of completion",
+                         "That's the completion", "This completes the code"]
+    for suffix in unwanted_suffixes:
+        if completion.lower().endswith(suffix.lower()):
+            completion = completion[:-len(suffix)].strip()
+    return completion.strip('\n').rstrip()
+
+
+def legacy_post_process(completion, before_cursor, after_cursor, language):
+    """The previous AIService._post_process_completion"""
+    if language == 'python':
+        if before_cursor.endswith(':'):
+            if not completion.startswith(('\n    ', '\n\t')):
+                completion = '\n    ' + completion.lstrip()
+    elif language in ['javascript', 'typescript', 'java', 'cpp', 'csharp']:
+        if before_cursor.endswith('{') and not after_cursor.startswith('}'):
+            if not completion.endswith('}'):
+                completion = completion + '\n}'
+    import re
+    completion = re.sub(r'\n\s*\n\s*\n', '\n\n', completion)
+    return completion
+
+
+def legacy(raw, before_cursor, after_cursor, language):
+    completion = legacy_clean(raw.strip(), language)
+    return legacy_post_process(completion, before_cursor, after_cursor, language)
+
+
+def bench(label, func, cases, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for case in cases:
+            func(case["raw"], case["before_cursor"], case["after_cursor"], case["language"])
+    per_call = (time.perf_counter() - start) / (rounds * len(cases)) * 1e6
+    print(f"{label:<36} {per_call:8.2f} us/completion")
+
+
+def main(rounds: int = 2000):
+    with open(CORPUS, "r", encoding="utf-8") as handle:
+        cases = json.load(handle)
+
+    if "--update" in sys.argv:
+        for case in cases:
+            case["expected"] = normalize_completion(case["raw"], case["before_cursor"],
+                                                    case["after_cursor"], case["language"])
+        with open(CORPUS, "w", encoding="utf-8") as handle:
+            json.dump(cases, handle, indent=2)
+            handle.write("\n")
+        print(f"updated {len(cases)} expectations")
+        return 0
+
+    failures = 0
+    legacy_wrong = 0
+    for case in cases:
+        args = (case["raw"], case["before_cursor"], case["after_cursor"], case["language"])
+        actual = normalize_completion(*args)
+        if actual != case["expected"]:
+            failures += 1
+            print(f"FAIL {case['name']}: expected {case['expected']!r}, got {actual!r}")
+        if legacy(*args) != case["expected"]:
+            legacy_wrong += 1
+    print(f"golden corpus: {len(cases) - failures}/{len(cases)} pass "
+          f"(old post-processing matches {len(cases) - legacy_wrong})")
+
+    # Realistic sizes: a few hundred lines around the cursor, multi-line completions
+    context = "def helper(value):\n    return value * 2\n\n" * 60
+    context_cases = [{**case, "before_cursor": context + case["before_cursor"],
+                      "after_cursor": case["after_cursor"] + context} for case in cases]
+    long_cases = [{**case, "raw": case["raw"] + "\nresult = helper(value)  # (filler)" * 10} for case in cases]
+
+    bench("old clean + post-process", legacy, cases, rounds)
+    bench("normalize_completion", normalize_completion, cases, rounds)
+    bench("old, 7 KB context", legacy, context_cases, rounds)
+    bench("normalize_completion, 7 KB context", normalize_completion, context_cases, rounds)
+    bench("old, 10-line completions", legacy, long_cases, rounds)
+    bench("normalize_completion, 10-line", normalize_completion, long_cases, rounds)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
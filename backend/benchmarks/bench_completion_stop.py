@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_completion_stop.py
+# Code completions against the fake Ollama server, which replies with the
+# code a model would insert followed by what models typically run on with
+# (the next statements, the next function, the code after the cursor again).
+# "before" is the old setup: one "\n\n" stop sequence and a non-streamed
+# reply; "language stops" adds the per-language stop sequences of
+# complete.json; "early stop" also streams the reply and drops it once the
+# inserted code closes the statement or block at the cursor. Reports tokens
+# the server generated, latency, and how many completions came back with
+# exactly the code wanted.
+# Run from backend/:  python -m benchmarks.bench_completion_stop [--token-latency 0.02]
+import argparse
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+
+# (language, code before the cursor, code after it, wanted completion, what the model runs on with)
+CASES = [
+    ("python", "# case 0\ndef total(items):\n    result = compute(items, ", "\n    return result\n",
+     "discount=0.1)", "\n    result = round(result, 2)\n    log.info('total %s', result)\n    return result\n\n"
+     "def compute(items, discount=0.0):\n    return sum(item.price for item in items) * (1 - discount)\n"),
+    ("python", "# case 1\ndef load(path):", "\n\n\ndef save(path, data):\n    pass\n",
+     "\n    with open(path) as handle:\n        data = json.load(handle)\n\n    return data",
+     "\n\n\ndef save(path, data):\n    with open(path, 'w') as handle:\n        json.dump(data, handle)\n"),
+    ("python", "# case 2\nclass Cache:\n    def get(self, key):\n        ", "\n        return value\n",
+     "value = self.store.get(key)",
+     "\n        if value is None:\n            value = self.loader(key)\n            self.store[key] = value\n"
+     "        return value\n\n    def put(self, key, value):\n        self.store[key] = value\n"),
+    ("python", "# case 3\ndef parse(lines):\n    for line in lines:\n        ", "\n    return rows\n",
+     "if not line.strip():\n            continue\n        rows.append(line.split(','))",
+     "\n    return rows\n\ndef dump(rows):\n    return '\\n'.join(','.join(row) for row in rows)\n"),
+    ("python", "# case 4\ndef area(shape):\n    if shape.kind == 'circle':\n        return math.pi * shape.r ** 2\n    ",
+     "\n", "elif shape.kind == 'square':\n        return shape.side ** 2\n    else:\n        raise ValueError(shape.kind)",
+     "\n\ndef perimeter(shape):\n"
+     "    if shape.kind == 'circle':\n        return 2 * math.pi * shape.r\n"),
+    ("javascript", "// case 5\nfunction sum(items) {", "\n\nexport default sum;\n",
+     "\n  let total = 0;\n  for (const item of items) {\n    total += item.price;\n  }\n  return total;\n}",
+     "\n\nfunction average(items) {\n  return sum(items) / items.length;\n}\n\nexport default sum;\n"),
+    ("javascript", "// case 6\nasync function load(url) {\n  const response = await fetch(", ")\n}",
+     "url);", "\n  if (!response.ok) {\n    throw new Error(response.statusText);\n  }\n"
+     "  return response.json();\n}\n"),
+    ("typescript", "// case 7\nfunction byId(users: User[]): Map<string, User> {\n  ", "\n}\n",
+     "return new Map(users.map((user) => [user.id, user]));",
+     "\n}\n\nfunction byName(users: User[]): Map<string, User> {\n"
+     "  return new Map(users.map((user) => [user.name, user]));\n}\n"),
+    ("java", "// case 8\nclass Counter {\n  int next() {\n    ", "\n    return count;\n  }\n}\n",
+     "count += step;", "\n    if (count > limit) {\n      count = 0;\n    }\n    return count;\n  }\n\n"
+     "  void reset() {\n    count = 0;\n  }\n}\n"),
+    ("go", "// case 9\nfunc Handler(w http.ResponseWriter, r *http.Request) {\n\tbody, err := io.ReadAll(", "\n}\n",
+     "r.Body)", "\n\tif err != nil {\n\t\thttp.Error(w, err.Error(), http.StatusBadRequest)\n\t\treturn\n\t}\n"
+     "\tw.Write(body)\n}\n"),
+]
+MARKER = re.compile(r"case (\d+)")
+
+
+def reply(payload) -> str:
+    """The model's output for a case: the completion, then the run-on"""
+    language, _, _, wanted, run_on = CASES[int(MARKER.search(payload["messages"][-1]["content"]).group(1))]
+    return wanted + run_on
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Early termination of streamed completions")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="seconds per generated token")
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-complete-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    fake = FakeOllama(token_latency=args.token_latency, max_tokens=200, reply=reply).start()
+    os.environ["ECHOIDE_OLLAMA_URLS"] = fake.url
+
+    from fastapi.testclient import TestClient
+    import main as backend
+
+    prepared = [prompt for (name, _, _), prompt in backend.prompt_registry.prepared.items() if name == "complete"]
+    language_stops = [dict(prompt.options) for prompt in prepared]
+    modes = (("before", False, False), ("language stops", True, False), ("early stop", True, True))
+    try:
+        with TestClient(backend.app) as client:
+            for label, stops, early in modes:
+                for prompt, options in zip(prepared, language_stops):
+                    prompt.options = options if stops else {**options, "stop": ["\n\n"]}
+                backend.ai_service.lazy_resolve().completion_early_stop = early
+                latencies, exact = [], 0
+                before = fake.generated
+                for _ in range(args.rounds):
+                    for language, code_before, code_after, wanted, _ in CASES:
+                        started = time.perf_counter()
+                        completion = client.post("/api/code/complete", json={
+                            "code": code_before + code_after, "cursor_position": len(code_before),
+                            "language": language}).json()["completion"]
+                        latencies.append(time.perf_counter() - started)
+                        exact += completion.strip() == wanted.strip()
+                print(f"{label:<15} tokens generated {(fake.generated - before) / args.rounds:6.0f} per round   "
+                      f"median {statistics.median(latencies) * 1000:6.0f} ms   "
+                      f"mean {statistics.mean(latencies) * 1000:6.0f} ms   "
+                      f"exact completions {exact // args.rounds}/{len(CASES)}")
+    finally:
+        fake.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# backend/benchmarks/bench_diagnostics.py
+# Diagnostics engine: time to check a file for each language whose checker
+# is installed (first check, then the same content again from the cache),
+# and a typing burst of --burst edits 50 ms apart on one buffer, counting
+# how many checks actually ran and how long after the last keystroke its
+# diagnostics were published.
+# Run from backend/:  python -m benchmarks.bench_diagnostics [--burst 20]
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.diagnostics_service import DiagnosticsService
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLES = {
+    "python": ("main.py", None),  # The backend's own entry point, about 900 lines
+    "javascript": ("app.js", "\n".join(f"function handler{i}(request) {{\n  return request.items.map((item) => "
+                                       f"item.value * {i});\n}}" for i in range(300))),
+    "c": ("prog.c", "#include <stdio.h>\n" + "\n".join(f"int f{i}(int x) {{ return x * {i}; }}" for i in range(300)) +
+          "\nint main(void) { printf(\"%d\\n\", f1(2)); return 0; }\n"),
+    "cpp": ("prog.cpp", "#include <vector>\n#include <string>\n" + "\n".join(
+        f"int f{i}(const std::vector<int>& v) {{ return v.size() * {i}; }}" for i in range(300)) +
+        "\nint main() { return f1({1, 2}); }\n"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnostics latency, caching and debouncing")
+    parser.add_argument("--burst", type=int, default=20, help="edits in the typing burst")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with open(os.path.join(BACKEND_DIR, "main.py"), encoding="utf-8") as handle:
+        main_source = handle.read()
+    service = DiagnosticsService(debounce=0.25)
+    workdir = tempfile.mkdtemp(prefix="echoide-diagnostics-")
+    try:
+        service.check_text("python", "x = 1\n")  # Start the process pool
+        for language, (name, text) in SAMPLES.items():
+            tool = {"javascript": "node", "c": "gcc", "cpp": "g++"}.get(language)
+            if tool and not service.tools.get(tool):
+                print(f"{language:<11} skipped ({tool} not installed)")
+                continue
+            text = text if text is not None else main_source
+            comment = "#" if language == "python" else "//"
+            cold = []
+            for run in range(args.runs):  # A different trailing comment each time defeats the cache
+                started = time.perf_counter()
+                result = service.check(os.path.join(workdir, name), f"{text}\n{comment} {run}\n")
+                cold.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            service.check(os.path.join(workdir, name), f"{text}\n{comment} 0\n")
+            cached = time.perf_counter() - started
+            print(f"{language:<11} check {statistics.median(cold) * 1000:8.2f} ms   cached {cached * 1000:6.2f} ms   "
+                  f"({len(result['diagnostics'])} diagnostics)")
+
+        loop = asyncio.new_event_loop()
+        subscription = service.subscribe(loop, workdir)
+        path = os.path.join(workdir, "typing.py")
+        for edit in range(args.burst):
+            service.submit(path, main_source + f"\nvalue = {edit}\n")
+            time.sleep(0.05)
+        last_edit = time.perf_counter()
+        event = loop.run_until_complete(asyncio.wait_for(subscription.queue.get(), timeout=30))
+        published = time.perf_counter() - last_edit
+        stats = service.get_stats()
+        print(f"burst of {args.burst} edits: 1 published (version {event['version']}), "
+              f"{published * 1000:.0f} ms after the last edit (debounce {service.debounce * 1000:.0f} ms); "
+              f"{stats['cache_entries']} results cached")
+        loop.close()
+    finally:
+        service.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
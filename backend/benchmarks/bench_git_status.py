@@ -0,0 +1,118 @@
+# backend/benchmarks/bench_git_status.py
+# Directory listings in a generated git repository of --files files (100
+# per directory, a few hundred of them modified or untracked). "before" is
+# a listing without git status; "per listing" runs `git status` for every
+# listing, the naive way to decorate the explorer; "cached" is the
+# GitStatusService map. Also reports the time of the full background scan
+# and how long a save takes to show in a listing.
+# Run from backend/:  python -m benchmarks.bench_git_status [--files 100000]
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.file_service import FileService
+from app.services.git_status import GitStatusService
+
+PER_DIRECTORY = 100
+
+
+def git(root: str, *args: str) -> None:
+    subprocess.run(["git", "-c", "user.name=bench", "-c", "user.email=bench@example.invalid", *args],
+                   cwd=root, check=True, capture_output=True)
+
+
+def make_repository(root: str, count: int) -> list:
+    directories = []
+    for d in range(max(1, count // PER_DIRECTORY)):
+        directory = os.path.join(root, f"pkg{d // 100}", f"mod{d}")
+        os.makedirs(directory)
+        directories.append(directory)
+        for f in range(PER_DIRECTORY):
+            with open(os.path.join(directory, f"file{f}.py"), "w") as handle:
+                handle.write(f"VALUE = {d * PER_DIRECTORY + f}\n")
+    git(root, "init", "-q")
+    git(root, "add", "-A")
+    git(root, "commit", "-qm", "initial")
+    for directory in directories[::7]:
+        with open(os.path.join(directory, "file3.py"), "a") as handle:
+            handle.write("CHANGED = True\n")
+        with open(os.path.join(directory, "scratch.py"), "w") as handle:
+            handle.write("")
+    return directories
+
+
+def timed(function, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Git status decorations in directory listings")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="echoide-git-")
+    try:
+        root = os.path.join(work, "repo")
+        started = time.perf_counter()
+        directories = make_repository(root, args.files)
+        print(f"repository: {len(directories) * PER_DIRECTORY} files in {len(directories)} directories "
+              f"(built in {time.perf_counter() - started:.0f} s)")
+        listed = [root, os.path.dirname(directories[0]), directories[0], directories[len(directories) // 2]]
+
+        plain = FileService()
+        plain.is_path_allowed = lambda _: True
+        service = GitStatusService(debounce=0.05)
+        decorated = FileService(git_status=service)
+        decorated.is_path_allowed = lambda _: True
+
+        def list_all(files):
+            for path in listed:
+                files.list_directory(path)
+
+        def list_with_git_status():
+            for path in listed:
+                subprocess.run(["git", "--no-optional-locks", "status", "--porcelain=v1", "-z"], cwd=root,
+                               capture_output=True, check=True)
+                plain.list_directory(path)
+
+        list_all(plain)  # Warm the directory cache for both
+        print(f"{'before':<12} {timed(lambda: list_all(plain), args.runs) / len(listed):8.2f} ms/listing")
+        print(f"{'per listing':<12} {timed(list_with_git_status, 3) / len(listed):8.2f} ms/listing")
+
+        started = time.perf_counter()
+        service.track(root).ready.wait()
+        scan = time.perf_counter() - started
+        print(f"{'cached':<12} {timed(lambda: list_all(decorated), args.runs) / len(listed):8.2f} ms/listing   "
+              f"(full scan {scan * 1000:.0f} ms in the background, once)")
+        decorations = sum(1 for item in decorated.list_directory(directories[0]) if "git_status" in item)
+
+        saved = os.path.join(directories[1], "file5.py")
+        started = time.perf_counter()
+        decorated.write_file(saved, "VALUE = -1\n")
+        service.notify_changed(saved)
+        while not any(item.get("git_status") for item in decorated.list_directory(directories[1])
+                      if item["name"] == "file5.py"):
+            time.sleep(0.005)
+        shown = time.perf_counter() - started
+        print(f"save shown in listing after {shown * 1000:.0f} ms (debounce {service.debounce * 1000:.0f} ms)   "
+              f"decorated entries in {os.path.basename(directories[0])}: {decorations}")
+        service.shutdown()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
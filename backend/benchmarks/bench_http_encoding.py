@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_http_encoding.py
+# Response encoding cost for typical payloads: a 3000-entry directory
+# listing, a deep project tree and a 1 MB file read. "default" is FastAPI's
+# path before (jsonable_encoder + JSONResponse.render); "fast" is
+# FastJSONResponse.render on the same content. Then CPU time and bytes for
+# each available compression encoding.
+# Run from backend/:  python -m benchmarks.bench_http_encoding
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.services.http_encoding import FastJSONResponse, available_encodings
+
+
+def listing(entries: int = 3000):
+    return {"current_path": "/home/dev/project/src", "files": [{
+        "name": f"module_{i}.py", "path": f"/home/dev/project/src/module_{i}.py", "is_directory": False,
+        "size": 1000 + i, "modified": 1760000000.5 + i, "permissions": "644", "is_readable": True,
+        "is_writable": True, "extension": ".py", "is_text_file": True,
+    } for i in range(entries)]}
+
+
+def tree(path: str = "/home/dev/project", depth: int = 0):
+    node = {"name": os.path.basename(path), "path": path, "type": "directory", "children": []}
+    if depth < 4:
+        node["children"] += [tree(f"{path}/pkg{i}", depth + 1) for i in range(5)]
+    node["children"] += [{"name": f"file{i}.py", "path": f"{path}/file{i}.py", "type": "file",
+                          "extension": ".py"} for i in range(6)]
+    return {"structure": node}
+
+
+def file_read(size: int = 1 << 20):
+    lines, total, i = [], 0, 0
+    while total < size:
+        line = f"    result_{i} = compute(values[{i % 97}], factor={i % 13})  # käse \"step {i}\"\n"
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return {"content": "".join(lines)[:size], "path": "/home/dev/project/big.py"}
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def main():
+    default = JSONResponse.render.__get__(JSONResponse(None))
+    fast = FastJSONResponse.render.__get__(FastJSONResponse(None))
+    encodings = available_encodings()
+    print(f"compression encodings available: {', '.join(encodings)}")
+
+    for label, content, rounds in [("listing 3000", listing(), 20), ("tree", tree(), 20), ("file 1 MB", file_read(), 20)]:
+        default_ms, default_body = timed(lambda: default(jsonable_encoder(content)), rounds)
+        fast_ms, body = timed(lambda: fast(content), rounds)
+        print(f"\n{label}: {len(body) / 1024:.0f} KB")
+        print(f"    {'default encode':<22} {default_ms:8.2f} ms  {len(default_body):>9} bytes")
+        print(f"    {'fast encode':<22} {fast_ms:8.2f} ms  {len(body):>9} bytes")
+        for name, (compress, level) in encodings.items():
+            compress_ms, compressed = timed(lambda: compress(body, level), rounds)
+            print(f"    {name + ' level ' + str(level):<22} {compress_ms:8.2f} ms  {len(compressed):>9} bytes "
+                  f"({len(compressed) / len(body):.1%})")
+
+
+if __name__ == "__main__":
+    main()
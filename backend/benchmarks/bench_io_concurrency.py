@@ -0,0 +1,82 @@
+# backend/benchmarks/bench_io_concurrency.py
+# Concurrency benchmark: a large open_project runs alongside many small reads.
+# Compares calling the services inline on the event loop (old behaviour) with
+# routing them through IOExecutor.
+# Run from backend/:  python -m benchmarks.bench_io_concurrency
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.file_service import FileService
+from app.services.io_executor import IOExecutor
+from app.services.project_service import ProjectService
+
+
+def make_tree(base: str, dirs: int = 300, files_per_dir: int = 100):
+    for d in range(dirs):
+        directory = os.path.join(base, "big_project", f"pkg{d}")
+        os.makedirs(directory, exist_ok=True)
+        for f in range(files_per_dir):
+            with open(os.path.join(directory, f"mod{f}.py"), "w") as handle:
+                handle.write("x = 1\n")
+
+    small = os.path.join(base, "small")
+    os.makedirs(small, exist_ok=True)
+    for i in range(50):
+        with open(os.path.join(small, f"file{i}.py"), "w") as handle:
+            handle.write("print('hello')\n" * 20)
+    return os.path.join(base, "big_project"), small
+
+
+async def run_scenario(label, call, project_path, small_dir, reads=200):
+    latencies = []
+
+    async def reader(i):
+        # Latency is measured from when the read was due, so time spent waiting
+        # for a blocked event loop counts against it
+        due = start + 0.001 * (i % 20)
+        await asyncio.sleep(due - time.perf_counter())
+        await call("read_file", os.path.join(small_dir, f"file{i % 50}.py"))
+        latencies.append(time.perf_counter() - due)
+
+    start = time.perf_counter()
+    await asyncio.gather(call("open_project", project_path), *(reader(i) for i in range(reads)))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<12} total {total * 1000:8.1f} ms   read p50 {p50:8.2f} ms   read p99 {p99:8.2f} ms")
+
+
+async def main():
+    file_service = FileService()
+    project_service = ProjectService()
+    io_executor = IOExecutor()
+    services = {"read_file": file_service.read_file, "open_project": project_service.open_project}
+
+    with tempfile.TemporaryDirectory() as base:
+        file_service.add_allowed_path(base)
+        project_path, small_dir = make_tree(base)
+
+        async def inline(op, path):
+            await asyncio.sleep(0)
+            return services[op](path)
+
+        async def offloaded(op, path):
+            return await io_executor.run(services[op], path)
+
+        await run_scenario("inline", inline, project_path, small_dir)
+        await run_scenario("executor", offloaded, project_path, small_dir)
+        print(io_executor.get_stats())
+
+    io_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+# backend/benchmarks/bench_kernel.py
+# Iterating on the last step of a script. The script has an expensive setup
+# (imports and building a dataset) followed by a cheap final step. "execute"
+# re-runs the whole file through /api/execute after each edit, as the editor
+# does today; "kernel" runs the setup once in a persistent kernel and then
+# only the last cell (`cell` of /api/kernel/execute) after each edit.
+# Run from backend/:  python -m benchmarks.bench_kernel [--size 2000000] [--runs 10]
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCRIPT = """import json, decimal, statistics
+data = [(i * 7919) % 1000003 for i in range({size})]
+index = {{value: position for position, value in enumerate(data)}}
+# %%
+print("step", {step}, statistics.mean(data[::{stride}]))
+"""
+
+
+def timed(call, runs: int):
+    samples = []
+    for step in range(runs):
+        started = time.perf_counter()
+        call(step)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name: str, samples):
+    samples = sorted(samples)
+    print(f"{name:<34} median {statistics.median(samples) * 1000:9.2f} ms   "
+          f"max {samples[-1] * 1000:9.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent kernel vs full re-execution")
+    parser.add_argument("--size", type=int, default=2000000, help="dataset size built by the setup step")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-kernel-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    workspace = os.path.join(home, "Projects", "notebook")
+    os.makedirs(workspace)
+
+    from fastapi.testclient import TestClient
+    import main as backend
+
+    try:
+        with TestClient(backend.app) as client:
+            def source(step: int) -> str:
+                return SCRIPT.format(size=args.size, step=step, stride=97 + step)
+
+            def execute(step: int):
+                with open(os.path.join(workspace, "analysis.py"), "w") as handle:
+                    handle.write(source(step))
+                result = client.post("/api/execute", json={"executor": "python", "filename": "analysis.py",
+                                                           "workspace": workspace}).json()
+                assert result["success"], result
+
+            def kernel(cell):
+                def call(step: int):
+                    result = client.post("/api/kernel/execute", json={
+                        "workspace": workspace, "code": source(step), "cell": cell, "stream": False}).json()
+                    assert result["success"], result
+                return call
+
+            started = time.perf_counter()
+            kernel(0)(0)
+            setup = time.perf_counter() - started
+
+            report("execute: whole script", timed(execute, args.runs))
+            print(f"{'kernel: setup cell (once)':<34} {setup * 1000:16.2f} ms")
+            report("kernel: last cell only", timed(kernel(1), args.runs))
+            backend.kernel_service.shutdown()
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
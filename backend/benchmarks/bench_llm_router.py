@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_llm_router.py
+# Routing benchmark against fake Ollama servers on local ports. Each fake
+# server generates one request at a time (like Ollama with OLLAMA_NUM_PARALLEL=1),
+# so throughput only scales if the pool spreads the load. A third scenario
+# kills one backend half-way through to check failover.
+# Run from backend/:  python -m benchmarks.bench_llm_router
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_router import BackendPool
+
+MODEL = "deepseek-coder:6.7b"
+GENERATION_SECONDS = 0.05
+
+
+def start_fake_ollama():
+    generating = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path in ("/api/tags", "/api/ps"):
+                self._reply({"models": [{"name": MODEL}]})
+            else:
+                self._reply({"error": "not found"}, 404)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with generating:
+                time.sleep(GENERATION_SECONDS)
+            self._reply({"message": {"role": "assistant", "content": "pass"}, "done": True})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_scenario(label, pool, requests_count=120, concurrency=12, kill=None):
+    payload = {"model": MODEL, "messages": [{"role": "user", "content": "hi"}], "stream": False}
+    latencies, errors = [], 0
+
+    def call(i):
+        if kill is not None and i == requests_count // 2:
+            kill.shutdown()
+            kill.server_close()
+        started = time.perf_counter()
+        response = pool.post("/api/chat", payload, timeout=10)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [executor.submit(call, i) for i in range(requests_count)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"{label:<32} wall {wall:6.2f}s  {requests_count / wall:6.1f} req/s  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  errors {errors}")
+    for backend in pool.backends:
+        print(f"    {backend.url:<28} requests {backend.requests:4d}  failures {backend.failures:3d}  "
+              f"healthy {backend.healthy}")
+
+
+def main():
+    servers = [start_fake_ollama() for _ in range(3)]
+    urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+
+    single = BackendPool(urls[:1])
+    single.check_all()
+    run_scenario("1 backend", single)
+
+    pooled = BackendPool(urls)
+    pooled.check_all()
+    run_scenario("3 backends", pooled)
+
+    failover = BackendPool(urls)
+    failover.check_all()
+    run_scenario("3 backends, one killed midway", failover, kill=servers[2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_path_finder.py
+# Latency and memory of the "go to file" index at 500k synthetic paths,
+# replaying the queries a user produces while typing.
+# Run from backend/:  python -m benchmarks.bench_path_finder [path_count]
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.path_finder import PathIndex
+
+WORDS = ["src", "lib", "components", "utils", "services", "models", "views", "tests",
+         "api", "core", "config", "handlers", "widgets", "auth", "db"]
+KINDS = ["Service", "Model", "View", "Helper", "_test", "Controller"]
+
+
+def make_paths(count: int):
+    rng = random.Random(1)
+    paths = set()
+    while len(paths) < count:
+        directory = "/".join(rng.choice(WORDS) + str(rng.randint(0, 40)) for _ in range(rng.randint(1, 5)))
+        name = f"{rng.choice(WORDS)}{rng.choice(KINDS)}{rng.randint(0, 999)}.{rng.choice(['py', 'js', 'ts', 'java'])}"
+        paths.add(f"{directory}/{name}")
+    return list(paths)
+
+
+def main(count: int = 500_000):
+    paths = make_paths(count)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = PathIndex("/project", paths)
+    build_s = time.perf_counter() - start
+    del paths
+    memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    print(f"{count} paths: built in {build_s:.2f} s, index holds {memory_mb:.1f} MB")
+
+    timings = []
+    for word in ["authmodel", "userservice", "apiview12", "configHelper"]:
+        for end in range(1, len(word) + 1):
+            query = word[:end]
+            start = time.perf_counter()
+            results = index.search(query, 20)
+            elapsed = (time.perf_counter() - start) * 1000
+            timings.append(elapsed)
+            if end == len(word):
+                top = results[0]["relative_path"] if results else "-"
+                print(f"{query!r:<16} {elapsed:7.2f} ms  top: {top}")
+
+    timings.sort()
+    print(f"per keystroke: p50 {timings[len(timings) // 2]:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms, max {timings[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
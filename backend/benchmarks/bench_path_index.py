@@ -0,0 +1,62 @@
+# backend/benchmarks/bench_path_index.py
+# Micro-benchmark: allow-list check with hundreds of workspaces.
+# Run from backend/:  python -m benchmarks.bench_path_index
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.path_index import AllowedPathIndex
+
+
+def linear_is_allowed(allowed_paths, path):
+    """The previous implementation: abspath + startswith over every root"""
+    abs_path = os.path.abspath(path)
+    for allowed_path in allowed_paths:
+        if abs_path.startswith(allowed_path):
+            return True
+    return False
+
+
+def bench(label, func, paths, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for path in paths:
+            func(path)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / (rounds * len(paths)) * 1e6
+    print(f"{label:<32} {per_call:8.2f} us/check")
+
+
+def main(workspace_count: int = 500, rounds: int = 20):
+    with tempfile.TemporaryDirectory() as base:
+        base = os.path.realpath(base)
+        roots = []
+        for i in range(workspace_count):
+            root = os.path.join(base, f"team{i % 10}", f"workspace{i}")
+            os.makedirs(os.path.join(root, "src", "pkg"), exist_ok=True)
+            roots.append(root)
+
+        # Mix of hits deep in the tree, misses, and sibling-prefix traps
+        queries = []
+        for i in range(0, workspace_count, 5):
+            queries.append(os.path.join(roots[i], "src", "pkg", "module.py"))
+            queries.append(roots[i] + "x")
+            queries.append(os.path.join(base, "outside", f"file{i}.py"))
+
+        index = AllowedPathIndex(roots)
+        uncached = AllowedPathIndex(roots, cache_size=0)
+
+        print(f"{workspace_count} workspaces, {len(queries)} distinct paths")
+        bench("linear startswith (old)", lambda p: linear_is_allowed(roots, p), queries, rounds)
+        bench("trie, uncached", uncached.contains, queries, rounds)
+        bench("trie, cached", index.contains, queries, rounds)
+
+        wrong = sum(1 for p in queries if linear_is_allowed(roots, p) != index.contains(p))
+        print(f"paths the old check got wrong: {wrong}")
+
+
+if __name__ == "__main__":
+    main()
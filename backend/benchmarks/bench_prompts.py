@@ -0,0 +1,72 @@
+# backend/benchmarks/bench_prompts.py
+# Prompt building cost per request. "per-call dicts" rebuilds the nested
+# language/analysis dicts and formats the whole template on every call, as
+# AIService did before the registry; "registry" is PromptRegistry.get plus
+# render of the per-request fields.
+# Run from backend/:  python -m benchmarks.bench_prompts
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.prompt_registry import PromptRegistry
+
+CODE = "def total(items):\n    return sum(item.price for item in items)\n" * 20
+
+
+def bench(label, func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    per_call = (time.perf_counter() - start) / rounds * 1e6
+    print(f"{label:<36} {per_call:8.2f} us/prompt")
+
+
+def main(rounds: int = 20000):
+    start = time.perf_counter()
+    registry = PromptRegistry()
+    print(f"load + validate + pre-render: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(registry.prepared)} prepared prompts)")
+
+    analyze = registry.templates["analyze"]
+    complete = registry.templates["complete"]
+    by_type = {}
+    for key, entry in analyze["values"].items():
+        analysis_type, language = key.split("/")
+        by_type.setdefault(analysis_type, {})[language] = entry["instruction"]
+
+    def legacy_analyze(analysis_type="review", language="python"):
+        prompts = {kind: dict(languages) for kind, languages in by_type.items()}
+        instruction = prompts.get(analysis_type, {}).get(language) or \
+            analyze["default"]["instruction"].format(analysis_type=analysis_type, language=language)
+        system = analyze["system"].format(language=language)
+        user = analyze["user"].format(instruction=instruction, language=language, code=CODE)
+        return system, user
+
+    def legacy_complete(language="python"):
+        contexts = {lang: dict(entry) for lang, entry in complete["values"].items()}
+        info = contexts.get(language) or {k: v.format(language=language) for k, v in complete["default"].items()}
+        system = complete["system"].format(language=language)
+        user = complete["user"].format(language=language, context_analysis="Inside def total",
+                                       related_section="", before_cursor=CODE, after_cursor="", **info)
+        return system, user
+
+    def registry_analyze():
+        return registry.get("analyze", analysis_type="review", language="python").render(code=CODE)
+
+    def registry_complete():
+        return registry.get("complete", language="python").render(
+            context_analysis="Inside def total", related_section="", before_cursor=CODE, after_cursor="")
+
+    assert legacy_analyze() == registry_analyze()
+    assert legacy_complete() == registry_complete()
+
+    bench("analyze, per-call dicts", legacy_analyze, rounds)
+    bench("analyze, registry", registry_analyze, rounds)
+    bench("complete, per-call dicts", legacy_complete, rounds)
+    bench("complete, registry", registry_complete, rounds)
+
+
+if __name__ == "__main__":
+    main()
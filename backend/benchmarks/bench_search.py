@@ -0,0 +1,79 @@
+# backend/benchmarks/bench_search.py
+# Compares a full scan of the workspace with a trigram-indexed query.
+# Run from backend/:  python -m benchmarks.bench_search [size_mb]
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.file_service import FileService
+from app.services.search_service import SearchService
+
+WORDS = ["value", "result", "config", "handler", "request", "index", "buffer", "token",
+         "session", "client", "server", "parse", "render", "update", "cache", "stream"]
+
+
+def make_repo(base: str, size_mb: int):
+    rng = random.Random(42)
+    target = size_mb * 1024 * 1024
+    written = 0
+    file_number = 0
+    while written < target:
+        directory = os.path.join(base, f"pkg{file_number // 200}")
+        os.makedirs(directory, exist_ok=True)
+        lines = []
+        for _ in range(400):
+            a, b, c = rng.sample(WORDS, 3)
+            lines.append(f"    {a}_{b} = {c}({a}, {rng.randint(0, 10_000)})")
+        if file_number == 1234:
+            lines.append("    needle_in_the_haystack = True")
+        text = f"def func_{file_number}():\n" + "\n".join(lines) + "\n"
+        with open(os.path.join(directory, f"mod{file_number}.py"), "w") as handle:
+            handle.write(text)
+        written += len(text)
+        file_number += 1
+    return file_number
+
+
+def full_scan(root: str, pattern):
+    hits = 0
+    for current, _, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(current, name), encoding="utf-8") as handle:
+                for line in handle:
+                    if pattern.search(line):
+                        hits += 1
+    return hits
+
+
+def main(size_mb: int = 50):
+    os.environ["HOME"] = tempfile.mkdtemp()  # Keep the on-disk index out of the real home
+    with tempfile.TemporaryDirectory() as base:
+        file_count = make_repo(base, size_mb)
+        service = SearchService(FileService())
+
+        start = time.perf_counter()
+        service.get_index(base)
+        print(f"{file_count} files / {size_mb} MB indexed in {time.perf_counter() - start:.2f} s")
+        print(f"index on disk: {os.path.getsize(service._index_path(os.path.realpath(base))) / 1024:.0f} KB")
+
+        for query, is_regex in [("needle_in_the_haystack", False), (r"needle_\w+_haystack", True)]:
+            pattern = re.compile(query if is_regex else re.escape(query), re.IGNORECASE)
+            start = time.perf_counter()
+            scan_hits = full_scan(base, pattern)
+            scan_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            results = list(service.search(base, query, is_regex))
+            index_ms = (time.perf_counter() - start) * 1000
+            index_hits = sum(len(result["matches"]) for result in results)
+            print(f"{query!r:<28} full scan {scan_ms:9.1f} ms ({scan_hits} hits)   "
+                  f"indexed {index_ms:7.2f} ms ({index_hits} hits)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
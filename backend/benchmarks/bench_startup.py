@@ -0,0 +1,134 @@
+# backend/benchmarks/bench_startup.py
+# Cold start of the backend, each step in a fresh interpreter:
+#   1. import cost of `main` on top of `fastapi` itself (python -X importtime),
+#      checked against --import-budget-ms, with the slowest modules only main
+#      pulls in;
+#   2. uvicorn started as Electron starts it, timed from spawn until
+#      /api/health answers (listening) and until /api/ready returns 200
+#      (every service built), checked against --ready-budget-ms. A bare
+#      FastAPI app with a single route is timed too, as the framework floor.
+# Exit code 1 if a budget is exceeded.
+# Run from backend/:  python -m benchmarks.bench_startup
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Minimal app for the framework floor
+bare_app = None
+if __name__ != "__main__":
+    try:
+        from fastapi import FastAPI
+        bare_app = FastAPI()
+        bare_app.get("/api/health")(lambda: {"status": "healthy"})
+    except ImportError:
+        pass
+
+
+def import_times(statement: str, env) -> dict:
+    """Module -> (self us, cumulative us) from -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def cold_start(target: str, env, wait_ready: bool, timeout: float = 60.0):
+    """(seconds until /api/health answers, seconds until /api/ready is 200 or None)"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"], cwd=BACKEND_DIR, env=env)
+    base = f"http://127.0.0.1:{port}"
+    listening = ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if listening is None:
+                if get_status(base + "/api/health") == 200:
+                    listening = time.perf_counter() - started
+                    if not wait_ready:
+                        break
+            elif get_status(base + "/api/ready") == 200:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    if listening is None:
+        raise RuntimeError(f"{target} did not start within {timeout:g}s")
+    return listening, ready
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=150.0,
+                        help="allowed import time of main beyond fastapi itself")
+    parser.add_argument("--ready-budget-ms", type=float, default=300.0)
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-startup-")
+    env = dict(os.environ, HOME=home, USERPROFILE=home, ECHOIDE_OLLAMA_URLS="http://127.0.0.1:9")
+    failed = False
+
+    framework_runs = [import_times("import fastapi", env) for _ in range(args.runs)]
+    framework = statistics.median(times["fastapi"][1] for times in framework_runs)
+    runs = [import_times("import main", env) for _ in range(args.runs)]
+    total = statistics.median(times["main"][1] for times in runs)
+    ours = (total - framework) / 1000
+    print(f"import fastapi {framework / 1000:8.1f} ms")
+    print(f"import main    {total / 1000:8.1f} ms   (+{ours:.1f} ms, budget {args.import_budget_ms:g} ms)")
+    # Modules only main pulls in, by self time
+    own = sorted(((self_us, module) for module, (self_us, _) in runs[-1].items()
+                  if module not in framework_runs[-1]), reverse=True)
+    for self_us, module in own[:8]:
+        print(f"    {module:<40} {self_us / 1000:8.1f} ms")
+    if ours > args.import_budget_ms:
+        failed = True
+        print("    IMPORT BUDGET EXCEEDED")
+
+    floor = statistics.median(cold_start("benchmarks.bench_startup:bare_app", env, False)[0]
+                              for _ in range(args.runs))
+    starts = [cold_start("main:app", env, True) for _ in range(args.runs)]
+    listening = statistics.median(start[0] for start in starts)
+    ready = statistics.median(start[1] for start in starts)
+    print(f"\nbare FastAPI app listening  {floor * 1000:8.1f} ms   (framework floor)")
+    print(f"backend listening           {listening * 1000:8.1f} ms")
+    print(f"backend ready               {ready * 1000:8.1f} ms   (budget {args.ready_budget_ms:g} ms)")
+    if ready * 1000 > args.ready_budget_ms:
+        failed = True
+        print("    READY BUDGET EXCEEDED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# backend/benchmarks/bench_tests.py
+# Test runner: a generated project of `--modules` packages, each with a test
+# file whose tests take `--test-seconds` in total (sleep, so shards overlap
+# even on one core). Times a full run (mode "all"), a run with nothing
+# changed (everything from cache) and a run after editing one module (only
+# the tests importing it run), each with --workers parallel shards.
+# Run from backend/:  python -m benchmarks.bench_tests [--modules 40] [--workers 4]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.symbol_service import SymbolService
+from app.services.test_service import TestService
+
+
+class _Files:
+    skip_directories = {"__pycache__", "node_modules", ".git"}
+
+
+def make_project(root: str, modules: int, test_seconds: float):
+    os.makedirs(os.path.join(root, "app"))
+    os.makedirs(os.path.join(root, "tests"))
+    open(os.path.join(root, "app", "__init__.py"), "w").close()
+    with open(os.path.join(root, "app", "shared.py"), "w") as handle:
+        handle.write("def scale(value):\n    return value * 2\n")
+    for i in range(modules):
+        with open(os.path.join(root, "app", f"module_{i}.py"), "w") as handle:
+            # Every tenth module builds on the shared helper
+            handle.write(("from app.shared import scale\n" if i % 10 == 0 else "scale = lambda value: value * 2\n") +
+                         f"def compute_{i}(value):\n    return scale(value) + {i}\n")
+        with open(os.path.join(root, "tests", f"test_module_{i}.py"), "w") as handle:
+            handle.write(f"import time\nfrom app.module_{i} import compute_{i}\n\n" + "".join(
+                f"def test_case_{case}():\n    time.sleep({test_seconds / 4})\n"
+                f"    assert compute_{i}({case}) == {case * 2 + i}\n\n" for case in range(4)))
+
+
+def timed_run(service: TestService, root: str, mode: str):
+    started = time.perf_counter()
+    events = list(service.run(root, mode))
+    summary = events[-1]
+    return time.perf_counter() - started, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Affected-test selection and result caching")
+    parser.add_argument("--modules", type=int, default=40)
+    parser.add_argument("--test-seconds", type=float, default=0.2, help="run time of each test file")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-tests-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    root = os.path.join(home, "project")
+    make_project(root, args.modules, args.test_seconds)
+    try:
+        service = TestService(SymbolService(_Files()), workers=args.workers)
+        if not service.has_pytest:
+            print("pytest is not installed for", service.python)
+            return
+        for label, mode, edit in (("full run (mode all)", "all", None),
+                                  ("nothing changed", "affected", None),
+                                  ("edited app/module_7.py", "affected", "module_7.py"),
+                                  ("edited app/shared.py", "affected", "shared.py")):
+            if edit:
+                with open(os.path.join(root, "app", edit), "a") as handle:
+                    handle.write("# edited\n")
+            wall, summary = timed_run(service, root, mode)
+            print(f"{label:<26} {wall * 1000:9.1f} ms   files run {summary['files_run']:3d}, "
+                  f"cached {summary['files_cached']:3d}, passed {summary['passed']}")
+        service.symbol_service.shutdown()
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# backend/benchmarks/bench_workers.py
+# Multi-worker mode: starts `python main.py` with ECHOIDE_WORKERS=1,2,4...
+# (fake Ollama, throwaway HOME), checks that state set through one worker is
+# seen by all of them, then measures throughput of CPU-bound endpoints
+# (a 3000-entry directory listing and a 200 KB file read) with 16 clients.
+# Every check uses fresh connections, which the kernel spreads over workers.
+# Run from backend/:  python -m benchmarks.bench_workers [--workers 1,2,4]
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.run_benchmarks import free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_fixtures(home: str):
+    project = os.path.join(home, "Projects", "big")
+    os.makedirs(project)
+    for i in range(3000):
+        with open(os.path.join(project, f"module_{i}.py"), "w") as handle:
+            handle.write("x = 1\n")
+    with open(os.path.join(project, "large.py"), "w") as handle:
+        handle.write("def handler(value):\n    return value * 2\n\n" * 5000)
+    outside = tempfile.mkdtemp(prefix="echoide-workspace-")  # Not under HOME, so not allowed by default
+    with open(os.path.join(outside, "notes.txt"), "w") as handle:
+        handle.write("shared workspace\n")
+    return project, outside
+
+
+def start(workers: int, home: str, ollama_url: str):
+    port = free_port()
+    env = dict(os.environ, HOME=home, USERPROFILE=home, ECHOIDE_OLLAMA_URLS=ollama_url,
+               ECHOIDE_WORKERS=str(workers), ECHOIDE_PORT=str(port))
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    ready = 0
+    while time.time() < deadline and ready < workers * 3:
+        try:
+            ready = ready + 1 if requests.get(base + "/api/ready", timeout=2).ok else 0
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    if ready < workers * 3:
+        process.terminate()
+        raise RuntimeError(f"{workers} workers did not become ready")
+    return process, base
+
+
+def fresh(method: str, url: str, **kwargs):
+    with requests.Session() as session:
+        return session.request(method, url, timeout=60, **kwargs)
+
+
+def check_shared_state(base: str, project: str, outside: str, fake: FakeOllama):
+    # Workspace added through one worker must be readable through every worker
+    fresh("POST", base + "/api/files/add-workspace", json={"workspace_path": outside}).raise_for_status()
+    reads = [fresh("GET", base + "/api/files/read", params={"path": os.path.join(outside, "notes.txt")}).status_code
+             for _ in range(20)]
+    # Chat history written by whichever worker served a turn is sent with the next one
+    for turn in range(4):
+        fresh("POST", base + "/api/chat", json={"message": f"turn {turn}", "session_id": "shared"}).raise_for_status()
+    history_messages = len(fake.last_payload["messages"]) - 2  # Minus system and current message
+    # A file written through one worker shows up in every worker's file finder
+    for _ in range(8):
+        fresh("GET", base + "/api/project/find-file", params={"project_path": project, "query": "module_1"})
+    fresh("POST", base + "/api/files/write", json={"path": os.path.join(project, "brand_new_finder.py"),
+                                                  "content": "y = 2\n"}).raise_for_status()
+    found = sum(1 for _ in range(20) if any(
+        result["name"] == "brand_new_finder.py" for result in fresh(
+            "GET", base + "/api/project/find-file",
+            params={"project_path": project, "query": "brand_new_finder"}).json()["results"]))
+    return reads.count(200), history_messages, found
+
+
+def throughput(base: str, path: str, params: dict, total: int = 400, clients: int = 16) -> float:
+    def call(_):
+        return fresh("GET", base + path, params=params, headers={"Accept-Encoding": "identity"}).ok
+
+    with ThreadPoolExecutor(clients) as executor:
+        list(executor.map(call, range(clients)))  # Warm every worker's caches
+        start = time.perf_counter()
+        ok = sum(executor.map(call, range(total)))
+        wall = time.perf_counter() - start
+    return ok / wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-worker scaling benchmark")
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args(argv)
+
+    fake = FakeOllama(token_latency=0.001, parallel=8).start()
+    print(f"{os.cpu_count()} CPUs")
+    try:
+        for workers in (int(count) for count in args.workers.split(",")):
+            home = tempfile.mkdtemp(prefix="echoide-workers-")
+            project, outside = make_fixtures(home)
+            process, base = start(workers, home, fake.url)
+            try:
+                reads, history, found = check_shared_state(base, project, outside, fake)
+                listing = throughput(base, "/api/files/list", {"path": project})
+                large = throughput(base, "/api/files/read", {"path": os.path.join(project, "large.py")})
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+                shutil.rmtree(home, ignore_errors=True)
+                shutil.rmtree(outside, ignore_errors=True)
+            print(f"workers {workers}: workspace reads ok {reads}/20, history sent {history}/6 messages, "
+                  f"new file found {found}/20 | list 3000 {listing:7.1f} req/s, read 200 KB {large:7.1f} req/s")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
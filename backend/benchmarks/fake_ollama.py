@@ -0,0 +1,268 @@
+# backend/benchmarks/fake_ollama.py
+# Deterministic stand-in for an Ollama server, for benchmarks. Replies to
+# /api/chat and /api/generate (streamed or not), /api/embed, /api/embeddings,
+# /api/tags and /api/ps. Each reply is derived from a hash of the request, and
+# its timing comes from the configured model load, per-prompt-token and
+# per-output-token latencies, so runs are repeatable. `parallel` bounds how
+# many generations run at once, like OLLAMA_NUM_PARALLEL. With `prefix_cache`
+# each slot keeps its last prompt and reply like Ollama's KV cache: the part
+# of a new prompt that repeats it is neither charged prompt latency nor
+# counted in prompt_eval_count. Replies honour the `num_predict` and `stop`
+# options; `reply` replaces the canned replies, and `generated` counts the
+# tokens actually sent (a client that disconnects stops the generation).
+# Standalone:  python -m benchmarks.fake_ollama --port 11434 --token-latency 0.02
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+MODELS = ["deepseek-coder:6.7b", "codellama:7b", "nomic-embed-text"]
+
+# Canned outputs, picked by a hash of the last message
+_REPLIES = {
+    "complete": ["return sum(item.price for item in items)",
+                 "if not values:\n        return None\n    return max(values)",
+                 "result = []\n    for line in lines:\n        result.append(line.strip())\n    return result"],
+    "chat": ["You can use a dictionary comprehension here:\n\n```python\ncounts = {k: len(v) for k, v in groups.items()}\n```",
+             "The loop re-reads the file on every iteration; read it once before the loop.",
+             "Use `functools.lru_cache` on the pure helper so repeated calls are free."],
+}
+EMBEDDING_DIM = 64
+
+
+class FakeOllama:
+    """In-process fake Ollama server on 127.0.0.1 (port 0 picks a free one)"""
+
+    def __init__(self, port: int = 0, token_latency: float = 0.005, prompt_token_latency: float = 0.0001,
+                 load_latency: float = 0.0, parallel: int = 1, max_tokens: int = 64,
+                 prefix_cache: bool = False, reply: Optional[Callable[[Dict], str]] = None):
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.load_latency = load_latency
+        self.max_tokens = max_tokens
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.parallel = parallel
+        self.prefix_cache = prefix_cache
+        self.reply = reply
+        self.generated = 0
+        self.kv_cache: List[str] = []  # Per slot: prompt and reply of its last generation
+        self.requests = 0
+        self.last_payload: Optional[Dict] = None
+        self._count_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def _digest(payload: Dict) -> int:
+        return int(hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:8], 16)
+
+    def reply_text(self, payload: Dict) -> str:
+        if self.reply is not None:
+            return self.reply(payload)
+        messages = payload.get("messages") or [{"content": payload.get("prompt", "")}]
+        system = messages[0].get("content", "") if messages[0].get("role") == "system" else ""
+        kind = "complete" if "complet" in system.lower() else "chat"
+        choices = _REPLIES[kind]
+        return choices[self._digest(messages[-1]) % len(choices)]
+
+    @staticmethod
+    def tokens(text: str) -> List[str]:
+        """Split text into token-sized pieces that join back to the original"""
+        pieces, start = [], 0
+        for i in range(1, len(text) + 1):
+            if i == len(text) or (text[i] in " \n" and i - start >= 2) or i - start >= 4:
+                pieces.append(text[start:i])
+                start = i
+        return pieces
+
+    @staticmethod
+    def prompt_tokens(payload: Dict) -> int:
+        text = "".join(m.get("content", "") for m in payload.get("messages", [])) + payload.get("prompt", "")
+        return max(1, len(text) // 4)
+
+    @staticmethod
+    def prompt_text(payload: Dict) -> str:
+        """The prompt as the model sees it, roughly: messages in a chat template"""
+        return "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in payload.get("messages", [])) + \
+            payload.get("prompt", "")
+
+    def _cached_tokens(self, text: str) -> int:
+        """Prompt tokens a slot already holds, taking the slot whose cache shares the longest prefix"""
+        with self._count_lock:
+            shared = max((len(os.path.commonprefix([entry, text])) for entry in self.kv_cache), default=0)
+        return shared // 4
+
+    def _remember(self, text: str) -> None:
+        with self._count_lock:
+            if self.kv_cache:
+                best = max(self.kv_cache, key=lambda entry: len(os.path.commonprefix([entry, text])))
+                if os.path.commonprefix([best, text]):
+                    self.kv_cache.remove(best)
+            self.kv_cache.append(text)
+            del self.kv_cache[:-self.parallel]
+
+    def _generate(self, payload: Dict, emit) -> Dict:
+        """Run one generation under a slot, calling emit(piece) per token; returns the timing fields"""
+        with self._count_lock:
+            self.requests += 1
+            self.last_payload = payload
+        queued = time.perf_counter()
+        with self.slots:
+            started = time.perf_counter()
+            if self.load_latency:
+                time.sleep(self.load_latency)
+            prompt_count = self.prompt_tokens(payload)
+            if self.prefix_cache:
+                prompt_text = self.prompt_text(payload)
+                prompt_count = max(1, prompt_count - self._cached_tokens(prompt_text))
+            prompt_seconds = prompt_count * self.prompt_token_latency
+            time.sleep(prompt_seconds)
+            text = self.reply_text(payload)
+            options = payload.get("options") or {}
+            for stop in options.get("stop") or []:
+                if stop in text:
+                    text = text[:text.index(stop)]
+            pieces = self.tokens(text)[:min(self.max_tokens, options.get("num_predict") or self.max_tokens)]
+            if self.prefix_cache:
+                self._remember(prompt_text + "<assistant>" + "".join(pieces))
+            eval_started = time.perf_counter()
+            for piece in pieces:
+                time.sleep(self.token_latency)
+                emit(piece)
+                with self._count_lock:
+                    self.generated += 1
+            finished = time.perf_counter()
+        return {
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((finished - started) * 1e9),
+            "load_duration": int(self.load_latency * 1e9),
+            "prompt_eval_count": prompt_count,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": len(pieces),
+            "eval_duration": int((finished - eval_started) * 1e9),
+            "queue_seconds": round(started - queued, 6),  # Not an Ollama field; handy when debugging
+        }
+
+    def embed(self, text: str) -> List[float]:
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        return [(seed[i % len(seed)] - 127.5) / 127.5 for i in range(EMBEDDING_DIM)]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, payload: Dict, chat: bool):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write(chunk: Dict):
+                    data = json.dumps(chunk).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+
+                def emit(piece: str):
+                    body = {"message": {"role": "assistant", "content": piece}} if chat else {"response": piece}
+                    write({"model": payload.get("model"), "done": False, **body})
+
+                try:
+                    stats = fake._generate(payload, emit)
+                    final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+                    write({"model": payload.get("model"), **final, **stats})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client cancelled mid-stream
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._reply({"models": [{"name": name} for name in MODELS]})
+                elif self.path == "/api/ps":
+                    self._reply({"models": [{"name": MODELS[0]}]})
+                else:
+                    self._reply({"error": "not found"}, 404)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path in ("/api/chat", "/api/generate"):
+                    chat = self.path == "/api/chat"
+                    if payload.get("stream", True):
+                        self._stream(payload, chat)
+                        return
+                    pieces = []
+                    stats = fake._generate(payload, pieces.append)
+                    body = {"message": {"role": "assistant", "content": "".join(pieces)}} if chat \
+                        else {"response": "".join(pieces)}
+                    self._reply({"model": payload.get("model"), **body, **stats})
+                elif self.path == "/api/embed":
+                    inputs = payload.get("input", [])
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._reply({"model": payload.get("model"), "embeddings": [fake.embed(t) for t in inputs]})
+                elif self.path == "/api/embeddings":
+                    self._reply({"embedding": fake.embed(payload.get("prompt", ""))})
+                else:
+                    self._reply({"error": "not found"}, 404)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client closed a kept-alive connection
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds per generated token")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0001, help="seconds per prompt token")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="model load seconds per request")
+    parser.add_argument("--parallel", type=int, default=1, help="generations run at once")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--prefix-cache", action="store_true", help="reuse the prompt prefix each slot holds")
+    args = parser.parse_args(argv)
+
+    fake = FakeOllama(args.port, args.token_latency, args.prompt_token_latency, args.load_latency,
+                      args.parallel, args.max_tokens, args.prefix_cache)
+    print(f"fake ollama listening on {fake.url}", flush=True)
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# backend/benchmarks/run_benchmarks.py
+# End-to-end benchmark suite. Starts the fake Ollama server (fake_ollama.py)
+# and the real backend under uvicorn with HOME pointed at a throwaway
+# directory, then drives each endpoint scenario over HTTP at several
+# concurrency levels. Every client is closed-loop: it sends its next request
+# as soon as the previous one returns.
+#
+# Results go to benchmarks/results/latest.json: p50/p95/p99, mean, max,
+# throughput and error count per scenario and concurrency. With --baseline,
+# results are compared against an earlier run and the exit code is 1 if any
+# p50 or p95 got slower than the threshold allows.
+#
+# Run from backend/:
+#   python -m benchmarks.run_benchmarks --save-baseline        # before a change
+#   python -m benchmarks.run_benchmarks --baseline benchmarks/results/baseline.json
+#   python -m benchmarks.run_benchmarks --scenarios chat,complete --concurrency 1,16
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllama
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+CODE = "def total(items):\n    subtotal = 0\n    for item in items:\n        subtotal += item.price\n"
+
+
+def make_project(home: str) -> str:
+    """A small deterministic project inside the (allowed) fake home directory"""
+    project = os.path.join(home, "Projects", "bench")
+    for package in range(8):
+        directory = os.path.join(project, f"pkg{package}")
+        os.makedirs(directory, exist_ok=True)
+        for module in range(25):
+            with open(os.path.join(directory, f"mod{module}.py"), "w") as handle:
+                handle.write(f"def handler_{package}_{module}(value):\n    return value * {module}\n\n" * 20)
+    os.makedirs(os.path.join(project, "scratch"), exist_ok=True)
+    with open(os.path.join(project, "hello.py"), "w") as handle:
+        handle.write("print(sum(range(1000)))\n")
+    return project
+
+
+# Each scenario maps a request index to (method, path, keyword arguments for requests)
+def scenarios(project: str):
+    return {
+        "chat": lambda i: ("POST", "/api/chat", {"json": {
+            "message": f"How do I speed up loop number {i}?", "session_id": f"bench-{i}"}}),
+        "complete": lambda i: ("POST", "/api/code/complete", {"json": {
+            "code": CODE + f"    # step {i}\n    ", "cursor_position": len(CODE) + len(f"    # step {i}\n    "),
+            "language": "python"}}),
+        "analyze": lambda i: ("POST", "/api/code/analyze", {"json": {
+            "code": CODE * (1 + i % 4), "language": "python", "analysis_type": "review"}}),
+        "file_list": lambda i: ("GET", "/api/files/list", {"params": {"path": os.path.join(project, f"pkg{i % 8}")}}),
+        "file_read": lambda i: ("GET", "/api/files/read", {"params": {
+            "path": os.path.join(project, f"pkg{i % 8}", f"mod{i % 25}.py")}}),
+        "file_write": lambda i: ("POST", "/api/files/write", {"json": {
+            "path": os.path.join(project, "scratch", f"out{i % 20}.py"), "content": CODE * (1 + i % 5)}}),
+        "project_open": lambda i: ("POST", "/api/project/open", {"json": {"project_path": project}}),
+        "execute": lambda i: ("POST", "/api/execute", {"json": {
+            "executor": "python", "filename": "hello.py", "workspace": project}}),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(home: str, ollama_url: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, HOME=home, USERPROFILE=home, ECHOIDE_OLLAMA_URLS=ollama_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited during startup (code {process.returncode})")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Backend did not become healthy within 60s")
+
+
+def percentile(ordered, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(q * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_scenario(base_url: str, build, total: int, concurrency: int, warmup: int = 2):
+    local = threading.local()
+
+    def call(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, kwargs = build(i)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=120, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(call, range(-warmup, 0)))
+        start = time.perf_counter()
+        outcomes = list(executor.map(call, range(total)))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(seconds for seconds, ok in outcomes if ok)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+def compare(results, baseline, threshold: float, min_delta_ms: float):
+    """Rows of (key, metric, old, new, change) and whether any is a regression"""
+    rows, regressed = [], False
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            old, new = previous[metric], current[metric]
+            change = (new - old) / old if old else 0.0
+            slower = change > threshold and new - old > min_delta_ms
+            regressed = regressed or slower
+            rows.append((key, metric, old, new, change, slower))
+        if current["errors"] > previous["errors"]:
+            regressed = True
+            rows.append((key, "errors", previous["errors"], current["errors"], 0.0, True))
+    return rows, regressed
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EchoIDE backend benchmark suite")
+    parser.add_argument("--scenarios", default="chat,complete,analyze,file_list,file_read,file_write,project_open,execute")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=48, help="requests per scenario and concurrency level")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="fake model seconds per token")
+    parser.add_argument("--parallel", type=int, default=4, help="fake model concurrent generations")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also write results/baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix="echoide-bench-")
+    fake = FakeOllama(token_latency=args.token_latency, parallel=args.parallel).start()
+    port = free_port()
+    backend = start_backend(home, fake.url, port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        catalogue = scenarios(make_project(home))
+        names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        unknown = [name for name in names if name not in catalogue]
+        if unknown:
+            parser.error(f"unknown scenarios {unknown}; choose from {sorted(catalogue)}")
+
+        results = {}
+        for name in names:
+            for concurrency in (int(level) for level in args.concurrency.split(",")):
+                total = max(args.requests, concurrency * 2)
+                result = run_scenario(base_url, catalogue[name], total, concurrency)
+                results[f"{name}/c{concurrency}"] = result
+                print(f"{name:<13} c={concurrency:<3} {result['throughput_rps']:8.1f} req/s  "
+                      f"p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+                      f"p99 {result['p99_ms']:9.2f} ms  errors {result['errors']}", flush=True)
+    finally:
+        backend.terminate()
+        backend.wait(timeout=30)
+        fake.stop()
+        shutil.rmtree(home, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "save_baseline")},
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    outputs = [args.output] + ([os.path.join(RESULTS_DIR, "baseline.json")] if args.save_baseline else [])
+    for path in outputs:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+        print(f"wrote {path}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    rows, regressed = compare(results, baseline["results"], args.threshold, args.min_delta_ms)
+    print(f"\ncompared with {args.baseline} ({baseline['meta'].get('git_revision') or 'unknown revision'})")
+    for key, metric, old, new, change, slower in rows:
+        flag = "  REGRESSION" if slower else ""
+        print(f"{key:<20} {metric:<7} {old:10.2f} -> {new:10.2f}  {change * 100:+7.1f}%{flag}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,27 @@
 # backend/main.py - Complete version with execute endpoint
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Set
 import os
-import json
+import asyncio
+import logging
 from datetime import datetime
 import subprocess
 import time
 from pathlib import Path
 
-from app.services.ai_services import AIService
-from app.services.file_service import FileService
-from app.services.project_service import ProjectService
+from app.services.io_executor import IOExecutor
+from app.services.lazy import LazyService, Readiness
+from app.services.metrics import REGISTRY, MetricsMiddleware
+from app.services.profiler import ProfilingMiddleware, RequestProfiler
+from app.services.http_encoding import CompressionMiddleware, FastJSONResponse, json_dumps
+
+logger = logging.getLogger("echoide")
 
 # Initialize FastAPI app
-app = FastAPI(title="EchoIDE Backend", version="1.0.0")
+app = FastAPI(title="EchoIDE Backend", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Enable CORS for frontend communication
 app.add_middleware(
@@ -26,10 +32,125 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-ai_service = AIService()
-file_service = FileService()
-project_service = ProjectService()
+# zstd/br/gzip for complete bodies above the threshold; ECHOIDE_COMPRESSION=0 turns it off
+if os.environ.get("ECHOIDE_COMPRESSION", "1") != "0":
+    app.add_middleware(CompressionMiddleware,
+                       minimum_size=int(os.environ.get("ECHOIDE_COMPRESSION_MIN_SIZE", "1024")))
+app.add_middleware(MetricsMiddleware)
+
+# Per-request profiles: send `X-EchoIDE-Profile: 1`, or set ECHOIDE_PROFILE_SAMPLE_RATE
+profiler = RequestProfiler.from_env()
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Worker processes (ECHOIDE_WORKERS > 1) keep sessions, added workspaces and file changes in SQLite
+WORKERS = int(os.environ.get("ECHOIDE_WORKERS", "1"))
+
+def _shared_state():
+    from app.services.shared_state import SharedState
+    return SharedState()
+
+def _change_feed():
+    from app.services.shared_state import ChangeFeed
+    return ChangeFeed(shared_state)
+
+# Initialize services. Each is built (and its module imported) on first use, or by the
+# warm-up that starts once the server is listening; /api/ready reports when that is done.
+def _file_service():
+    from app.services.file_service import FileService
+    return FileService(shared_state, local_history, git_status_service)
+
+def _local_history():
+    from app.services.local_history import LocalHistory
+    return LocalHistory.from_env()
+
+def _git_status_service():
+    from app.services.git_status import GitStatusService
+    return GitStatusService.from_env()
+
+def _llm_pool():
+    from app.services.llm_router import BackendPool
+    pool = BackendPool.from_env()
+    pool.start()  # Background health checks
+    return pool
+
+def _prompt_registry():
+    from app.services.prompt_registry import PromptRegistry
+    return PromptRegistry()  # Validates every template; a broken one keeps the backend unready
+
+def _retrieval_service():
+    from app.services.retrieval_service import RetrievalService
+    return RetrievalService(file_service, llm_pool)
+
+def _ai_service():
+    from app.services.ai_services import AIService
+    from app.services.shared_state import SharedSessionStore
+    sessions = SharedSessionStore(shared_state) if shared_state is not None else None
+    return AIService(retriever=retrieval_service, pool=llm_pool, prompts=prompt_registry, sessions=sessions)
+
+def _project_service():
+    from app.services.project_service import ProjectService
+    return ProjectService()
+
+def _search_service():
+    from app.services.search_service import SearchService
+    return SearchService(file_service)
+
+def _path_finder_service():
+    from app.services.path_finder import PathFinderService
+    return PathFinderService(project_service)
+
+def _symbol_service():
+    from app.services.symbol_service import SymbolService
+    return SymbolService(file_service)
+
+def _kernel_service():
+    from app.services.kernel_service import KernelService
+    service = KernelService.from_env()
+    service.start()  # Idle and memory eviction
+    return service
+
+def _test_service():
+    from app.services.test_service import TestService
+    return TestService.from_env(symbol_service)
+
+def _diagnostics_service():
+    from app.services.diagnostics_service import DiagnosticsService
+    return DiagnosticsService(debounce=float(os.environ.get("ECHOIDE_DIAGNOSTICS_DEBOUNCE", "0.25")))
+
+def _batch_analysis_service():
+    from app.services.batch_analysis import BatchAnalysisService
+    return BatchAnalysisService.from_env(ai_service, file_service.skip_directories)
+
+def _speculation_engine():
+    from app.services.speculative_completion import SpeculativeCompletionEngine
+    return SpeculativeCompletionEngine(ai_service.complete_code)
+
+io_executor = IOExecutor()
+# A cell can run for up to an hour; one worker per kernel, and none taken from file operations
+io_executor.dedicate("kernel", int(os.environ.get("ECHOIDE_KERNEL_MAX", "8")), ["kernel_start", "kernel_execute"])
+# Programs run for up to 75 s each; at most ECHOIDE_EXECUTE_WORKERS at once, the rest wait their turn
+io_executor.dedicate("execute", int(os.environ.get("ECHOIDE_EXECUTE_WORKERS", "4")), ["execute_file"])
+shared_state = LazyService("shared_state", _shared_state) if WORKERS > 1 else None
+change_feed = LazyService("change_feed", _change_feed) if WORKERS > 1 else None
+file_service = LazyService("file", _file_service)
+llm_pool = LazyService("llm_pool", _llm_pool)
+prompt_registry = LazyService("prompts", _prompt_registry)
+retrieval_service = LazyService("retrieval", _retrieval_service)
+ai_service = LazyService("ai", _ai_service)
+project_service = LazyService("project", _project_service)
+search_service = LazyService("search", _search_service)
+path_finder_service = LazyService("path_finder", _path_finder_service)
+symbol_service = LazyService("symbols", _symbol_service)
+speculation_engine = LazyService("speculation", _speculation_engine)
+# Not warmed up: kernel processes only start when someone runs a cell
+kernel_service = LazyService("kernels", _kernel_service)
+test_service = LazyService("tests", _test_service)
+diagnostics_service = LazyService("diagnostics", _diagnostics_service)
+batch_analysis_service = LazyService("batch_analysis", _batch_analysis_service)
+local_history = LazyService("history", _local_history)  # Opened on the first save
+git_status_service = LazyService("git_status", _git_status_service)
+readiness = Readiness(([shared_state, change_feed] if WORKERS > 1 else []) + [file_service, project_service, llm_pool, prompt_registry, retrieval_service,
+                       ai_service, speculation_engine, search_service, path_finder_service, symbol_service])
 
 # Pydantic models
 class ChatRequest(BaseModel):
@@ -38,16 +159,41 @@ class ChatRequest(BaseModel):
     language: Optional[str] = "python"
     context: Optional[str] = ""
     session_id: Optional[str] = "default"
+    project_path: Optional[str] = None  # Enables retrieval of related project code
+    stable_prefix: Optional[bool] = True  # Append-only prompts Ollama can answer from its KV cache
 
 class CodeAnalysisRequest(BaseModel):
     code: str
     language: str
     analysis_type: str  # "explain", "debug", "optimize", "review"
+    local_first: Optional[bool] = True  # "debug": report local diagnostics instead of asking the model
+
+class AnalysisJobRequest(BaseModel):
+    project_path: str
+    analysis_type: str  # "explain", "debug", "optimize", "review"
+    paths: Optional[List[str]] = None  # Only these files (relative to the project); every source file when omitted
+    stream: bool = True  # Stream the job's events; otherwise return its id and state right away
+
+class DiagnosticsRequest(BaseModel):
+    path: str
+    content: Optional[str] = None  # Unsaved buffer; the file on disk when omitted
+    wait: Optional[bool] = False  # Check now and return the result instead of debouncing
 
 class CodeCompletionRequest(BaseModel):
     code: str
     cursor_position: int
     language: str
+    project_path: Optional[str] = None
+    document_id: Optional[str] = None  # With version, lets prefetched completions be reused
+    version: Optional[int] = None
+
+class DocumentChangeRequest(BaseModel):
+    document_id: str
+    version: int
+    code: str
+    cursor_position: int
+    language: str
+    project_path: Optional[str] = None
 
 class FileContent(BaseModel):
     path: str
@@ -58,24 +204,55 @@ class ExecuteRequest(BaseModel):
     filename: str
     workspace: str
 
+class TestRunRequest(BaseModel):
+    project_path: str
+    mode: Optional[str] = "affected"  # "affected": only tests whose inputs changed; "all": everything
+    paths: Optional[List[str]] = None  # Run just these test files
+
+class KernelExecuteRequest(BaseModel):
+    workspace: str
+    code: str
+    filename: Optional[str] = None  # Shown in tracebacks; the buffer's file when running part of it
+    cell: Optional[int] = None  # Run only this `# %%` cell of code
+    start_line: Optional[int] = None  # Or only these lines (1-based, inclusive)
+    end_line: Optional[int] = None
+    stream: bool = True
+
 # AI Endpoints
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
     try:
+        if request.project_path and not await io_executor.run(file_service.is_path_allowed, request.project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        usage = {}
         response = await ai_service.chat(
             request.message, 
             request.model, 
             request.language, 
             request.context, 
-            request.session_id
+            request.session_id,
+            request.project_path,
+            stable_prefix=request.stable_prefix,
+            usage=usage
         )
-        return {"response": response}
+        return {"response": response, "usage": usage}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/code/analyze")
 async def analyze_code(request: CodeAnalysisRequest):
     try:
+        if request.analysis_type == "debug" and request.local_first:
+            # Syntax errors and undefined names need no model; it is only asked when none are found
+            diagnostics = await io_executor.run(diagnostics_service.check_text, request.language.lower(),
+                                                request.code, op="diagnostics")
+            errors = [d for d in diagnostics if d["severity"] == "error"]
+            if errors:
+                analysis = "Found by local checks:\n" + "\n".join(
+                    f"- Line {d['line']}: {d['message']}" for d in errors)
+                return {"analysis": analysis, "diagnostics": diagnostics, "local": True}
         analysis = await ai_service.analyze_code(
             request.code, 
             request.language, 
@@ -85,39 +262,177 @@ async def analyze_code(request: CodeAnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch analysis: one job analyses every file of a project (map) and summarises the results
+# (reduce). Jobs run in the background; a client that disconnects can re-attach to the events.
+def _analysis_job_response(job, stream: bool):
+    if not stream:
+        return dict(job.meta)
+    # The job's state, a "plan", one "file" object per file as it finishes, a "summary" and "done"
+    async def events():
+        async for event in batch_analysis_service.events(job.meta["id"]):
+            yield json_dumps(event) + b"\n"
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/analysis/jobs")
+async def start_analysis_job(request: AnalysisJobRequest):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, request.project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        job = batch_analysis_service.start(request.project_path, request.analysis_type, request.paths)
+        return _analysis_job_response(job, request.stream)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/analysis/jobs")
+async def list_analysis_jobs():
+    return {"jobs": await io_executor.run(batch_analysis_service.list_jobs)}
+
+@app.get("/api/analysis/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """State, per-file results and summary of a job, running or finished"""
+    try:
+        return await io_executor.run(batch_analysis_service.get_job, job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Analysis job not found: {job_id}")
+
+@app.get("/api/analysis/jobs/{job_id}/events")
+async def analysis_job_events(job_id: str):
+    """Everything the job reported so far, then its new events until it finishes"""
+    try:
+        await io_executor.run(batch_analysis_service.get_job, job_id)  # 404 now rather than an empty stream
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Analysis job not found: {job_id}")
+    return StreamingResponse((json_dumps(event) + b"\n" async for event in batch_analysis_service.events(job_id)),
+                             media_type="application/x-ndjson")
+
+@app.post("/api/analysis/jobs/{job_id}/resume")
+async def resume_analysis_job(job_id: str, stream: bool = True):
+    """Run an interrupted job again; files analysed before its interruption are not sent to the model"""
+    try:
+        return _analysis_job_response(batch_analysis_service.resume(job_id), stream)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Analysis job not found: {job_id}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/analysis/jobs/{job_id}/cancel")
+async def cancel_analysis_job(job_id: str):
+    return {"cancelled": batch_analysis_service.cancel(job_id)}
+
+@app.delete("/api/analysis/jobs/{job_id}")
+async def delete_analysis_job(job_id: str):
+    try:
+        return {"deleted": await io_executor.run(batch_analysis_service.delete, job_id)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/code/complete")
 async def complete_code(request: CodeCompletionRequest):
+    if request.project_path and not await io_executor.run(file_service.is_path_allowed, request.project_path):
+        raise HTTPException(status_code=403, detail="Access denied to project")
+    cached = speculation_engine.lookup(request.document_id, request.version, request.cursor_position)
+    if cached is not None:
+        return {"completion": cached, "cached": True}
     try:
-        completion = await ai_service.complete_code(
-            request.code, 
-            request.cursor_position, 
-            request.language
-        )
+        async with speculation_engine.foreground():
+            completion = await ai_service.complete_code(
+                request.code, 
+                request.cursor_position, 
+                request.language,
+                request.project_path
+            )
         return {"completion": completion}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/code/document-change")
+async def document_change(request: DocumentChangeRequest):
+    """Editor edit notification; may start a speculative completion when idle"""
+    if request.project_path and not await io_executor.run(file_service.is_path_allowed, request.project_path):
+        raise HTTPException(status_code=403, detail="Access denied to project")
+    scheduled = speculation_engine.note_edit(
+        request.document_id,
+        request.version,
+        request.code,
+        request.cursor_position,
+        request.language,
+        request.project_path
+    )
+    return {"scheduled": scheduled}
+
+@app.get("/api/code/speculation/stats")
+async def speculation_stats():
+    return speculation_engine.get_stats()
+
+# Work a request starts but does not wait for; referenced here so it is not garbage-collected mid-flight
+_background_tasks: Set[asyncio.Task] = set()
+
+def start_background(coroutine, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coroutine, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+def _background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed: %s", task.get_name(), task.exception())
+
+async def notify_file_changed(path: str, kind: str, record: bool = True):
+    """Bring this worker's indexes up to date after a write or delete, and log it for the other workers"""
+    if kind == "delete":
+        await io_executor.run(search_service.notify_deleted, path)
+        path_finder_service.notify_deleted(path)
+    else:
+        await io_executor.run(search_service.notify_changed, path)
+        path_finder_service.notify_changed(path)
+    await io_executor.run(symbol_service.notify_changed, path)
+    if diagnostics_service.initialized:  # Only once an editor has asked for diagnostics
+        if kind == "delete":
+            diagnostics_service.forget(path)
+        else:
+            diagnostics_service.submit(path)
+    if git_status_service.initialized:
+        git_status_service.notify_changed(path)
+    if retrieval_service.initialized:
+        retrieval_service.notify_changed(path)
+    if record and shared_state is not None:
+        await io_executor.run(shared_state.record_change, path, kind)
+
+async def sync_shared_changes():
+    """Replay writes and deletes other workers made before answering from in-memory indexes"""
+    if change_feed is None:
+        return
+    for path, kind in await io_executor.run(change_feed.poll):
+        await notify_file_changed(path, kind, record=False)
+
 # File Management Endpoints
 @app.get("/api/files/list")
 async def list_files(path: str = "."):
     try:
-        files = file_service.list_directory(path)
-        return {"files": files, "current_path": path}
+        files = await io_executor.run(file_service.list_directory, path)
+        return FastJSONResponse({"files": files, "current_path": path})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/files/read")
 async def read_file(path: str):
     try:
-        content = file_service.read_file(path)
-        return {"content": content, "path": path}
+        content = await io_executor.run(file_service.read_file, path)
+        return FastJSONResponse({"content": content, "path": path})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/files/write")
 async def write_file(file_content: FileContent):
     try:
-        success = file_service.write_file(file_content.path, file_content.content)
+        success = await io_executor.run(file_service.write_file, file_content.path, file_content.content)
+        await notify_file_changed(file_content.path, "write")
         return {"success": success, "message": f"File saved: {file_content.path}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -125,15 +440,89 @@ async def write_file(file_content: FileContent):
 @app.delete("/api/files/delete")
 async def delete_file(path: str):
     try:
-        success = file_service.delete_file(path)
+        success = await io_executor.run(file_service.delete_file, path)
+        await notify_file_changed(path, "delete")
         return {"success": success, "message": f"File deleted: {path}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Local history: versions kept by every save and delete
+@app.get("/api/history/stats")
+async def history_stats():
+    return await io_executor.run(local_history.get_stats)
+
+@app.post("/api/history/prune")
+async def prune_history():
+    """Apply the retention limits now (otherwise done every few hundred saves)"""
+    return await io_executor.run(local_history.prune)
+
+async def _history_version(version_id: int):
+    """(path, content) of a version the caller may read"""
+    try:
+        path, data = await io_executor.run(local_history.get_version, version_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Version not found")
+    if not await io_executor.run(file_service.is_path_allowed, path):
+        raise HTTPException(status_code=403, detail="Access denied to path")
+    return path, data
+
+@app.get("/api/history")
+async def list_history(path: str):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, path):
+            raise HTTPException(status_code=403, detail="Access denied to path")
+        versions = await io_executor.run(local_history.list_versions, path)
+        return {"path": os.path.realpath(path), "versions": versions}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/history/{version_id}")
+async def get_history_version(version_id: int):
+    path, data = await _history_version(version_id)
+    return FastJSONResponse({"id": version_id, "path": path, "content": data.decode("utf-8", errors="replace")})
+
+@app.get("/api/history/{version_id}/diff")
+async def diff_history_version(version_id: int, against: Optional[int] = None):
+    """Unified diff from a version to `against` (another version of the file) or to the file on disk"""
+    await _history_version(version_id)
+    try:
+        if against is not None:
+            await _history_version(against)
+        diff = await io_executor.run(local_history.diff, version_id, against)
+        return FastJSONResponse({"id": version_id, "against": against, "diff": diff})
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+@app.post("/api/history/{version_id}/restore")
+async def restore_history_version(version_id: int):
+    """Write a version back to its file; that is recorded as a new version, so it can be undone too"""
+    path, data = await _history_version(version_id)
+    try:
+        await io_executor.run(file_service.write_bytes, path, data, "restore")
+        await notify_file_changed(path, "write")
+        return {"success": True, "path": path, "message": f"Restored version {version_id} of {path}"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Git status of opened projects; listings carry it as "git_status" on changed entries
+@app.get("/api/git/status")
+async def get_git_status(project_path: str):
+    """Changed paths of the project's repository, relative to its root; waits for the first scan"""
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        return FastJSONResponse(await io_executor.run(git_status_service.status, project_path))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/files/info")
 async def get_file_info(path: str):
     try:
-        info = file_service.get_file_info(path)
+        info = await io_executor.run(file_service.get_file_info, path)
         return info
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -145,7 +534,7 @@ async def create_directory(request: dict):
         if not path:
             raise HTTPException(status_code=400, detail="Path is required")
         
-        success = file_service.create_directory(path)
+        success = await io_executor.run(file_service.create_directory, path)
         return {"success": success, "message": f"Directory created: {path}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -153,7 +542,7 @@ async def create_directory(request: dict):
 @app.get("/api/files/allowed-paths")
 async def get_allowed_paths():
     try:
-        paths = file_service.get_allowed_paths()
+        paths = await io_executor.run(file_service.get_allowed_paths)  # May poll the shared state
         return {"allowed_paths": paths}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -165,7 +554,7 @@ async def add_workspace(request: dict):
         if not path:
             raise HTTPException(status_code=400, detail="Workspace path is required")
         
-        success = file_service.add_allowed_path(path)
+        success = await io_executor.run(file_service.add_allowed_path, path)
         if success:
             return {"success": True, "message": f"Workspace added: {path}"}
         else:
@@ -185,17 +574,22 @@ async def execute_code(request: ExecuteRequest):
             raise HTTPException(status_code=400, detail="Executor and filename required")
         
         # Security check
-        if not file_service.is_path_allowed(workspace):
+        if not await io_executor.run(file_service.is_path_allowed, workspace):
             raise HTTPException(status_code=403, detail="Access denied to workspace")
         
         file_path = os.path.join(workspace, filename)
-        
+
+        # The filename may contain '..' or be a symlink pointing out of the workspace
+        if not await io_executor.run(file_service.is_path_allowed, file_path):
+            raise HTTPException(status_code=403, detail="Access denied to file")
+
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail=f"File not found: {filename}")
         
         start_time = time.time()
-        result = await execute_file(executor, file_path, workspace)
+        result = await io_executor.run(execute_file, executor, file_path, workspace)
         execution_time = round(time.time() - start_time, 3)
+        _EXECUTIONS.labels(executor if executor in _EXECUTORS else "other", _execution_outcome(result)).inc()
         
         result["execution_time"] = execution_time
         return result
@@ -203,42 +597,250 @@ async def execute_code(request: ExecuteRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def execute_file(executor: str, file_path: str, workspace: str):
+# Diagnostics Endpoints
+@app.post("/api/diagnostics/check")
+async def check_diagnostics(request: DiagnosticsRequest):
+    """Queue a check of an edited buffer (debounced; results arrive on the stream), or run it now with wait"""
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, request.path):
+            raise HTTPException(status_code=403, detail="Access denied to path")
+
+        if request.wait:
+            return await io_executor.run(diagnostics_service.check, request.path, request.content, op="diagnostics")
+        return {"scheduled": True, "version": diagnostics_service.submit(request.path, request.content)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/diagnostics")
+async def get_diagnostics(path: str):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, path):
+            raise HTTPException(status_code=403, detail="Access denied to path")
+
+        event = diagnostics_service.latest.get(os.path.realpath(path))
+        if event is None:
+            event = await io_executor.run(diagnostics_service.check, path, op="diagnostics")
+        return event
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/diagnostics/stream")
+async def diagnostics_stream(project_path: Optional[str] = None):
+    """Server-sent events: a `diagnostics` event per checked file, starting with the current state"""
+    if project_path and not await io_executor.run(file_service.is_path_allowed, project_path):
+        raise HTTPException(status_code=403, detail="Access denied to project")
+
+    subscription = diagnostics_service.subscribe(asyncio.get_running_loop(), project_path)
+    # With several workers, saves handled by the others reach this one through the change feed
+    poll = 1.0 if change_feed is not None else 15.0
+
+    async def events():
+        try:
+            for event in diagnostics_service.snapshot(project_path):
+                yield b"event: diagnostics\ndata: " + json_dumps(event) + b"\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=poll)
+                except asyncio.TimeoutError:
+                    await sync_shared_changes()
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"event: diagnostics\ndata: " + json_dumps(event) + b"\n\n"
+        finally:
+            diagnostics_service.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/diagnostics/stats")
+async def diagnostics_stats():
+    return diagnostics_service.get_stats()
+
+# Test Endpoints
+@app.get("/api/tests/discover")
+async def discover_tests(project_path: str):
+    """Test files with their framework, dependency count and whether their inputs changed since the last run"""
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        return await io_executor.run(test_service.discover, project_path, op="index_project")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/tests/run")
+async def run_tests(request: TestRunRequest):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, request.project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        if request.mode not in ("affected", "all"):
+            raise HTTPException(status_code=400, detail=f"Unknown mode: {request.mode}")
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        # Build or load the symbol index up front so errors surface before streaming starts
+        await io_executor.run(symbol_service.get_index, request.project_path, op="index_project")
+
+        # A "plan", then one "file" object per test file as its shard finishes, then a "summary"
+        return StreamingResponse(
+            (json_dumps(event) + b"\n" for event in
+             test_service.run(request.project_path, request.mode, request.paths)),
+            media_type="application/x-ndjson"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/tests/results")
+async def last_test_results(project_path: str):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        return await io_executor.run(test_service.last_results, project_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Persistent Python kernels: one long-lived process per workspace keeps the namespace
+# between runs, so re-running the last step does not re-run everything before it.
+# With ECHOIDE_WORKERS > 1 each worker has its own kernels.
+@app.post("/api/kernel/start")
+async def start_kernel(request: dict):
+    try:
+        workspace = request.get("workspace")
+        if not workspace:
+            raise HTTPException(status_code=400, detail="Workspace is required")
+        if not await io_executor.run(file_service.is_path_allowed, workspace):
+            raise HTTPException(status_code=403, detail="Access denied to workspace")
+
+        kernel = await io_executor.run(kernel_service.get_or_start, workspace, op="kernel_start")
+        return kernel.info()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/kernel/execute")
+async def kernel_execute(request: KernelExecuteRequest):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, request.workspace):
+            raise HTTPException(status_code=403, detail="Access denied to workspace")
+        from app.services.kernel_service import select_code
+        code = select_code(request.code, request.cell, request.start_line, request.end_line)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if not request.stream:
+            return await io_executor.run(kernel_service.run, request.workspace, code, request.filename,
+                                         op="kernel_execute")
+        # Start the kernel before streaming so a failure is an HTTP error, not a broken stream
+        await io_executor.run(kernel_service.get_or_start, request.workspace, op="kernel_start")
+        # Output streams as newline-delimited JSON messages, ending with a "done" message
+        return StreamingResponse(
+            (json_dumps(message) + b"\n" for message in
+             kernel_service.execute(request.workspace, code, request.filename)),
+            media_type="application/x-ndjson"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/kernel")
+async def list_kernels():
+    return {"kernels": kernel_service.list_kernels() if kernel_service.initialized else []}
+
+@app.post("/api/kernel/{kernel_id}/interrupt")
+async def interrupt_kernel(kernel_id: str):
+    try:
+        return {"interrupted": kernel_service.interrupt(kernel_id)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@app.post("/api/kernel/{kernel_id}/restart")
+async def restart_kernel(kernel_id: str):
+    try:
+        return await io_executor.run(kernel_service.restart, kernel_id, op="kernel_start")
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/kernel/{kernel_id}")
+async def shutdown_kernel(kernel_id: str):
+    try:
+        await io_executor.run(kernel_service.shutdown_kernel, kernel_id)
+        return {"success": True}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+_EXEC_COMPILE = REGISTRY.histogram("echoide_execution_compile_seconds", "Compile step of /api/execute",
+                                   ["executor"])
+_EXEC_RUN = REGISTRY.histogram("echoide_execution_run_seconds", "Program run time in /api/execute", ["executor"])
+_EXECUTIONS = REGISTRY.counter("echoide_executions_total", "/api/execute runs by outcome", ["executor", "outcome"])
+_EXECUTORS = {"python", "node", "java", "g++", "gcc"}  # Anything else is labelled "other"
+
+def _execution_outcome(result: dict) -> str:
+    if result.get("success"):
+        return "ok"
+    error = result.get("error") or ""
+    if error == "Compilation failed":
+        return "compile_error"
+    if error.startswith("Execution timeout"):
+        return "timeout"
+    return "error" if error else "nonzero_exit"
+
+def execute_file(executor: str, file_path: str, workspace: str):
     """Execute file based on executor type"""
     
     try:
         if executor == "python":
             # Execute Python file
-            process = subprocess.run(
-                ["python", file_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30  # 30 second timeout
-            )
+            with _EXEC_RUN.labels(executor).time():
+                process = subprocess.run(
+                    ["python", file_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30  # 30 second timeout
+                )
             
         elif executor == "node":
             # Execute JavaScript file
-            process = subprocess.run(
-                ["node", file_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_RUN.labels(executor).time():
+                process = subprocess.run(
+                    ["node", file_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
         elif executor == "java":
             # Compile and execute Java file
             class_name = Path(file_path).stem
             
             # Compile first
-            compile_process = subprocess.run(
-                ["javac", file_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_COMPILE.labels(executor).time():
+                compile_process = subprocess.run(
+                    ["javac", file_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
             if compile_process.returncode != 0:
                 return {
@@ -250,13 +852,14 @@ async def execute_file(executor: str, file_path: str, workspace: str):
                 }
             
             # Execute compiled class
-            process = subprocess.run(
-                ["java", class_name],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_RUN.labels(executor).time():
+                process = subprocess.run(
+                    ["java", class_name],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
         elif executor == "g++":
             # Compile and execute C++ file
@@ -267,13 +870,14 @@ async def execute_file(executor: str, file_path: str, workspace: str):
                 executable_path = os.path.join(workspace, executable_name)
             
             # Compile first
-            compile_process = subprocess.run(
-                ["g++", file_path, "-o", executable_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_COMPILE.labels(executor).time():
+                compile_process = subprocess.run(
+                    ["g++", file_path, "-o", executable_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
             if compile_process.returncode != 0:
                 return {
@@ -285,13 +889,14 @@ async def execute_file(executor: str, file_path: str, workspace: str):
                 }
             
             # Execute compiled binary
-            process = subprocess.run(
-                [executable_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_RUN.labels(executor).time():
+                process = subprocess.run(
+                    [executable_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
         elif executor == "gcc":
             # Similar to g++ but for C files
@@ -301,13 +906,14 @@ async def execute_file(executor: str, file_path: str, workspace: str):
             else:  # Linux/Mac
                 executable_path = os.path.join(workspace, executable_name)
             
-            compile_process = subprocess.run(
-                ["gcc", file_path, "-o", executable_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_COMPILE.labels(executor).time():
+                compile_process = subprocess.run(
+                    ["gcc", file_path, "-o", executable_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
             if compile_process.returncode != 0:
                 return {
@@ -318,13 +924,14 @@ async def execute_file(executor: str, file_path: str, workspace: str):
                     "error": "Compilation failed"
                 }
             
-            process = subprocess.run(
-                [executable_path],
-                capture_output=True,
-                text=True,
-                cwd=workspace,
-                timeout=30
-            )
+            with _EXEC_RUN.labels(executor).time():
+                process = subprocess.run(
+                    [executable_path],
+                    capture_output=True,
+                    text=True,
+                    cwd=workspace,
+                    timeout=30
+                )
             
         else:
             return {
@@ -362,25 +969,267 @@ async def open_project(request: dict):
         project_path = request.get("project_path")
         if not project_path:
             raise HTTPException(status_code=400, detail="Project path is required")
+        # Opening indexes the whole tree; only workspaces that were added may be opened
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
         
-        success = project_service.open_project(project_path)
+        success = await io_executor.run(project_service.open_project, project_path)
+
+        # Warm the search, file-finder and symbol indexes in the background; a failed build
+        # is logged and not kept, so the first request that needs it builds it again
+        start_background(io_executor.run(search_service.get_index, project_path, op="index_project"),
+                         f"search index of {project_path}")
+        start_background(io_executor.run(path_finder_service.build_index, project_path, op="index_project"),
+                         f"path index of {project_path}")
+        start_background(io_executor.run(symbol_service.get_index, project_path, op="index_project"),
+                         f"symbol index of {project_path}")
+        await io_executor.run(git_status_service.track, project_path)  # Scans in its own thread
         return {"success": success, "message": f"Project opened: {project_path}"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/project/structure")
 async def get_project_structure(project_path: str):
     try:
-        structure = project_service.get_project_structure(project_path)
-        return {"structure": structure}
+        structure = await io_executor.run(project_service.get_project_structure, project_path)
+        return FastJSONResponse({"structure": structure})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/project/find-file")
+async def find_file(project_path: str, query: str, limit: int = 20):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        # Only the first query for a project pays for the scan; later ones hit the cached index
+        if path_finder_service.indexes.get(os.path.abspath(project_path)) is None:
+            await io_executor.run(path_finder_service.build_index, project_path, op="index_project")
+        results = await io_executor.run(path_finder_service.find, project_path, query, limit)
+        return FastJSONResponse({"results": results, "query": query})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Symbol Endpoints
+@app.get("/api/symbols/outline")
+async def get_outline(path: str):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, path):
+            raise HTTPException(status_code=403, detail="Access denied to path")
+
+        symbols = await io_executor.run(symbol_service.get_outline, path)
+        return FastJSONResponse({"symbols": symbols, "path": path})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/symbols/workspace")
+async def get_workspace_symbols(project_path: str, query: str = "", limit: int = 50):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        symbols = await io_executor.run(symbol_service.workspace_symbols, project_path, query, limit,
+                                        op="index_project")
+        return FastJSONResponse({"symbols": symbols, "query": query})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/symbols/definition")
+async def find_definition(project_path: str, name: Optional[str] = None, path: Optional[str] = None,
+                          line: Optional[int] = None, column: Optional[int] = None):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        if not name and not (path and line):
+            raise HTTPException(status_code=400, detail="Either name or path and line are required")
+        if path and not await io_executor.run(file_service.is_path_allowed, path):
+            raise HTTPException(status_code=403, detail="Access denied to path")
+
+        definitions = await io_executor.run(symbol_service.find_definition, project_path, name, path,
+                                            line, column, op="index_project")
+        return {"definitions": definitions}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Retrieval Endpoints
+@app.post("/api/retrieval/index")
+async def build_retrieval_index(request: dict):
+    try:
+        project_path = request.get("project_path")
+        if not project_path:
+            raise HTTPException(status_code=400, detail="Project path is required")
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        stats = await io_executor.run(retrieval_service.refresh_project, project_path, op="index_project")
+        return {"success": True, "index": stats}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/retrieval/search")
+async def retrieval_search(project_path: str, query: str, k: int = 5):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        results = await io_executor.run(retrieval_service.search, project_path, query, k, op="retrieval_search")
+        return {"results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Search Endpoints
+@app.post("/api/search/index")
+async def index_project(request: dict):
+    try:
+        project_path = request.get("project_path")
+        if not project_path:
+            raise HTTPException(status_code=400, detail="Project path is required")
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+
+        stats = await io_executor.run(search_service.refresh_project, project_path)
+        return {"success": True, "index": stats}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/search")
+async def search_workspace(project_path: str, query: str, regex: bool = False,
+                           case_sensitive: bool = False, max_results: int = 500):
+    try:
+        if not await io_executor.run(file_service.is_path_allowed, project_path):
+            raise HTTPException(status_code=403, detail="Access denied to project")
+        try:
+            search_service.compile_query(query, regex, case_sensitive)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        await sync_shared_changes()  # Writes made through other workers
+
+        # Build or load the index and rank candidates up front, so errors surface before streaming starts
+        results = await io_executor.run(search_service.search, project_path, query, regex, case_sensitive,
+                                        max_results, op="index_project")
+
+        # Results stream as newline-delimited JSON, one object per matching file
+        return StreamingResponse(
+            (json_dumps(result) + b"\n" for result in results),
+            media_type="application/x-ndjson"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/io/stats")
+async def get_io_stats():
+    return io_executor.get_stats()
+
+@app.on_event("startup")
+async def warm_up_services():
+    # Not awaited: the server starts answering (and /api/health passes) right away
+    app.state.warm_up = asyncio.create_task(asyncio.to_thread(readiness.warm_up))
+
+@app.on_event("shutdown")
+async def shutdown_io_executor():
+    # Services never used are not built just to shut them down
+    if search_service.initialized:
+        search_service.save_all()
+    if symbol_service.initialized:
+        symbol_service.shutdown()
+    if llm_pool.initialized:
+        llm_pool.stop()
+    if kernel_service.initialized:
+        kernel_service.shutdown()
+    if diagnostics_service.initialized:
+        diagnostics_service.shutdown()
+    if batch_analysis_service.initialized:
+        await batch_analysis_service.shutdown()  # Running jobs stay resumable
+    if git_status_service.initialized:
+        git_status_service.shutdown()
+    if retrieval_service.initialized:
+        retrieval_service.shutdown()
+    if ai_service.initialized:
+        ai_service.compactor.shutdown()  # Unfinished summaries are redone on a later turn
+    io_executor.shutdown()
+
+@app.get("/api/ai/prompts")
+async def list_prompts():
+    return {"templates": prompt_registry.list_templates()}
+
+@app.post("/api/ai/prompts/reload")
+async def reload_prompts():
+    """Re-read template files after editing them; the old set stays active if any is invalid"""
+    try:
+        prompt_registry.load()
+        return {"templates": prompt_registry.list_templates()}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/chat/history/stats")
+async def chat_history_stats():
+    """Background summarisation of long chat sessions (see HistoryCompactor)"""
+    return ai_service.compactor.get_stats()
+
+@app.get("/api/ai/backends")
+async def ai_backends():
+    """Health, loaded models, load and latency histogram of each Ollama backend"""
+    return llm_pool.get_stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of the request, LLM, I/O pool and execution metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/debug/profiles")
+async def list_profiles():
+    """Summaries (wall/CPU split, hottest frames) of the most recent request profiles"""
+    return {"sample_rate": profiler.sample_rate, "profiles": profiler.list_profiles()}
+
+@app.get("/api/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "collapsed"):
+    """One profile as collapsed stacks (flamegraph.pl, speedscope, inferno) or a JSON summary"""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    if format == "json":
+        return {**profile.summary(top=25), "stacks": dict(profile.stacks)}
+    return PlainTextResponse(
+        profile.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="echoide-{profile_id}.folded"'},
+    )
+
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/ready")
+async def ready_check():
+    """200 once every service is built; 503 while warming up or if one failed to build"""
+    return FastJSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -388,4 +1237,18 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    host = os.environ.get("ECHOIDE_HOST", "127.0.0.1")
+    port = int(os.environ.get("ECHOIDE_PORT", "8000"))
+    # Diagnostics event streams never finish on their own; cancel them instead of waiting forever
+    graceful = float(os.environ.get("ECHOIDE_SHUTDOWN_TIMEOUT", "5"))
+    if WORKERS > 1:
+        # Each worker is its own process importing main; they share state through SQLite
+        from app.services.shared_state import SharedState
+        # Sessions, summaries and added workspaces survive restarts unless a clean slate is asked for
+        if os.environ.get("ECHOIDE_RESET_STATE") == "1":
+            SharedState().reset()
+        else:
+            SharedState().reset_change_log()
+        uvicorn.run("main:app", host=host, port=port, workers=WORKERS, timeout_graceful_shutdown=graceful)
+    else:
+        uvicorn.run(app, host=host, port=port, timeout_graceful_shutdown=graceful)
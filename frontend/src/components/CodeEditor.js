@@ -19,6 +19,7 @@ const CodeEditor = ({ file, onFileChange, onFileSave, settings }) => {
   const [isCompleting, setIsCompleting] = useState(false);
   const editorRef = useRef(null);
   const saveTimeoutRef = useRef(null);
+  const documentChangeTimeoutRef = useRef(null);
 
   // Enhanced language detection from file extension
   const getLanguageFromExtension = (filename) => {
@@ -238,6 +239,23 @@ const CodeEditor = ({ file, onFileChange, onFileSave, settings }) => {
     editor.onDidChangeModel(() => {
       setupLanguageValidation(language);
     });
+
+    // Report edits (debounced) so the backend can prefetch the next completion
+    editor.onDidChangeModelContent(() => {
+      clearTimeout(documentChangeTimeoutRef.current);
+      documentChangeTimeoutRef.current = setTimeout(() => {
+        const model = editor.getModel();
+        const position = editor.getPosition();
+        if (!model || !position) return;
+        apiService.documentChange(
+          model.uri.toString(),
+          model.getVersionId(),
+          model.getValue(),
+          model.getOffsetAt(position),
+          language
+        ).catch(() => {});
+      }, 150);
+    });
     
     // Enhanced keyboard shortcuts
     editor.addCommand(monaco.KeyMod.CtrlCmd | monaco.KeyCode.KeyS, () => {
@@ -271,16 +289,16 @@ const CodeEditor = ({ file, onFileChange, onFileSave, settings }) => {
     // Language-specific auto-completion provider
     const provider = monaco.languages.registerCompletionItemProvider(language, {
       provideCompletionItems: async (model, position) => {
-        const textUntilPosition = model.getValueInRange({
-          startLineNumber: 1,
-          startColumn: 1,
-          endLineNumber: position.lineNumber,
-          endColumn: position.column,
-        });
-
         try {
-          // Pass the current language to ensure language-specific completion
-          const response = await apiService.completeCode(textUntilPosition, textUntilPosition.length, language);
+          // Pass the current language to ensure language-specific completion; the
+          // document id and version let the backend answer from its prefetch cache
+          const response = await apiService.completeCode(
+            model.getValue(),
+            model.getOffsetAt(position),
+            language,
+            model.uri.toString(),
+            model.getVersionId()
+          );
           return {
             suggestions: [{
               label: `AI Completion (${language})`,
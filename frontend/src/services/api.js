@@ -51,7 +51,7 @@ class APIService {
     }
   }
 
-  async completeCode(code, cursorPosition, language = 'python') {
+  async completeCode(code, cursorPosition, language = 'python', documentId = null, version = null) {
     try {
       console.log(`Requesting completion for language: ${language}`);
       const response = await fetch(`${API_BASE}/api/code/complete`, {
@@ -60,7 +60,9 @@ class APIService {
         body: JSON.stringify({
           code,
           cursor_position: cursorPosition,
-          language
+          language,
+          document_id: documentId,
+          version
         })
       });
       
@@ -75,6 +77,32 @@ class APIService {
     }
   }
 
+  // Lets the backend prefetch a completion while the user pauses typing
+  async documentChange(documentId, version, code, cursorPosition, language = 'python') {
+    try {
+      const response = await fetch(`${API_BASE}/api/code/document-change`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          document_id: documentId,
+          version,
+          code,
+          cursor_position: cursorPosition,
+          language
+        })
+      });
+      
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('Document change API error:', error);
+      throw error;
+    }
+  }
+
   // File Services
   async listFiles(path = '.') {
     try {